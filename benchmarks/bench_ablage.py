@@ -0,0 +1,48 @@
+"""Opening, searching and importing scenarios in the SQLite store."""
+import datetime as dt
+import json
+
+import pytest
+
+from szenarien import szenario
+from vergleichsrechner import Szenario, simulate_depot, simulate_police
+from vergleichsrechner.ablage import Ablage
+
+GESPEICHERT = 30_000
+
+
+@pytest.fixture(scope='module')
+def ablage(tmp_path_factory):
+    """A store with tens of thousands of 40-year scenarios for 3000 clients."""
+    ablage = Ablage(tmp_path_factory.mktemp('ablage') / 'szenarien.db')
+    s = Szenario.from_json(szenario(40, 5))
+    police, depot = simulate_police(s), simulate_depot(s)
+    start = dt.datetime(2024, 1, 1)
+    for k in range(GESPEICHERT):
+        ablage.speichere(f'Kunde {k % 3000:04d}', s, police, depot, erstellt=start + dt.timedelta(hours=k))
+    yield ablage
+    ablage.close()
+
+
+def test_laden(benchmark, ablage):
+    """Open one stored scenario with both tables, no projection."""
+    benchmark(ablage.laden, GESPEICHERT // 2)
+
+
+def test_suche_kunde(benchmark, ablage):
+    benchmark(ablage.suche, 'kunde 12')
+
+
+def test_suche_datum(benchmark, ablage):
+    benchmark(ablage.suche, '', dt.date(2025, 3, 1), dt.date(2025, 3, 7))
+
+
+def test_import(benchmark, tmp_path, parameter_sets):
+    eingabe = tmp_path / 'kunden.jsonl'
+    eingabe.write_text(''.join(json.dumps(p) + '\n' for p in parameter_sets(1000)), encoding='utf-8')
+
+    def importieren():
+        ablage = Ablage()
+        ablage.importiere(eingabe)
+        ablage.close()
+    benchmark.pedantic(importieren, rounds=3)
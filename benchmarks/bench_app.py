@@ -0,0 +1,37 @@
+"""End-to-end script runs of the Streamlit app through AppTest."""
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest
+
+APP = Path(__file__).parent.parent / 'streamlit_app.py'
+
+# Runs must not write to the scenario store next to the app
+os.environ.setdefault('VERGLEICHSRECHNER_ABLAGE', ':memory:')
+
+
+def app():
+    at = AppTest.from_file(str(APP), default_timeout=60)
+    at.secrets['password'] = 'benchmark'
+    at.session_state['password_correct'] = True
+    return at
+
+
+def pruefen(at):
+    assert not at.exception, [e.value for e in at.exception]
+
+
+def test_erster_lauf(benchmark):
+    def setup():
+        return (app(),), {}
+    benchmark.pedantic(lambda at: pruefen(at.run()), setup=setup, rounds=5, warmup_rounds=1)
+
+
+def test_rerun(benchmark):
+    """A rerun with unchanged inputs, e.g. after a click that changes nothing."""
+    at = app().run()
+    pruefen(at)
+    benchmark.pedantic(lambda: pruefen(at.run()), rounds=5, warmup_rounds=1)
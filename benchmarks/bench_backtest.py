@@ -0,0 +1,55 @@
+"""Rolling-window backtest over every start year and laufzeit, with a hard budget.
+
+The series are random draws written to a temporary file; only the shape of
+the data matters for the timing.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from conftest import ANZAHL_UMSCHICHTUNGEN
+from vergleichsrechner.backtest import auswertung, backtest, lade_renditen, lies_renditen
+
+# 50 years of all windows take about 20 ms on one core
+BACKTEST_BUDGET = 1.0
+
+
+@pytest.fixture
+def renditedatei(tmp_path):
+    """A CSV series of ``jahre`` years, or of months with ``monatlich``."""
+    def erzeugen(jahre, monatlich=False):
+        rng = np.random.default_rng(0)
+        pfad = tmp_path / f'renditen_{jahre}_{int(monatlich)}.csv'
+        zeilen = [(j, m) for j in range(1900, 1900 + jahre) for m in (range(1, 13) if monatlich else [None])]
+        with open(pfad, 'w', encoding='utf-8') as f:
+            f.write('jahr,monat,' if monatlich else 'jahr,')
+            f.write('aktienfonds,mischfonds,rentenfonds,basiszins\n')
+            for (jahr, monat), werte in zip(zeilen, rng.normal([7, 4, 2, 2], [15, 8, 4, 1], (len(zeilen), 4))):
+                f.write(','.join([str(jahr)] + ([str(monat)] if monatlich else []) + [f'{w:.3f}' for w in werte]))
+                f.write('\n')
+        return pfad
+    return erzeugen
+
+
+@pytest.mark.parametrize('anzahl', ANZAHL_UMSCHICHTUNGEN)
+@pytest.mark.parametrize('jahre', (50, 100))
+def test_backtest(benchmark, make_szenario, renditedatei, jahre, anzahl):
+    szenario = make_szenario(jahre, anzahl)
+    renditen = lade_renditen(renditedatei(jahre))
+    benchmark(lambda: auswertung(backtest(szenario.to_parameter(), szenario.umschichtungen_json(), renditen)))
+
+
+def test_lade_monatlich(benchmark, renditedatei):
+    """Parsing and compounding 100 years of monthly returns, without the per-process cache."""
+    benchmark(lies_renditen, renditedatei(100, monatlich=True))
+
+
+def test_backtest_budget(make_szenario, renditedatei):
+    """Loading 50 years and evaluating all windows stays within ``BACKTEST_BUDGET``."""
+    szenario = make_szenario(50, 5)
+    pfad = renditedatei(50)
+    start = time.perf_counter()
+    auswertung(backtest(szenario.to_parameter(), szenario.umschichtungen_json(), lade_renditen(pfad)))
+    dauer = time.perf_counter() - start
+    assert dauer < BACKTEST_BUDGET, f'Backtest dauert {dauer:.3f} s, Budget {BACKTEST_BUDGET} s'
@@ -0,0 +1,24 @@
+"""Throughput of the vectorized batch path."""
+import pytest
+
+from vergleichsrechner import PRODUKTE, simulate_batch
+
+GROESSEN = (1_000, 10_000, 100_000)
+
+
+@pytest.mark.parametrize('sprung', (False, True), ids=('jahre', 'sprung'))
+@pytest.mark.parametrize('n', GROESSEN)
+def test_simulate_batch(benchmark, parameter_sets, n, sprung):
+    daten = parameter_sets(n)
+    benchmark.extra_info['szenarien'] = n
+    benchmark.pedantic(simulate_batch, (daten,), {'sprung': sprung}, rounds=3 if n >= 100_000 else 10,
+                       warmup_rounds=1)
+
+
+@pytest.mark.parametrize('n', GROESSEN[:2])
+def test_simulate_batch_portfolio(benchmark, parameter_sets, n):
+    """Every client runs in the sleeve engine."""
+    daten = [dict(p, umschichtungen=[dict(u, umschichten_von=PRODUKTE[k % len(PRODUKTE)])
+                                     for k, u in enumerate(p['umschichtungen'])]) for p in parameter_sets(n)]
+    benchmark.extra_info['szenarien'] = n
+    benchmark.pedantic(simulate_batch, (daten,), rounds=10, warmup_rounds=1)
@@ -0,0 +1,33 @@
+"""Rendering the result charts, cold and from the chart cache."""
+import pytest
+
+pytest.importorskip('matplotlib')
+
+from conftest import LAUFZEITEN
+from vergleichsrechner import simulate
+from vergleichsrechner.charts import CHART_CACHE, balken_png, verlauf_png
+
+
+def diagramme(szenario):
+    ergebnis = simulate(szenario.to_parameter(), szenario.umschichtungen_json())
+    police, depot = ergebnis['police'], ergebnis['depot']
+    werte = [police['Jahresende nach Kosten'][-1], police['Jahresende nach Kosten'][-1] * 0.9,
+             depot['Kapital abzüglich Steuer'][-1]]
+
+    def rendern():
+        balken_png(werte)
+        verlauf_png(police, depot, werte[1], werte[2])
+    return rendern
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_charts(benchmark, make_szenario, laufzeit):
+    rendern = diagramme(make_szenario(laufzeit, 5))
+    benchmark.pedantic(rendern, setup=CHART_CACHE.clear, rounds=5, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_charts_cache(benchmark, make_szenario, laufzeit):
+    rendern = diagramme(make_szenario(laufzeit, 5))
+    rendern()
+    benchmark(rendern)
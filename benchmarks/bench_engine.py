@@ -0,0 +1,53 @@
+"""Single-scenario projections as laufzeit and the number of rollovers grow."""
+import pytest
+
+from conftest import ANZAHL_UMSCHICHTUNGEN, LAUFZEITEN
+from vergleichsrechner import PRODUKTE, Projektion, Umschichtung, simulate_depot, simulate_police
+from vergleichsrechner.portfolio import simulate_portfolio
+from vergleichsrechner.sparrate import simulate_sparrate
+
+
+@pytest.mark.parametrize('anzahl', ANZAHL_UMSCHICHTUNGEN)
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_police(benchmark, make_szenario, laufzeit, anzahl):
+    benchmark(simulate_police, make_szenario(laufzeit, anzahl))
+
+
+@pytest.mark.parametrize('anzahl', ANZAHL_UMSCHICHTUNGEN)
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_depot(benchmark, make_szenario, laufzeit, anzahl):
+    benchmark(simulate_depot, make_szenario(laufzeit, anzahl))
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_projektion_letzte_umschichtung(benchmark, make_szenario, laufzeit):
+    """Recompute after editing the last rollover, as the app does on a rerun."""
+    szenario = make_szenario(laufzeit, 5)
+    parameter = szenario.to_parameter()
+    varianten = [szenario.umschichtungen_json(),
+                 szenario.umschichtungen_json() + [Umschichtung(laufzeit - 1, 'Rentenfonds').to_json()]]
+    projektion = Projektion()
+    projektion.update(parameter, varianten[0])
+    zaehler = iter(range(10 ** 9))
+
+    def update():
+        projektion.update(parameter, varianten[next(zaehler) % 2])
+    benchmark(update)
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_sparrate(benchmark, make_szenario, laufzeit):
+    """Both tables of the monthly Sparrate mode, twelve months per year."""
+    szenario = make_szenario(laufzeit, 5)
+    parameter = dict(szenario.to_parameter(), monatlich=True, sparrate_police=200.0, sparrate_sparplan=200.0,
+                     dynamik_police=0.02, dynamik_sparplan=0.02)
+    benchmark(simulate_sparrate, parameter, szenario.umschichtungen_json())
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_portfolio(benchmark, make_szenario, laufzeit):
+    """Both tables of the sleeve engine, every rollover taking a share of one fund."""
+    szenario = make_szenario(laufzeit, 5)
+    umschichtungen = [dict(u, umschichten_von=PRODUKTE[k % len(PRODUKTE)])
+                      for k, u in enumerate(szenario.umschichtungen_json())]
+    benchmark(simulate_portfolio, szenario.to_parameter(), umschichtungen)
@@ -0,0 +1,32 @@
+"""CSV and Excel export of the yearly tables, as behind the download buttons."""
+import pytest
+
+from conftest import LAUFZEITEN
+from vergleichsrechner import simulate, simulate_batch
+from vergleichsrechner.export import excel_bytes, iter_csv, tabelle_csv
+
+
+def tabellen(szenario):
+    return simulate(szenario.to_parameter(), szenario.umschichtungen_json())
+
+
+@pytest.mark.parametrize('produkt', ('police', 'depot'))
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_csv(benchmark, make_szenario, laufzeit, produkt):
+    benchmark(tabelle_csv, tabellen(make_szenario(laufzeit, 5))[produkt])
+
+
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_excel(benchmark, make_szenario, laufzeit):
+    pytest.importorskip('openpyxl')
+    ergebnis = tabellen(make_szenario(laufzeit, 5))
+    benchmark(excel_bytes, ergebnis['police'], ergebnis['depot'], [('Fondspolice', 1.0)])
+
+
+def test_batch_csv(benchmark, parameter_sets):
+    ergebnisse = simulate_batch(parameter_sets(100_000))
+
+    def streamen():
+        for _ in iter_csv(ergebnisse):
+            pass
+    benchmark.pedantic(streamen, rounds=3)
@@ -0,0 +1,13 @@
+"""Sensitivity of the final values to every input in one batched pass."""
+import pytest
+
+from conftest import ANZAHL_UMSCHICHTUNGEN, LAUFZEITEN
+from vergleichsrechner.sensitivitaet import rangfolge, sensitivitaet
+
+
+@pytest.mark.parametrize('anzahl', ANZAHL_UMSCHICHTUNGEN)
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_sensitivitaet(benchmark, make_szenario, laufzeit, anzahl):
+    szenario = make_szenario(laufzeit, anzahl)
+    p, u = szenario.to_parameter(), szenario.umschichtungen_json()
+    benchmark(lambda: rangfolge(sensitivitaet(p, u)))
@@ -0,0 +1,26 @@
+"""Break-even thresholds for one client and across a client book."""
+import pytest
+
+from conftest import LAUFZEITEN
+from vergleichsrechner.solver import break_even, break_even_batch
+
+FELDER = (('effektivkosten_police', 0.0, 0.05), ('rendite_aktienfonds_police', -0.05, 0.2))
+
+
+@pytest.mark.parametrize('feld,von,bis', FELDER, ids=[feld for feld, _, _ in FELDER])
+@pytest.mark.parametrize('laufzeit', LAUFZEITEN)
+def test_break_even(benchmark, make_szenario, laufzeit, feld, von, bis):
+    szenario = make_szenario(laufzeit, 5)
+    benchmark(break_even, szenario.to_parameter(), szenario.umschichtungen_json(), feld, von, bis)
+
+
+def test_break_even_laufzeit(benchmark, make_szenario):
+    szenario = make_szenario(40, 5)
+    benchmark(break_even, szenario.to_parameter(), szenario.umschichtungen_json(), 'laufzeit', 0, 99)
+
+
+@pytest.mark.parametrize('n', (1_000, 10_000))
+def test_break_even_batch(benchmark, parameter_sets, n):
+    daten = parameter_sets(n)
+    benchmark.extra_info['szenarien'] = n
+    benchmark.pedantic(break_even_batch, (daten, 'effektivkosten_police', 0, 5), rounds=3)
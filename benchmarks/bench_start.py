@@ -0,0 +1,7 @@
+"""Cold start: importing the package in a fresh interpreter (the budget is enforced in tests/test_start.py)."""
+from test_start import kalt_importieren
+
+
+def test_kaltstart(benchmark):
+    """A fresh interpreter importing everything the app needs from the package."""
+    benchmark.pedantic(kalt_importieren, rounds=5)
@@ -0,0 +1,39 @@
+"""Sweeps over a grid of inputs and the heatmap of the result."""
+import numpy as np
+import pytest
+
+from vergleichsrechner.sweep import achse, sweep
+
+ACHSEN = {
+    'rendite-kosten': (('rendite_aktienfonds_police', 0, 10), ('effektivkosten_police', 0, 3)),
+    'laufzeit-steuersatz': (('laufzeit', 1, 100), ('steuersatz_police', 0, 45)),
+    'drei-achsen': (('rendite_aktienfonds_sparplan', 0, 10), ('basiszins_sparplan', 0, 5), ('laufzeit', 1, 40)),
+}
+
+
+def gitter(achsen, schritte):
+    return {name: achse(name, np.linspace(von, bis, schritte)) for name, von, bis in achsen}
+
+
+@pytest.mark.parametrize('schritte', (50, 200))
+@pytest.mark.parametrize('fall', ('rendite-kosten', 'laufzeit-steuersatz'))
+def test_sweep(benchmark, make_szenario, fall, schritte):
+    szenario = make_szenario(40, 5)
+    benchmark(sweep, szenario.to_parameter(), szenario.umschichtungen_json(), gitter(ACHSEN[fall], schritte))
+
+
+def test_sweep_drei_achsen(benchmark, make_szenario):
+    szenario = make_szenario(40, 5)
+    achsen = gitter(ACHSEN['drei-achsen'], 40)
+    benchmark.pedantic(sweep, (szenario.to_parameter(), szenario.umschichtungen_json(), achsen), rounds=3)
+
+
+def test_heatmap(benchmark, make_szenario):
+    pytest.importorskip('matplotlib')
+    from vergleichsrechner.charts import CHART_CACHE, heatmap_png
+
+    szenario = make_szenario(40, 5)
+    achsen = gitter(ACHSEN['rendite-kosten'], 200)
+    vorteil = sweep(szenario.to_parameter(), szenario.umschichtungen_json(), achsen)['vorteil']
+    x, y = np.linspace(0, 10, 200), np.linspace(0, 3, 200)
+    benchmark.pedantic(heatmap_png, (x, y, vorteil, 'Rendite', 'Kosten'), setup=CHART_CACHE.clear, rounds=3)
@@ -0,0 +1,45 @@
+"""Benchmark suite for the Vergleichsrechner.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks            (or plain ``pytest`` inside benchmarks/)
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:15%
+
+Every run is saved under ``benchmarks/.results`` (named after the commit),
+so ``--benchmark-compare`` checks the current tree against the last saved
+run and ``pytest-benchmark compare`` lists the history.
+"""
+from pathlib import Path
+
+import pytest
+
+from szenarien import szenario
+from vergleichsrechner import Szenario
+
+ERGEBNISSE = Path(__file__).parent / '.results'
+
+LAUFZEITEN = (1, 10, 40, 100)
+ANZAHL_UMSCHICHTUNGEN = (0, 5, 50)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep the saved runs next to the suite wherever pytest is started from
+    if config.getoption('benchmark_storage', None) == 'file://./.benchmarks':
+        config.option.benchmark_storage = f'file://{ERGEBNISSE}'
+
+
+@pytest.fixture
+def make_szenario():
+    """``Szenario`` objects of the scenarios the correctness tests use (``tests/szenarien.py``)."""
+    def erzeugen(laufzeit, anzahl_umschichtungen):
+        return Szenario.from_json(szenario(laufzeit, anzahl_umschichtungen))
+    return erzeugen
+
+
+@pytest.fixture
+def parameter_sets():
+    """``n`` parameters.json dicts with varied laufzeit and rollovers."""
+    def erzeugen(n, laufzeit=40):
+        basis = [szenario(laufzeit - k % 10, k % 6) for k in range(60)]
+        return [basis[k % len(basis)] for k in range(n)]
+    return erzeugen
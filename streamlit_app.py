@@ -1,38 +1,72 @@
 import streamlit as st
-import pandas as pd
-from PIL import Image
 import json
+import datetime as dt
 import numpy as np
 import hmac
-import base64
-import matplotlib.pyplot as plt
-
-def get_rendite_police(product):
-    if product == "Aktienfonds":
-        return rendite_aktienfonds_police
-    elif product == "Mischfonds":
-        return rendite_mischfonds_police
-    elif product == "Rentenfonds":
-        return rendite_rentenfonds_police
-    return rendite_aktienfonds_police
-
-def get_rendite_depot(product):
-    if product == "Aktienfonds":
-        return rendite_aktienfonds_sparplan
-    elif product == "Mischfonds":
-        return rendite_mischfonds_sparplan
-    elif product == "Rentenfonds":
-        return rendite_rentenfonds_sparplan
-    return rendite_aktienfonds_sparplan
-
-def get_teilfreistellung_depot(product):
-    if product == "Aktienfonds":
-        return teilfreistellung_aktienfonds_sparplan
-    elif product == "Mischfonds":
-        return teilfreistellung_mischfonds_sparplan
-    elif product == "Rentenfonds":
-        return teilfreistellung_rentenfonds_sparplan
-    return teilfreistellung_aktienfonds_sparplan
+import importlib.util
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from vergleichsrechner import (
+    DepotErgebnis,
+    PoliceErgebnis,
+    PoliceParameter,
+    Projektion,
+    SparplanParameter,
+    Szenario,
+    Umschichtung,
+    fondspolice_nach_steuer,
+    format_german,
+)
+from vergleichsrechner.charts import (
+    balken_png,
+    balken_vega,
+    fenster_png,
+    fenster_vega,
+    heatmap_png,
+    heatmap_vega,
+    monte_carlo_png,
+    monte_carlo_vega,
+    tornado_png,
+    tornado_vega,
+    verlauf_png,
+    verlauf_vega,
+)
+from vergleichsrechner.ablage import Ablage
+from vergleichsrechner.aufwaermen import aufwaermen
+from vergleichsrechner.backtest import auswertung, backtest, lade_renditen
+from vergleichsrechner.batch import PROZENT_FELDER
+from vergleichsrechner.cache import SESSION_GROESSE, LRUCache, cache_key, memoize, simulate_cached
+from vergleichsrechner.export import excel_bytes, export_cached, tabelle_csv
+from vergleichsrechner.messung import MESSUNG, protokoll_datei, starte_lauf
+from vergleichsrechner.montecarlo import KORRELATION, PERZENTILE, VOLATILITAET, perzentile, simulate_paths
+from vergleichsrechner.sensitivitaet import TITEL, ist_betrag, rangfolge, sensitivitaet
+from vergleichsrechner.solver import break_even
+from vergleichsrechner.sweep import achse, sweep
+
+# 'vega' draws the charts in the browser instead of rendering them with matplotlib
+DIAGRAMME = os.environ.get('VERGLEICHSRECHNER_DIAGRAMME', 'matplotlib')
+
+STYLE = Path(__file__).parent / 'style.css'
+
+
+@st.cache_resource
+def vorwaermen():
+    """Warm up once per server process in the background, e.g. while the password is typed."""
+    thread = threading.Thread(target=aufwaermen, kwargs={'diagramme': DIAGRAMME != 'vega'},
+                              name='vergleich-aufwaermen', daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource
+def stylesheet():
+    return f'<style>{STYLE.read_text(encoding="utf-8")}</style>'
+
+
+vorwaermen()
 
 def check_password():
     """Returns True if the user had the correct password."""
@@ -58,38 +92,7 @@ if not check_password():
 
 st.set_page_config(layout='wide', initial_sidebar_state='expanded')
 
-st.markdown(
-    """
-    <style>
-    /* Set the background color of the main content area */
-    div[data-testid="stAppViewContainer"] {
-        background-color: #d6e8ee;
-        background-image: none;
-    }
-    /* Set the background color of the sidebar */
-    div[data-testid="stSidebar"] > div:first-child {
-        background-color: #f0f2f6;
-    }
-    /* Set the background color of the header */
-    header[data-testid="stHeader"] {
-        background-color: #d6e8ee;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.markdown(
-    """
-    <style>
-    /* Change the background of the header and the surrounding area */
-    header, .css-18ni7ap {
-        background-color: #d6e8ee !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+st.html(stylesheet())
 
 custom_metric_html = """
     <div style="background-color: #F0F8FF;
@@ -112,473 +115,524 @@ custom_metric_html = """
     </div>
 """
 
-def format_german(value):
-    v1 = f'{value:,.2f} €'
-    v2 = v1.replace(',','#')
-    v3 = v2.replace('.','%')
-    v4 = v3.replace('#','.')
-    v5 = v4.replace('%',',')
-    return v5
+# Sweep axes: sidebar label -> (parameter, default from, default to) in sidebar units
+SWEEP_OPTIONEN = {
+    'Rendite Aktienfonds Police(%)': ('rendite_aktienfonds_police', 0.0, 10.0),
+    'Rendite Mischfonds Police(%)': ('rendite_mischfonds_police', 0.0, 10.0),
+    'Rendite Aktienfonds Sparplan(%)': ('rendite_aktienfonds_sparplan', 0.0, 10.0),
+    'Rendite Mischfonds Sparplan(%)': ('rendite_mischfonds_sparplan', 0.0, 10.0),
+    'Effektivkosten Police(%)': ('effektivkosten_police', 0.0, 3.0),
+    'Effektivkosten Sparplan(%)': ('effektivkosten_sparplan', 0.0, 3.0),
+    'Steuersatz Police(%)': ('steuersatz_police', 0.0, 45.0),
+    'Steuerlast Sparplan(%)': ('steuerlast_sparplan', 0.0, 30.0),
+    'Basiszins(%)': ('basiszins_sparplan', 0.0, 5.0),
+    'Freistellungsauftrag': ('freistellungsauftrag_sparplan', 0.0, 2000.0),
+    'Laufzeit': ('laufzeit', 1.0, 50.0),
+}
+
+# Debug switches: profile every rerun ('cprofile' or 'pyinstrument') and log the timings as JSON lines
+PROFIL = os.environ.get('VERGLEICHSRECHNER_PROFIL') or None
+MESSLOG = os.environ.get('VERGLEICHSRECHNER_MESSLOG')
+if MESSLOG:
+    protokoll_datei(MESSLOG)
+
+# SQLite file of the saved scenarios, shared by all sessions
+ABLAGE = os.environ.get('VERGLEICHSRECHNER_ABLAGE', 'szenarien.db')
+
+# Default series file of the historical backtest (see vergleichsrechner.backtest)
+RENDITEN = os.environ.get('VERGLEICHSRECHNER_RENDITEN', '')
+
 
-def euro_formatter(value):
-    return f'€ {value:,.0f}'.replace(',', '.').replace('.', ',')
+@st.cache_resource
+def ablage():
+    return Ablage(ABLAGE)
+
+
+def admin_freigegeben():
+    """Whether the URL carries ?admin=<token> with the separate admin_token of the secrets.
+
+    Logging in is not enough; without an admin_token in the secrets the
+    panel stays closed.
+    """
+    token = st.secrets.get('admin_token', '')
+    angefragt = st.query_params.get('admin', '')
+    return bool(token) and hmac.compare_digest(angefragt.encode('utf-8'), str(token).encode('utf-8'))
+
+
+def zeige_diagramm(png, vega, *daten):
+    if DIAGRAMME == 'vega':
+        st.vega_lite_chart(vega(*daten), width='stretch')
+    else:
+        st.image(png(*daten), width='stretch')
+
+
+def format_eingabe(feld, wert):
+    """An input in engine units as shown in the sidebar."""
+    if feld == 'laufzeit':
+        return f'{int(wert) + 1} Jahre'
+    if feld in PROZENT_FELDER:
+        return f'{wert * 100:.2f} %'.replace('.', ',')
+    return format_german(wert)
+
+
+lauf = starte_lauf(sitzung=st.session_state.setdefault('sitzung', uuid.uuid4().hex[:8]), profil=PROFIL)
 
 st.sidebar.header('Vergleichsrechner Einmaleinlage version 1')
 
-uploaded_file = st.sidebar.file_uploader("Parameter Hochladen", type=["json"])
-if uploaded_file:
-    uploaded_data = json.load(uploaded_file)
-    # Only set 'umschichtungen' if it is not already in the session state
-    if 'umschichtungen' not in st.session_state:
-        st.session_state['umschichtungen'] = uploaded_data.get('umschichtungen', [])
-else:
-    if 'umschichtungen' not in st.session_state:
-        st.session_state['umschichtungen'] = []
+# --- Gespeicherte Szenarien ---
+st.sidebar.subheader('Gespeicherte Szenarien')
+suche = st.sidebar.text_input('Kunde suchen')
+col1, col2 = st.sidebar.columns(2)
+suche_von = col1.date_input('gespeichert ab', value=None, format='DD.MM.YYYY')
+suche_bis = col2.date_input('gespeichert bis', value=None, format='DD.MM.YYYY')
+treffer = ablage().suche(suche, suche_von, suche_bis)
+if treffer:
+    auswahl = st.sidebar.selectbox(
+        'Szenario', treffer,
+        format_func=lambda e: f'{e.kunde} – {dt.datetime.fromisoformat(e.erstellt):%d.%m.%Y %H:%M}',
+    )
+    if st.sidebar.button('Szenario laden'):
+        st.session_state['geladen'] = ablage().laden(auswahl.id)
+        st.session_state['umschichtungen'] = st.session_state['geladen'].szenario.umschichtungen_json()
+elif suche or suche_von or suche_bis:
+    st.sidebar.caption('Keine gespeicherten Szenarien gefunden.')
+
+# Uploaded parameters.json files go into the store once; the last one is opened
+uploads = st.sidebar.file_uploader('Parameter importieren', type=['json'], accept_multiple_files=True)
+importiert = st.session_state.setdefault('importiert', set())
+for upload in uploads or []:
+    if upload.file_id in importiert:
+        continue
+    importiert.add(upload.file_id)
+    try:
+        daten = json.load(upload)
+        nummer = ablage().speichere(daten.get('kunde') or os.path.splitext(upload.name)[0], Szenario.from_json(daten),
+                                    quelle=upload.name)
+    except (AttributeError, KeyError, TypeError, ValueError) as exc:
+        st.sidebar.error(f'{upload.name}: {exc}')
+        continue
+    st.session_state['geladen'] = ablage().laden(nummer)
+    st.session_state['umschichtungen'] = st.session_state['geladen'].szenario.umschichtungen_json()
+
+geladen = st.session_state.get('geladen')
+vorgabe = geladen.szenario if geladen is not None else Szenario()
+if 'umschichtungen' not in st.session_state:
+    st.session_state['umschichtungen'] = []
 
 # --- Fondspolice Eingaben ---
 st.sidebar.markdown('Fondspolice')
-if uploaded_file:
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        einmalbeitrag_police = st.number_input('Einmalbeitrag', min_value=0, value=uploaded_data.get('einmalbeitrag_police'))
-        rendite_mischfonds_police = (st.number_input('Rendite Mischfonds(%)', min_value=0.0, value=uploaded_data.get('rendite_mischfonds_police')) / 100)
-        rendite_rentenfonds_police = (st.number_input('Rendite Rentenfonds(%)', min_value=0.0, value=uploaded_data.get('rendite_rentenfonds_police')) / 100)
-        rendite_aktienfonds_police = (st.number_input('Rendite Aktienfonds(%)', min_value=0.0, value=uploaded_data.get('rendite_aktienfonds_police')) / 100)
-    with col2:
-        teilfreistellung_police = (st.number_input('Teilfreistellung(%)', min_value=0.0, value=uploaded_data.get('teilfreistellung_police')) / 100)
-        effektivkosten_police = (st.number_input('Effektivkosten pro Jahr(%)', min_value=0.0, value=uploaded_data.get('effektivkosten_police')) / 100)
-        steuersatz_police = (st.number_input('Persönl. Steuersatz bei Auszahlung(%)', min_value=0.0, value=uploaded_data.get('steuersatz_police')) / 100)
-else:
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        einmalbeitrag_police = st.number_input('Einmalbeitrag', min_value=0, value=10000)
-        rendite_mischfonds_police = (st.number_input('Rendite Mischfonds(%)', min_value=0.0, value=8.0) / 100)
-        rendite_rentenfonds_police = (st.number_input('Rendite Rentenfonds(%)', min_value=0.0, value=8.0) / 100)
-        rendite_aktienfonds_police = (st.number_input('Rendite Aktienfonds(%)', min_value=0.0, value=8.0) / 100)
-    with col2:
-        teilfreistellung_police = (st.number_input('Teilfreistellung(%)', min_value=0.0, value=15.00) / 100)
-        effektivkosten_police = (st.number_input('Effektivkosten pro Jahr(%)', min_value=0.0, value=1.00) / 100)
-        steuersatz_police = (st.number_input('Persönl. Steuersatz bei Auszahlung(%)', min_value=0.0, value=42.0) / 100)
+col1, col2 = st.sidebar.columns(2)
+with col1:
+    police = dict(
+        einmalbeitrag=st.number_input('Einmalbeitrag', min_value=0, value=int(vorgabe.police.einmalbeitrag)),
+        rendite_mischfonds=st.number_input('Rendite Mischfonds(%)', min_value=0.0, value=float(vorgabe.police.rendite_mischfonds)),
+        rendite_rentenfonds=st.number_input('Rendite Rentenfonds(%)', min_value=0.0, value=float(vorgabe.police.rendite_rentenfonds)),
+        rendite_aktienfonds=st.number_input('Rendite Aktienfonds(%)', min_value=0.0, value=float(vorgabe.police.rendite_aktienfonds)),
+    )
+with col2:
+    police.update(
+        teilfreistellung=st.number_input('Teilfreistellung(%)', min_value=0.0, value=float(vorgabe.police.teilfreistellung)),
+        effektivkosten=st.number_input('Effektivkosten pro Jahr(%)', min_value=0.0, value=float(vorgabe.police.effektivkosten)),
+        steuersatz=st.number_input('Persönl. Steuersatz bei Auszahlung(%)', min_value=0.0, value=float(vorgabe.police.steuersatz)),
+    )
 
 # --- Fondssparplan Eingaben ---
 st.sidebar.markdown('Fondssparplan')
-if uploaded_file:
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        einmalbeitrag_sparplan = st.number_input('Einmalbeitrag ', min_value=0, value=uploaded_data.get('einmalbeitrag_sparplan'))
-        rendite_aktienfonds_sparplan = (st.number_input('Rendite Aktienfonds(%) ', min_value=0.0, value=uploaded_data.get('rendite_aktienfonds_sparplan')) / 100)
-        rendite_mischfonds_sparplan = (st.number_input('Rendite Mischfonds(%) ', min_value=0.0, value=uploaded_data.get('rendite_mischfonds_sparplan')) / 100)
-        rendite_rentenfonds_sparplan = (st.number_input('Rendite Rentenfonds(%) ', min_value=0.0, value=uploaded_data.get('rendite_rentenfonds_sparplan')) / 100)
-        freistellungsauftrag_sparplan = st.number_input('Freistellungsauftrag ', min_value=0, value=uploaded_data.get('freistellungsauftrag_sparplan'))
-    with col2:
-        teilfreistellung_aktienfonds_sparplan = (st.number_input('Teilfreistellung Aktienfonds(%) ', min_value=0.0, value=uploaded_data.get('teilfreistellung_aktienfonds_sparplan')) / 100)
-        teilfreistellung_mischfonds_sparplan = (st.number_input('Teilfreistellung Mischfonds(%)', min_value=0.0, value=uploaded_data.get('teilfreistellung_mischfonds_sparplan')) / 100)
-        teilfreistellung_rentenfonds_sparplan = (st.number_input('Teilfreistellung Rentenfonds(%) ', min_value=0.0, value=uploaded_data.get('teilfreistellung_rentenfonds_sparplan')) / 100)
-        basiszins_sparplan = (st.number_input('Basiszins(%) ', min_value=0.0, value=uploaded_data.get('basiszins_sparplan')) / 100)
-        effektivkosten_sparplan = (st.number_input('Effektivkosten pro Jahr(%) ', min_value=0.0, value=uploaded_data.get('effektivkosten_sparplan')) / 100)
-        ausgabeaufschlag_sparplan = (st.number_input('Ausgabeaufschlag auf Wiederanlage(%) ', min_value=0.0, value=uploaded_data.get('ausgabeaufschlag_sparplan')) / 100)
-        steuerlast_sparplan = (st.number_input('Steuerlast(%) ', min_value=0.0, value=uploaded_data.get('steuerlast_sparplan')) / 100)
-        steuerlast_auszahlung_sparplan = (st.number_input('Steuerlast bei Auszahlung(%) ', min_value=0.0, value=uploaded_data.get('steuerlast_auszahlung_sparplan')) / 100)
-else:
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        einmalbeitrag_sparplan = st.number_input('Einmalbeitrag ', min_value=0, value=10000)
-        rendite_aktienfonds_sparplan = (st.number_input('Rendite Aktienfonds(%) ', min_value=0.0, value=0.0) / 100)
-        rendite_mischfonds_sparplan = (st.number_input('Rendite Mischfonds(%) ', min_value=0.0, value=0.0) / 100)
-        rendite_rentenfonds_sparplan = (st.number_input('Rendite Rentenfonds(%) ', min_value=0.0, value=0.0) / 100)
-        freistellungsauftrag_sparplan = st.number_input('Freistellungsauftrag ', min_value=0, value=0)
-    with col2:
-        teilfreistellung_aktienfonds_sparplan = (st.number_input('Teilfreistellung Aktienfonds(%) ', min_value=0.0, value=0.0) / 100)
-        teilfreistellung_mischfonds_sparplan = (st.number_input('Teilfreistellung Mischfonds(%) ', min_value=0.0, value=0.0) / 100)
-        teilfreistellung_rentenfonds_sparplan = (st.number_input('Teilfreistellung Rentenfonds(%) ', min_value=0.0, value=0.0) / 100)
-        basiszins_sparplan = (st.number_input('Basiszins(%) ', min_value=0.0, value=0.0) / 100)
-        effektivkosten_sparplan = (st.number_input('Effektivkosten pro Jahr(%) ', min_value=0.0, value=0.0) / 100)
-        ausgabeaufschlag_sparplan = (st.number_input('Ausgabeaufschlag auf Wiederanlage(%) ', min_value=0.0, value=0.0) / 100)
-        steuerlast_sparplan = (st.number_input('Steuerlast(%) ', min_value=0.0, value=0.0) / 100)
-        steuerlast_auszahlung_sparplan = (st.number_input('Steuerlast bei Auszahlung(%) ', min_value=0.0, value=0.0) / 100)
+col1, col2 = st.sidebar.columns(2)
+with col1:
+    sparplan = dict(
+        einmalbeitrag=st.number_input('Einmalbeitrag ', min_value=0, value=int(vorgabe.sparplan.einmalbeitrag)),
+        rendite_aktienfonds=st.number_input('Rendite Aktienfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.rendite_aktienfonds)),
+        rendite_mischfonds=st.number_input('Rendite Mischfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.rendite_mischfonds)),
+        rendite_rentenfonds=st.number_input('Rendite Rentenfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.rendite_rentenfonds)),
+        freistellungsauftrag=st.number_input('Freistellungsauftrag ', min_value=0, value=int(vorgabe.sparplan.freistellungsauftrag)),
+    )
+with col2:
+    sparplan.update(
+        teilfreistellung_aktienfonds=st.number_input('Teilfreistellung Aktienfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.teilfreistellung_aktienfonds)),
+        teilfreistellung_mischfonds=st.number_input('Teilfreistellung Mischfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.teilfreistellung_mischfonds)),
+        teilfreistellung_rentenfonds=st.number_input('Teilfreistellung Rentenfonds(%) ', min_value=0.0, value=float(vorgabe.sparplan.teilfreistellung_rentenfonds)),
+        basiszins=st.number_input('Basiszins(%) ', min_value=0.0, value=float(vorgabe.sparplan.basiszins)),
+        effektivkosten=st.number_input('Effektivkosten pro Jahr(%) ', min_value=0.0, value=float(vorgabe.sparplan.effektivkosten)),
+        ausgabeaufschlag=st.number_input('Ausgabeaufschlag auf Wiederanlage(%) ', min_value=0.0, value=float(vorgabe.sparplan.ausgabeaufschlag)),
+        steuerlast=st.number_input('Steuerlast(%) ', min_value=0.0, value=float(vorgabe.sparplan.steuerlast)),
+        steuerlast_auszahlung=st.number_input('Steuerlast bei Auszahlung(%) ', min_value=0.0, value=float(vorgabe.sparplan.steuerlast_auszahlung)),
+    )
 
 st.sidebar.subheader('Weitere Parameter')
 col1, col2 = st.sidebar.columns(2)
 with col1:
-    if uploaded_file:
-        laufzeit = st.number_input('Laufzeit', min_value=0, value=uploaded_data.get('laufzeit')) - 1
-    else:
-        laufzeit = st.number_input('Laufzeit', min_value=0, value=1) - 1
+    laufzeit = st.number_input('Laufzeit', min_value=0, value=int(vorgabe.laufzeit)) - 1
 
-# --- Umschichtungen (User Input for Anteil removed) ---
+# --- Monatliche Sparrate ---
+st.sidebar.subheader('Sparrate')
+monatlich = st.sidebar.checkbox('Monatliche Sparrate', value=vorgabe.monatlich)
+if monatlich:
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        police.update(
+            sparrate=st.number_input('Sparrate Police pro Monat', min_value=0, value=int(vorgabe.police.sparrate)),
+            dynamik=st.number_input('Dynamik Police pro Jahr(%)', min_value=0.0, value=float(vorgabe.police.dynamik)),
+            beitragskosten=st.number_input('Beitragskosten Police(%)', min_value=0.0, value=float(vorgabe.police.beitragskosten)),
+        )
+    with col2:
+        sparplan.update(
+            sparrate=st.number_input('Sparrate Sparplan pro Monat', min_value=0, value=int(vorgabe.sparplan.sparrate)),
+            dynamik=st.number_input('Dynamik Sparplan pro Jahr(%)', min_value=0.0, value=float(vorgabe.sparplan.dynamik)),
+            beitragskosten=st.number_input('Ausgabeaufschlag Sparrate(%)', min_value=0.0, value=float(vorgabe.sparplan.beitragskosten)),
+        )
+
+# --- Umschichtungen ---
 st.sidebar.subheader('Umschichtungen')
 options = list(range(1, laufzeit+2))
 jahr_der_umschichtung = st.sidebar.selectbox('Jahr der Umschichtung', options=options, index=0)
 umschichten_in = st.sidebar.selectbox('Umschichten in', options=["Aktienfonds", "Mischfonds", "Rentenfonds"])
-# Instead of taking an input for the percentage, we now always use 100% (1.0)
+# The whole contract switches at 100%; a single fund moves the given Anteil of it
+umschichten_aus = st.sidebar.selectbox('Umschichten aus', options=['gesamtes Depot', "Aktienfonds", "Mischfonds", "Rentenfonds"])
+if umschichten_aus == 'gesamtes Depot':
+    umschichten_von, anteil = None, 1.0
+else:
+    umschichten_von = umschichten_aus
+    anteil = st.sidebar.number_input('Anteil(%)', min_value=0.0, max_value=100.0, value=100.0) / 100
 if st.sidebar.button('Speichern'):
-    st.session_state['umschichtungen'].append({
-        'jahr': jahr_der_umschichtung - 1,
-        'anteil': 1.0,
-        'umschichten_in': umschichten_in
-    })
+    st.session_state['umschichtungen'].append(
+        Umschichtung(jahr=jahr_der_umschichtung - 1, umschichten_in=umschichten_in, anteil=anteil,
+                     umschichten_von=umschichten_von).to_json()
+    )
     st.session_state['jahr_der_umschichtung'] = options[0]
 
 if st.sidebar.button('Alle Umschichtungen löschen'):
     st.session_state['umschichtungen'] = []
 
-def create_rollover_dataframe_police(laufzeit, ums_list):
-    df_police = pd.DataFrame({'Jahr': range(0, laufzeit+1)})
-    df_police['UmschichtungJN'] = 0
-    df_police['AnteilUmschichtung'] = 0.0
-    for ums in ums_list:
-        jahr = ums['jahr']
-        anteil = ums['anteil']
-        if 0 <= jahr <= laufzeit:
-            df_police.loc[df_police['Jahr'] == jahr, 'UmschichtungJN'] = 1
-            df_police.loc[df_police['Jahr'] == jahr, 'AnteilUmschichtung'] = anteil
-    return df_police
-
-def create_rollover_dataframe_depot(laufzeit, ums_list):
-    df_depot = pd.DataFrame({'Jahr': range(0, laufzeit+1)})
-    df_depot['UmschichtungJN'] = 0
-    df_depot['AnteilUmschichtung'] = 0.0
-    for ums in ums_list:
-        jahr = ums['jahr']
-        anteil = ums['anteil']
-        if 0 <= jahr <= laufzeit:
-            df_depot.loc[df_depot['Jahr'] == jahr, 'UmschichtungJN'] = 1
-            df_depot.loc[df_depot['Jahr'] == jahr, 'AnteilUmschichtung'] = anteil
-    return df_depot
-
-
-
-# --- Calculations for Fondspolice ---
-df_police = create_rollover_dataframe_police(laufzeit, st.session_state['umschichtungen'])
-df_police['Jahresbeginn'] = 0
-df_police['Nach Beitragskosten und Abschlusskosten'] = 0
-df_police['Rendite'] = 0
-df_police['Wertsteigerung'] = 0
-df_police['Jahresende'] = 0
-df_police['Kosten Fondsguthaben'] = 0
-df_police['Jahresende nach Kosten'] = 0
-df_police['Einzahlung'] = 0
-df_police['Umschichtung'] = 0
-df_police['Umschichten oder Auszahlen'] = 0
-df_police['Einzahlungen'] = 0
-df_police['Erträge'] = 0
-df_police['Teilfreistellung'] = 0
-df_police['zu besteuern'] = 0
-df_police['HEV'] = 0
-df_police['Steuerlast'] = 0
-
-# --- Calculations for Fondssparplan ---
-df_depot = create_rollover_dataframe_depot(laufzeit, st.session_state['umschichtungen'])
-df_depot['Jahresbeginn'] = 0
-df_depot['Nach Orderprov. und Ausgabeaufschl.'] = 0
-df_depot['Rendite'] = 0
-df_depot['Wertsteigerung'] = 0
-df_depot['Wertsteigerunglaufend'] = 0
-df_depot['Jahresende'] = 0
-df_depot['Kosten auf Fondsguthaben'] = 0
-df_depot['Jahresende nach Kosten'] = 0
-df_depot['Basisertrag'] = 0
-df_depot['Vorabpauschale'] = 0
-df_depot['Vorabpauschalelaufend'] = 0
-df_depot['Teilfreistellung'] = 0
-df_depot['zu besteuern'] = 0
-df_depot['Freistellungsauftrag'] = 0
-df_depot['Freistellung übrig'] = 0
-df_depot['danach zu besteuern'] = 0
-df_depot['Steuerlast'] = 0
-df_depot['Einzahlung'] = 0
-df_depot['Umschichtung'] = 0
-df_depot['Umschichten'] = 0
-df_depot['Erträgelaufend'] = 0
-df_depot['Erträge'] = 0
-df_depot['minus Vorabpauschale'] = 0
-df_depot['Teilfreistellung '] = 0
-df_depot['zu besteuern '] = 0
-df_depot['nach Freistellungsauftrag'] = 0
-df_depot['Steuerlast '] = 0
-df_depot['Kapital abzüglich Steuer'] = 0
-
-for i in range(laufzeit+1):
-    # Determine current product for this year (default "Aktienfonds")
-    current_product = "Aktienfonds"
-    for event in st.session_state['umschichtungen']:
-        if event['jahr'] <= i:
-            current_product = event['umschichten_in']
-    # --- Calculations for Fondspolice ---
-    if i == 0:
-        df_police.loc[i, 'Jahr'] = i + 1
-        df_police.loc[i, 'Jahresbeginn'] = einmalbeitrag_police
-        df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] = df_police.loc[i, 'Jahresbeginn']
-        df_police.loc[i, 'Rendite'] = get_rendite_police(current_product)
-        df_police.loc[i, 'Wertsteigerung'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] * df_police.loc[i, 'Rendite']
-        df_police.loc[i, 'Jahresende'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] + df_police.loc[i, 'Wertsteigerung']
-        df_police.loc[i, 'Kosten Fondsguthaben'] = df_police.loc[i, 'Jahresende'] * effektivkosten_police
-        df_police.loc[i, 'Jahresende nach Kosten'] = df_police.loc[i, 'Jahresende'] - df_police.loc[i, 'Kosten Fondsguthaben']
-        df_police.loc[i, 'Einzahlung'] = einmalbeitrag_police
-        df_police.loc[i, 'Umschichtung'] = df_police.loc[i, 'UmschichtungJN'] * df_police.loc[i, 'AnteilUmschichtung']
-        df_police.loc[i, 'Umschichten oder Auszahlen'] = df_police.loc[i, 'Jahresende nach Kosten'] * df_police.loc[i, 'Umschichtung']
-    elif i == laufzeit:
-        df_police.loc[i, 'Jahr'] = i + 1
-        df_police.loc[i, 'Jahresbeginn'] = df_police.loc[i - 1, 'Jahresende nach Kosten']
-        df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] = df_police.loc[i, 'Jahresbeginn']
-        df_police.loc[i, 'Rendite'] = get_rendite_police(current_product)
-        df_police.loc[i, 'Wertsteigerung'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] * df_police.loc[i, 'Rendite']
-        df_police.loc[i, 'Jahresende'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] + df_police.loc[i, 'Wertsteigerung']
-        df_police.loc[i, 'Kosten Fondsguthaben'] = df_police.loc[i, 'Jahresende'] * effektivkosten_police
-        df_police.loc[i, 'Jahresende nach Kosten'] = df_police.loc[i, 'Jahresende'] - df_police.loc[i, 'Kosten Fondsguthaben']
-        df_police.loc[i, 'Einzahlung'] = 0
-        df_police.loc[i, 'Umschichtung'] = df_police.loc[i, 'UmschichtungJN'] * df_police.loc[i, 'AnteilUmschichtung']
-        df_police.loc[i, 'Umschichten oder Auszahlen'] = df_police.loc[i, 'Jahresende nach Kosten'] * df_police.loc[i, 'Umschichtung']
-        df_police.loc[i, 'Einzahlungen'] = einmalbeitrag_police
-        df_police.loc[i, 'Erträge'] = df_police.loc[i, 'Umschichten oder Auszahlen'] - df_police.loc[i, 'Einzahlungen']
-        df_police.loc[i, 'Teilfreistellung'] = df_police.loc[i, 'Erträge'] * teilfreistellung_police
-        df_police.loc[i, 'zu besteuern'] = df_police.loc[i, 'Erträge'] - df_police.loc[i, 'Teilfreistellung']
-        df_police.loc[i, 'HEV'] = df_police.loc[i, 'zu besteuern'] / 2
-        df_police.loc[i, 'Steuerlast'] = df_police.loc[i, 'HEV'] * steuersatz_police
-    else:
-        df_police.loc[i, 'Jahr'] = i + 1
-        df_police.loc[i, 'Jahresbeginn'] = df_police.loc[i - 1, 'Jahresende nach Kosten']
-        df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] = df_police.loc[i, 'Jahresbeginn']
-        df_police.loc[i, 'Rendite'] = get_rendite_police(current_product)
-        df_police.loc[i, 'Wertsteigerung'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] * df_police.loc[i, 'Rendite']
-        df_police.loc[i, 'Jahresende'] = df_police.loc[i, 'Nach Beitragskosten und Abschlusskosten'] + df_police.loc[i, 'Wertsteigerung']
-        df_police.loc[i, 'Kosten Fondsguthaben'] = df_police.loc[i, 'Jahresende'] * effektivkosten_police
-        df_police.loc[i, 'Jahresende nach Kosten'] = df_police.loc[i, 'Jahresende'] - df_police.loc[i, 'Kosten Fondsguthaben']
-        df_police.loc[i, 'Einzahlung'] = 0
-        df_police.loc[i, 'Umschichtung'] = df_police.loc[i, 'UmschichtungJN'] * df_police.loc[i, 'AnteilUmschichtung']
-        df_police.loc[i, 'Umschichten oder Auszahlen'] = df_police.loc[i, 'Jahresende nach Kosten'] * df_police.loc[i, 'Umschichtung']
-
-    if i == 0:
-        df_depot.loc[i, 'Jahr'] = i + 1
-        df_depot.loc[i, 'Jahresbeginn'] = einmalbeitrag_sparplan
-        df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.'] = df_depot.loc[i, 'Jahresbeginn']
-        df_depot.loc[i, 'Rendite'] = get_rendite_depot(current_product)
-        df_depot.loc[i, 'Wertsteigerung'] = df_depot.loc[i, 'Jahresbeginn'] * get_rendite_depot(current_product)
-        df_depot.loc[i, 'Jahresende'] = df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.'] + df_depot.loc[i, 'Wertsteigerung']
-        df_depot.loc[i, 'Kosten auf Fondsguthaben'] = df_depot.loc[i, 'Jahresende'] * effektivkosten_sparplan
-        df_depot.loc[i, 'Basisertrag'] = df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.'] * 0.7 * basiszins_sparplan
-        if (df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.']) <= df_depot.loc[i, 'Basisertrag'] and \
-                (df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.']) >= 0:
-            df_depot.loc[i, 'Vorabpauschale'] = 0
-        else:
-            df_depot.loc[i, 'Vorabpauschale'] = df_depot.loc[i, 'Basisertrag']
-        df_depot.loc[i, 'Vorabpauschalelaufend'] = df_depot.loc[i, 'Vorabpauschale']
-        # Use product-specific teilfreistellung for depot:
-        df_depot.loc[i, 'Teilfreistellung'] = df_depot.loc[i, 'Vorabpauschale'] * get_teilfreistellung_depot(current_product)
-        df_depot.loc[i, 'zu besteuern'] = df_depot.loc[i, 'Vorabpauschale'] - df_depot.loc[i, 'Teilfreistellung']
-        df_depot.loc[i, 'Freistellungsauftrag'] = freistellungsauftrag_sparplan
-        if df_depot.loc[i, 'zu besteuern'] >= df_depot.loc[i, 'Freistellungsauftrag']:
-            df_depot.loc[i, 'Freistellung übrig'] = 0
-        else:
-            df_depot.loc[i, 'Freistellung übrig'] = df_depot.loc[i, 'Freistellungsauftrag'] - df_depot.loc[i, 'zu besteuern']
-        if df_depot.loc[i, 'Freistellungsauftrag'] >= df_depot.loc[i, 'zu besteuern']:
-            df_depot.loc[i, 'danach zu besteuern'] = 0
-        else:
-            df_depot.loc[i, 'danach zu besteuern'] = df_depot.loc[i, 'zu besteuern'] - df_depot.loc[i, 'Freistellungsauftrag']
-        df_depot.loc[i, 'Steuerlast'] = df_depot.loc[i, 'danach zu besteuern'] * steuerlast_sparplan
-        df_depot.loc[i, 'Jahresende nach Kosten'] = df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Kosten auf Fondsguthaben'] - df_depot.loc[i, 'Steuerlast']
-        df_depot.loc[i, 'Einzahlung'] = einmalbeitrag_sparplan
-        if laufzeit == 0:
-            df_depot.loc[i, 'Umschichtung'] = 1
-            df_depot.loc[i, 'Umschichten'] = df_depot.loc[i, 'Jahresende nach Kosten']
-        else:
-            df_depot.loc[i, 'Umschichtung'] = df_depot.loc[i, 'UmschichtungJN'] * df_depot.loc[i, 'AnteilUmschichtung']
-            df_depot.loc[i, 'Umschichten'] = df_depot.loc[i, 'Jahresende nach Kosten'] * df_depot.loc[i, 'Umschichtung']
-        df_depot.loc[i, 'Erträgelaufend'] = df_depot.loc[i, 'Wertsteigerung']
-        df_depot.loc[i, 'Erträge'] = df_depot.loc[i, 'Erträgelaufend'] * df_depot.loc[i, 'UmschichtungJN']
-        df_depot.loc[i, 'minus Vorabpauschale'] = (df_depot.loc[i, 'Erträgelaufend'] - df_depot.loc[i, 'Vorabpauschalelaufend']) * df_depot.loc[i, 'UmschichtungJN']
-        df_depot.loc[i, 'Teilfreistellung '] = df_depot.loc[i, 'minus Vorabpauschale'] * get_teilfreistellung_depot(current_product)
-        df_depot.loc[i, 'zu besteuern '] = df_depot.loc[i, 'minus Vorabpauschale'] - df_depot.loc[i, 'Teilfreistellung ']
-        if df_depot.loc[i, 'Freistellung übrig'] > df_depot.loc[i, 'zu besteuern ']:
-            df_depot.loc[i, 'nach Freistellungsauftrag'] = 0
-        else:
-            df_depot.loc[i, 'nach Freistellungsauftrag'] = df_depot.loc[i, 'zu besteuern '] - df_depot.loc[i, 'Freistellung übrig']
-        df_depot.loc[i, 'Steuerlast '] = df_depot.loc[i, 'nach Freistellungsauftrag'] * steuerlast_sparplan
-        df_depot.loc[i, 'Kapital abzüglich Steuer'] = df_depot.loc[i, 'Umschichten'] - df_depot.loc[i, 'Steuerlast ']
-    else:
-        df_depot.loc[i, 'Jahr'] = i + 1
-        df_depot.loc[i, 'Jahresbeginn'] = df_depot.loc[i - 1, 'Jahresende nach Kosten'] - df_depot.loc[i - 1, 'Steuerlast ']
-        df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.'] = df_depot.loc[i, 'Jahresbeginn']
-        df_depot.loc[i, 'Rendite'] = get_rendite_depot(current_product)
-        df_depot.loc[i, 'Wertsteigerung'] = df_depot.loc[i, 'Jahresbeginn'] * get_rendite_depot(current_product)
-        df_depot.loc[i, 'Jahresende'] = df_depot.loc[i, 'Jahresbeginn'] + df_depot.loc[i, 'Wertsteigerung']
-        df_depot.loc[i, 'Kosten auf Fondsguthaben'] = df_depot.loc[i, 'Jahresende'] * effektivkosten_sparplan
-        df_depot.loc[i, 'Basisertrag'] = df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.'] * 0.7 * basiszins_sparplan
-        if (df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.']) <= df_depot.loc[i, 'Basisertrag'] and \
-                (df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Nach Orderprov. und Ausgabeaufschl.']) >= 0:
-            df_depot.loc[i, 'Vorabpauschale'] = 0
-        else:
-            df_depot.loc[i, 'Vorabpauschale'] = df_depot.loc[i, 'Basisertrag']
-        if df_depot.loc[i - 1, 'UmschichtungJN'] == 1:
-            df_depot.loc[i, 'Vorabpauschalelaufend'] = df_depot.loc[i, 'Vorabpauschale']
-        else:
-            df_depot.loc[i, 'Vorabpauschalelaufend'] = df_depot.loc[i - 1, 'Vorabpauschalelaufend'] + df_depot.loc[i, 'Vorabpauschale']
-        df_depot.loc[i, 'Teilfreistellung'] = df_depot.loc[i, 'Vorabpauschale'] * get_teilfreistellung_depot(current_product)
-        df_depot.loc[i, 'zu besteuern'] = df_depot.loc[i, 'Vorabpauschale'] - df_depot.loc[i, 'Teilfreistellung']
-        df_depot.loc[i, 'Freistellungsauftrag'] = freistellungsauftrag_sparplan
-        if df_depot.loc[i, 'zu besteuern'] >= df_depot.loc[i, 'Freistellungsauftrag']:
-            df_depot.loc[i, 'Freistellung übrig'] = 0
-        else:
-            df_depot.loc[i, 'Freistellung übrig'] = df_depot.loc[i, 'Freistellungsauftrag'] - df_depot.loc[i, 'zu besteuern']
-        if df_depot.loc[i, 'Freistellungsauftrag'] >= df_depot.loc[i, 'zu besteuern']:
-            df_depot.loc[i, 'danach zu besteuern'] = 0
-        else:
-            df_depot.loc[i, 'danach zu besteuern'] = df_depot.loc[i, 'zu besteuern'] - df_depot.loc[i, 'Freistellungsauftrag']
-        df_depot.loc[i, 'Steuerlast'] = df_depot.loc[i, 'danach zu besteuern'] * steuerlast_sparplan
-        df_depot.loc[i, 'Jahresende nach Kosten'] = df_depot.loc[i, 'Jahresende'] - df_depot.loc[i, 'Kosten auf Fondsguthaben'] - df_depot.loc[i, 'Steuerlast']
-        df_depot.loc[i, 'Einzahlung'] = 0
-        if i == laufzeit:
-            df_depot.loc[i, 'Umschichtung'] = 1
-            df_depot.loc[i, 'Umschichten'] = df_depot.loc[i, 'Jahresende nach Kosten']
-        else:
-            df_depot.loc[i, 'Umschichtung'] = df_depot.loc[i, 'UmschichtungJN'] * df_depot.loc[i, 'AnteilUmschichtung']
-            df_depot.loc[i, 'Umschichten'] = df_depot.loc[i, 'Jahresende nach Kosten'] * df_depot.loc[i, 'Umschichtung']
-        if df_depot.loc[i - 1, 'UmschichtungJN'] == 1:
-            df_depot.loc[i, 'Erträgelaufend'] = df_depot.loc[i, 'Wertsteigerung']
-        else:
-            df_depot.loc[i, 'Erträgelaufend'] = df_depot.loc[i - 1, 'Erträgelaufend'] + df_depot.loc[i, 'Wertsteigerung']
-        df_depot.loc[i, 'Erträge'] = df_depot.loc[i, 'Erträgelaufend'] * df_depot.loc[i, 'Umschichtung']
-        df_depot.loc[i, 'minus Vorabpauschale'] = (df_depot.loc[i, 'Erträgelaufend'] - df_depot.loc[i, 'Vorabpauschalelaufend']) * df_depot.loc[i, 'Umschichtung']
-        df_depot.loc[i, 'Teilfreistellung '] = df_depot.loc[i, 'minus Vorabpauschale'] * teilfreistellung_aktienfonds_sparplan
-        df_depot.loc[i, 'zu besteuern '] = df_depot.loc[i, 'minus Vorabpauschale'] - df_depot.loc[i, 'Teilfreistellung ']
-        if df_depot.loc[i, 'Freistellung übrig'] > df_depot.loc[i, 'zu besteuern ']:
-            df_depot.loc[i, 'nach Freistellungsauftrag'] = 0
-        else:
-            df_depot.loc[i, 'nach Freistellungsauftrag'] = df_depot.loc[i, 'zu besteuern '] - df_depot.loc[i, 'Freistellung übrig']
-        df_depot.loc[i, 'Steuerlast '] = df_depot.loc[i, 'nach Freistellungsauftrag'] * steuerlast_sparplan
-        df_depot.loc[i, 'Kapital abzüglich Steuer'] = df_depot.loc[i, 'Umschichten'] - df_depot.loc[i, 'Steuerlast ']
+st.sidebar.subheader('Monte-Carlo-Simulation')
+monte_carlo = st.sidebar.checkbox('Monte-Carlo-Simulation aktivieren')
+if monte_carlo:
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        volatilitaet = {
+            'Aktienfonds': st.number_input('Volatilität Aktienfonds(%)', min_value=0.0, value=VOLATILITAET['Aktienfonds'] * 100) / 100,
+            'Mischfonds': st.number_input('Volatilität Mischfonds(%)', min_value=0.0, value=VOLATILITAET['Mischfonds'] * 100) / 100,
+            'Rentenfonds': st.number_input('Volatilität Rentenfonds(%)', min_value=0.0, value=VOLATILITAET['Rentenfonds'] * 100) / 100,
+        }
+        pfade = st.number_input('Anzahl Pfade', min_value=100, max_value=100000, value=10000, step=1000)
+    with col2:
+        korrelation = {
+            ('Aktienfonds', 'Mischfonds'): st.number_input('Korrelation Aktien/Misch', min_value=-1.0, max_value=1.0, value=KORRELATION[('Aktienfonds', 'Mischfonds')]),
+            ('Aktienfonds', 'Rentenfonds'): st.number_input('Korrelation Aktien/Renten', min_value=-1.0, max_value=1.0, value=KORRELATION[('Aktienfonds', 'Rentenfonds')]),
+            ('Mischfonds', 'Rentenfonds'): st.number_input('Korrelation Misch/Renten', min_value=-1.0, max_value=1.0, value=KORRELATION[('Mischfonds', 'Rentenfonds')]),
+        }
+        seed = st.number_input('Zufallsstartwert', min_value=0, value=42)
+
+st.sidebar.subheader('Sweep')
+sweep_aktiv = st.sidebar.checkbox('Sweep aktivieren')
+sweep_achsen = {}
+if sweep_aktiv:
+    namen = list(SWEEP_OPTIONEN)
+    for titel, index in (('X-Achse', 0), ('Y-Achse', 4), ('Dritte Achse', None)):
+        auswahl = st.sidebar.selectbox(titel, (['keine'] if index is None else []) + namen, index=index or 0)
+        if auswahl == 'keine':
+            continue
+        feld, von, bis = SWEEP_OPTIONEN[auswahl]
+        col1, col2, col3 = st.sidebar.columns(3)
+        von = col1.number_input(f'von ({titel})', value=float(von))
+        bis = col2.number_input(f'bis ({titel})', value=float(bis))
+        schritte = col3.number_input(f'Schritte ({titel})', min_value=2, max_value=200, value=50)
+        if feld in sweep_achsen:
+            st.sidebar.warning(f'{auswahl} ist schon als Achse gewählt')
+            continue
+        werte = achse(feld, np.linspace(von, bis, schritte))
+        sweep_achsen[feld] = (auswahl, werte + 1 if feld == 'laufzeit' else np.linspace(von, bis, schritte), werte)
+
+st.sidebar.subheader('Break-even')
+break_even_aktiv = st.sidebar.checkbox('Break-even berechnen')
+if break_even_aktiv:
+    break_even_titel = st.sidebar.selectbox('Eingabe', list(SWEEP_OPTIONEN), index=4)
+    break_even_feld, von, bis = SWEEP_OPTIONEN[break_even_titel]
+    col1, col2 = st.sidebar.columns(2)
+    # A contract runs at least one year
+    minimum = 1.0 if break_even_feld == 'laufzeit' else None
+    break_even_von = col1.number_input('von (Break-even)', min_value=minimum, value=float(von))
+    break_even_bis = col2.number_input('bis (Break-even)', min_value=minimum, value=float(bis))
+
+st.sidebar.subheader('Historischer Backtest')
+backtest_aktiv = st.sidebar.checkbox('Backtest aktivieren')
+if backtest_aktiv:
+    renditedatei = st.sidebar.text_input('Renditedatei (CSV oder Parquet)', value=RENDITEN).strip()
+
+st.sidebar.subheader('Sensitivität')
+sensitivitaet_aktiv = st.sidebar.checkbox('Sensitivität berechnen')
+lauf.zwischenzeit('widgets')
+
+szenario = Szenario(
+    police=PoliceParameter(**police),
+    sparplan=SparplanParameter(**sparplan),
+    laufzeit=laufzeit + 1,
+    umschichtungen=tuple(Umschichtung.from_json(u) for u in st.session_state['umschichtungen']),
+    monatlich=monatlich,
+)
+parameter = szenario.to_parameter()
+
+# --- Calculations for Fondspolice and Fondssparplan ---
+if 'ergebnis_cache' not in st.session_state:
+    st.session_state['ergebnis_cache'] = LRUCache(SESSION_GROESSE)
+    st.session_state['projektion'] = Projektion()
+if geladen is not None and geladen.szenario == szenario:
+    # An opened scenario shows its stored tables until an input changes
+    ergebnis = {'police': geladen.police.tabelle, 'depot': geladen.depot.tabelle}
+else:
+    try:
+        ergebnis = simulate_cached(parameter, st.session_state['umschichtungen'], st.session_state['ergebnis_cache'],
+                                   st.session_state['projektion'])
+    except ValueError as fehler:
+        st.error(str(fehler))
+        st.stop()
+lauf.zwischenzeit('simulation')
 
 # --- Display results and charts ---
 col1, col2, col3 = st.columns(3)
-fondspolice_rentenkapital = df_police.loc[i, 'Jahresende nach Kosten']
+fondspolice_rentenkapital = ergebnis['police']['Jahresende nach Kosten'][laufzeit]
 col1.markdown(custom_metric_html.format(label="Fondspolice Rentenkapital", value=format_german(fondspolice_rentenkapital)), unsafe_allow_html=True)
 
-fondspolice_ertraege = fondspolice_rentenkapital - einmalbeitrag_police
-fondspolice_teilfreistellung_result = fondspolice_ertraege * teilfreistellung_police
-fondspolice_zu_besteuern_result = fondspolice_ertraege - fondspolice_teilfreistellung_result
-fondspolice_hev_result = fondspolice_zu_besteuern_result / 2
-fondspolice_steuerlast_result = fondspolice_hev_result * steuersatz_police
-fondspolice = fondspolice_rentenkapital - fondspolice_steuerlast_result
+# With a Sparrate the gains are taxed over all payments, not just the Einmalbeitrag
+einzahlungen_police = float(ergebnis['police']['Einzahlung'][:laufzeit + 1].sum())
+fondspolice = fondspolice_nach_steuer(fondspolice_rentenkapital, einzahlungen_police, parameter['teilfreistellung_police'], parameter['steuersatz_police'])
 col2.markdown(custom_metric_html.format(label="Fondspolice", value=format_german(fondspolice)), unsafe_allow_html=True)
 
-fondssparplan = df_depot.loc[i, 'Kapital abzüglich Steuer']
+fondssparplan = ergebnis['depot']['Kapital abzüglich Steuer'][laufzeit]
 col3.markdown(custom_metric_html.format(label="Fondssparplan", value=format_german(fondssparplan)), unsafe_allow_html=True)
 
 st.sidebar.title(' ')
-if st.sidebar.button('Parameter Speichern'):
-    data_to_save = {
-        # Parameter Police
-        'einmalbeitrag_police': einmalbeitrag_police,
-        'rendite_mischfonds_police': rendite_mischfonds_police * 100,
-        'rendite_rentenfonds_police': rendite_rentenfonds_police * 100,
-        'rendite_aktienfonds_police': rendite_aktienfonds_police * 100,
-        'teilfreistellung_police': teilfreistellung_police * 100,
-        'effektivkosten_police': effektivkosten_police * 100,
-        'steuersatz_police': steuersatz_police * 100,
-        # Parameter Sparplan
-        'einmalbeitrag_sparplan': einmalbeitrag_sparplan,
-        'rendite_aktienfonds_sparplan': rendite_aktienfonds_sparplan * 100,
-        'rendite_mischfonds_sparplan': rendite_mischfonds_sparplan * 100,
-        'rendite_rentenfonds_sparplan': rendite_rentenfonds_sparplan * 100,
-        'freistellungsauftrag_sparplan': freistellungsauftrag_sparplan,
-        'teilfreistellung_aktienfonds_sparplan': teilfreistellung_aktienfonds_sparplan * 100,
-        'teilfreistellung_mischfonds_sparplan': teilfreistellung_mischfonds_sparplan * 100,
-        'teilfreistellung_rentenfonds_sparplan': teilfreistellung_rentenfonds_sparplan * 100,
-        'basiszins_sparplan': basiszins_sparplan * 100,
-        'effektivkosten_sparplan': effektivkosten_sparplan * 100,
-        'ausgabeaufschlag_sparplan': ausgabeaufschlag_sparplan * 100,
-        'steuerlast_sparplan': steuerlast_sparplan * 100,
-        'steuerlast_auszahlung_sparplan': steuerlast_auszahlung_sparplan * 100,
-        # Weitere Parameter
-        'laufzeit': laufzeit + 1,
-        'umschichtungen': st.session_state['umschichtungen']
-    }
-    json_str = json.dumps(data_to_save, indent=4)
-    b64 = base64.b64encode(json_str.encode()).decode()
-    href = f'<a href="data:file/json;base64,{b64}" download="parameters.json">Parameter Herunterladen</a>'
-    st.sidebar.markdown(href, unsafe_allow_html=True)
+kunde = st.sidebar.text_input('Kunde', value=geladen.kunde if geladen is not None else '')
+if st.sidebar.button('Szenario speichern'):
+    try:
+        nummer = ablage().speichere(
+            kunde, szenario,
+            PoliceErgebnis(ergebnis['police'], float(fondspolice_rentenkapital), float(fondspolice)),
+            DepotErgebnis(ergebnis['depot'], float(fondssparplan)),
+        )
+    except ValueError as exc:
+        st.sidebar.error(str(exc))
+    else:
+        st.session_state['geladen'] = ablage().laden(nummer)
+        st.sidebar.success(f'Szenario für {kunde.strip()} gespeichert')
+st.sidebar.download_button(
+    label='Parameter herunterladen',
+    data=lambda: json.dumps(szenario.to_json(), indent=4),
+    file_name='parameters.json',
+    mime='application/json',
+    on_click='ignore',
+)
 
 categories = ['Fondspolice Rentenkapital', 'Fondspolice', 'Fondssparplan']
 values = [fondspolice_rentenkapital, fondspolice, fondssparplan]
 
 col1, col2 = st.columns(2)
 with col1:
-    fig, ax = plt.subplots(figsize=(10, 7), facecolor='#d6e8ee')
-    ax.set_facecolor('#d6e8ee')
-    bars = ax.bar(categories, values, color=['#92d050', '#00a44a', '#00b0f0'])
-    ax.set_xlabel(' ')
-    ax.set_xticks(range(len(categories)))
-    ax.set_xticklabels(categories, rotation=0)
-    ax.set_yticks([])
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    plt.tight_layout()
-    for bar in bars:
-        yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width() / 2, yval + 10, f'{yval:,.0f} €'.replace(',', '.'), ha='center', va='bottom')
-    st.pyplot(plt)
+    zeige_diagramm(balken_png, balken_vega, values)
 
 with col2:
-    df_police_display = df_police
-    df_depot_display = df_depot
-    df_fondspolice_display = df_police
-    new_row1 = pd.DataFrame({'Jahr': [df_depot_display['Jahr'].max() + 1], 'Jahresende nach Kosten': [fondssparplan]})
-    new_row2 = pd.DataFrame({'Jahr': [df_fondspolice_display['Jahr'].max() + 1], 'Jahresende nach Kosten': [fondspolice]})
-    df_depot_display = pd.concat([df_depot_display, new_row1], ignore_index=True)
-    df_fondspolice_display = pd.concat([df_fondspolice_display, new_row2], ignore_index=True)
-    fig, ax = plt.subplots(figsize=(10, 7), facecolor='#d6e8ee')
-    ax.set_facecolor('#d6e8ee')
-    ax.plot(df_depot_display['Jahr'], df_depot_display['Jahresende nach Kosten'], linestyle='-', color='#00b0f0')
-    ax.plot(df_fondspolice_display['Jahr'], df_fondspolice_display['Jahresende nach Kosten'], linestyle='-', color='#00a44a')
-    ax.plot(df_police_display['Jahr'], df_police_display['Jahresende nach Kosten'], linestyle='-', color='#92d050')
-    ax.set_xlabel(' ')
-    ax.set_ylabel(' ')
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    plt.tight_layout()
-    yticks = ax.get_yticks()
-    ax.set_yticklabels([euro_formatter(y) for y in yticks])
-    st.pyplot(fig)
+    zeige_diagramm(verlauf_png, verlauf_vega, ergebnis['police'], ergebnis['depot'], fondspolice, fondssparplan)
+lauf.zwischenzeit('diagramme')
+
+if monte_carlo:
+    st.markdown('### Monte-Carlo-Simulation')
+    try:
+        mc_key = cache_key('montecarlo', parameter, st.session_state['umschichtungen'], pfade, volatilitaet,
+                           [[a, b, rho] for (a, b), rho in korrelation.items()], seed)
+        mc_ergebnisse = memoize(
+            mc_key,
+            lambda: simulate_paths(parameter, st.session_state['umschichtungen'], pfade, volatilitaet, korrelation, seed),
+            st.session_state['ergebnis_cache'],
+        )
+    except ValueError as exc:
+        st.error(str(exc))
+    else:
+        baender = perzentile(mc_ergebnisse)
+        mc_keys = ['fondspolice_rentenkapital', 'fondspolice', 'fondssparplan']
+        col1, col2 = st.columns(2)
+        with col1:
+            zeige_diagramm(monte_carlo_png, monte_carlo_vega, [baender[k] for k in mc_keys])
+        with col2:
+            import pandas as pd
+
+            df_mc = pd.DataFrame(
+                {category: [format_german(v) for v in baender[k]] for category, k in zip(categories, mc_keys)},
+                index=[f'{q}. Perzentil' for q in PERZENTILE],
+            )
+            st.dataframe(df_mc)
+    lauf.zwischenzeit('monte_carlo')
+
+if sweep_aktiv and len(sweep_achsen) >= 2:
+    st.markdown('### Sweep: Vorteil Fondspolice gegenüber Fondssparplan')
+    sweep_key = cache_key('sweep', parameter, st.session_state['umschichtungen'],
+                          {feld: werte for feld, (_, _, werte) in sweep_achsen.items()})
+    try:
+        sweep_ergebnis = memoize(
+            sweep_key,
+            lambda: sweep(parameter, st.session_state['umschichtungen'],
+                          {feld: werte for feld, (_, _, werte) in sweep_achsen.items()}),
+            st.session_state['ergebnis_cache'],
+        )
+    except ValueError as exc:
+        st.error(str(exc))
+    else:
+        (titel_x, x, _), (titel_y, y, _), *dritte = sweep_achsen.values()
+        vorteil = sweep_ergebnis['vorteil']
+        if dritte:
+            titel_z, z, _ = dritte[0]
+            k = st.select_slider(titel_z, options=range(len(z)), format_func=lambda i: f'{z[i]:g}')
+            vorteil = vorteil[:, :, k]
+        zeige_diagramm(heatmap_png, heatmap_vega, x, y, vorteil, titel_x, titel_y)
+    lauf.zwischenzeit('sweep')
+elif sweep_aktiv:
+    st.info('Für die Heatmap bitte zwei verschiedene Achsen wählen.')
+
+if break_even_aktiv:
+    st.markdown('### Break-even')
+    if break_even_feld == 'laufzeit':
+        grenzen = (round(break_even_von) - 1, round(break_even_bis) - 1)
+    else:
+        grenzen = tuple(achse(break_even_feld, [break_even_von, break_even_bis]))
+    try:
+        schwelle = memoize(
+            cache_key('break_even', parameter, st.session_state['umschichtungen'], break_even_feld, grenzen),
+            lambda: break_even(parameter, st.session_state['umschichtungen'], break_even_feld, *grenzen),
+            st.session_state['ergebnis_cache'],
+        )
+    except ValueError as exc:
+        st.error(str(exc))
+    else:
+        if np.isnan(schwelle):
+            st.info(f'Zwischen {break_even_von:g} und {break_even_bis:g} ändert sich die Empfehlung nicht '
+                    f'({break_even_titel}).')
+        else:
+            besser = 'Fondspolice' if fondspolice > fondssparplan else 'Fondssparplan'
+            st.markdown(f'Fondspolice und Fondssparplan sind gleichauf bei **{break_even_titel} = '
+                        f'{format_eingabe(break_even_feld, schwelle)}** (aktuell {format_eingabe(break_even_feld, parameter[break_even_feld])}, '
+                        f'Empfehlung derzeit: {besser}).')
+    lauf.zwischenzeit('break_even')
+
+if backtest_aktiv:
+    st.markdown('### Historischer Backtest')
+    if not renditedatei:
+        st.info('Bitte den Pfad einer Renditedatei mit historischen Jahres- oder Monatsrenditen angeben.')
+    else:
+        try:
+            renditen = lade_renditen(renditedatei)
+            backtest_ergebnis = memoize(
+                cache_key('backtest', parameter, st.session_state['umschichtungen'], renditen.jahre, renditen.rendite,
+                          renditen.basiszins),
+                lambda: backtest(parameter, st.session_state['umschichtungen'], renditen),
+                st.session_state['ergebnis_cache'],
+            )
+        except (ImportError, OSError, ValueError) as exc:
+            st.error(str(exc))
+        else:
+            startjahre = backtest_ergebnis['startjahre']
+            zeitraum = f'{startjahre[0]}–{startjahre[-1]}'
+            if laufzeit >= len(startjahre):
+                st.info(f'Die Renditereihe ({zeitraum}) ist kürzer als die Laufzeit von {laufzeit + 1} Jahren.')
+            else:
+                zusammenfassung = auswertung(backtest_ergebnis)
+                fenster = zusammenfassung['fenster'][laufzeit]
+                st.markdown(f'{fenster} Zeitfenster von {laufzeit + 1} Jahren ({zeitraum}): Fondspolice vorn in '
+                            f'**{zusammenfassung["police_vorn"][laufzeit]:.0%}**, Fondssparplan vorn in '
+                            f'**{zusammenfassung["sparplan_vorn"][laufzeit]:.0%}** der Fenster.')
+                col1, col2 = st.columns(2)
+                with col1:
+                    # Spread over the start years, drawn like the Monte Carlo percentiles
+                    zeige_diagramm(monte_carlo_png, monte_carlo_vega,
+                                   [zusammenfassung[k][:, laufzeit] for k in ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')])
+                with col2:
+                    zeige_diagramm(fenster_png, fenster_vega, startjahre[:fenster], backtest_ergebnis['vorteil'][laufzeit, :fenster])
+    lauf.zwischenzeit('backtest')
+
+if sensitivitaet_aktiv:
+    st.markdown('### Sensitivität')
+    try:
+        sens = memoize(
+            cache_key('sensitivitaet', parameter, st.session_state['umschichtungen']),
+            lambda: sensitivitaet(parameter, st.session_state['umschichtungen']),
+            st.session_state['ergebnis_cache'],
+        )
+    except ValueError as exc:
+        st.error(str(exc))
+    else:
+        reihenfolge = rangfolge(sens)
+        felder = [sens['felder'][i] for i in reihenfolge]
+        st.caption('Änderung der Endwerte, wenn eine Eingabe um 1 Prozentpunkt bzw. 1.000 € sinkt oder steigt '
+                   '(Eingaben, die nicht negativ sein können, sinken höchstens auf 0).')
+        zeige_diagramm(tornado_png, tornado_vega, [TITEL[feld] for feld in felder],
+                       (sens['fondspolice']['tief'][reihenfolge], sens['fondspolice']['hoch'][reihenfolge]),
+                       (sens['fondssparplan']['tief'][reihenfolge], sens['fondssparplan']['hoch'][reihenfolge]))
+        import pandas as pd
+
+        # Derivatives per percentage point of a rate and per euro of an amount
+        einheit = np.array([1.0 if ist_betrag(feld) else 0.01 for feld in felder])
+        st.dataframe(pd.DataFrame({
+            'Eingabe': [TITEL[feld] for feld in felder],
+            'Wert': [format_german(wert) if ist_betrag(feld) else f'{wert * 100:.2f} %'.replace('.', ',')
+                     for feld, wert in zip(felder, sens['basis'][reihenfolge])],
+            'Einheit': ['je Euro' if ist_betrag(feld) else 'je Prozentpunkt' for feld in felder],
+            'Ableitung Fondspolice': [format_german(v) for v in sens['fondspolice']['ableitung'][reihenfolge] * einheit],
+            'Ableitung Fondssparplan': [format_german(v) for v in sens['fondssparplan']['ableitung'][reihenfolge] * einheit],
+        }), hide_index=True)
+    lauf.zwischenzeit('sensitivitaet')
+
+# Exports are built only when a button is clicked and cached per input
+export_eingaben = [parameter, st.session_state['umschichtungen']]
 
 st.markdown('### Fondspolice')
-df_police = df_police.round(2)
-st.dataframe(df_police)
-csv = df_police.to_csv(index=False)
+st.dataframe(ergebnis['police'].to_frame(runden=2))
 st.download_button(
     label="Als CSV herunterladen",
-    data=csv,
+    data=lambda: export_cached('police.csv', export_eingaben, lambda: tabelle_csv(ergebnis['police'])),
     file_name="police.csv",
     mime="text/csv",
+    on_click='ignore',
 )
 
 st.markdown('### Fondssparplan')
-df_depot = df_depot.round(2)
-st.dataframe(df_depot)
-csv = df_depot.to_csv(index=False)
+st.dataframe(ergebnis['depot'].to_frame(runden=2))
 st.download_button(
     label="Als CSV herunterladen ",
-    data=csv,
+    data=lambda: export_cached('depot.csv', export_eingaben, lambda: tabelle_csv(ergebnis['depot'])),
     file_name="depot.csv",
     mime="text/csv",
+    on_click='ignore',
 )
 
-st.markdown(
-    """
-    <style>
-    div[data-testid="metric-container"] {
-        background-color: #FFFFFF;
-        border: 1px solid #CCCCCC;
-        padding: 5% 5% 5% 10%;
-        border-radius: 15px;
-        border-left: 0.5rem solid #405087 !important;
-        box-shadow: 0 0.15rem 1.75rem 0 rgba(58, 59, 69, 0.15) !important;
-       overflow-wrap: break-word;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
\ No newline at end of file
+if importlib.util.find_spec('openpyxl') is not None:
+    zusammenfassung = [('Ergebnis', 'Wert')] + list(zip(categories, map(float, values)))
+    zusammenfassung += [(' ', None), ('Parameter', 'Wert')]
+    zusammenfassung += [(k, v) for k, v in szenario.to_json().items() if k != 'umschichtungen']
+    zusammenfassung += [(f'Umschichtung {u.jahr}', f'{u.umschichten_von + " → " if u.umschichten_von else ""}{u.umschichten_in} ({u.anteil:.0%})')
+                        for u in szenario.umschichtungen]
+    st.download_button(
+        label="Als Excel herunterladen",
+        data=lambda: export_cached('vergleich.xlsx', export_eingaben,
+                                   lambda: excel_bytes(ergebnis['police'], ergebnis['depot'], zusammenfassung)),
+        file_name="vergleich.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click='ignore',
+    )
+lauf.zwischenzeit('tabellen')
+
+lauf.beende()
+
+# Hidden admin panel for the operators (see admin_freigegeben)
+if admin_freigegeben():
+    import pandas as pd
+
+    with st.expander('Laufzeiten', expanded=True):
+        st.dataframe(
+            pd.DataFrame(MESSUNG.zusammenfassung(),
+                         columns=['Phase', 'Anzahl', 'p50 (ms)', 'p95 (ms)', 'Letzter Lauf (ms)']).round(2),
+            hide_index=True,
+        )
+        if st.button('Messwerte zurücksetzen'):
+            MESSUNG.zuruecksetzen()
+        if lauf.profil:
+            st.code(lauf.profil)
+        else:
+            st.caption('Profil je Lauf: VERGLEICHSRECHNER_PROFIL=cprofile oder pyinstrument setzen.')
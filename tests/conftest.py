@@ -0,0 +1,80 @@
+"""Correctness tests for the Vergleichsrechner.
+
+    python -m pytest
+
+``baseline.json`` holds final values and yearly columns of the original
+per-cell pandas engine for a fixed set of scenarios. Everything else is
+checked against the single-scenario path of ``szenario`` (the engine the
+app shows) or between two entry points that must agree.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from szenarien import MODI, szenario
+from vergleichsrechner import Szenario, simulate_depot, simulate_police
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+ERGEBNIS_FELDER = ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+# Engine paths differ only in the order of floating point operations
+RTOL = 1e-10
+
+
+def lade_baseline():
+    with open(BASELINE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def baseline_als_json():
+    """The baseline cases as parameters.json dicts."""
+    daten = []
+    for fall in lade_baseline():
+        p = fall['parameter']
+        data = {key: wert if key.startswith(('einmalbeitrag', 'freistellungsauftrag')) else wert * 100
+                for key, wert in p.items() if key != 'laufzeit'}
+        daten.append(dict(data, laufzeit=p['laufzeit'] + 1, umschichtungen=fall['umschichtungen']))
+    return daten
+
+
+def erwartet(data):
+    """Final values of one parameters.json dict on the single-scenario path."""
+    s = Szenario.from_json(data)
+    police = simulate_police(s)
+    return {
+        'fondspolice_rentenkapital': police.rentenkapital,
+        'fondspolice': police.nach_steuer,
+        'fondssparplan': simulate_depot(s).nach_steuer,
+    }
+
+
+def assert_ergebnisse(ist, soll, rtol=RTOL, index=None):
+    for key in ERGEBNIS_FELDER:
+        wert = ist[key] if index is None else ist[key][index]
+        np.testing.assert_allclose(wert, soll[key], rtol=rtol, atol=1e-8, err_msg=key)
+
+
+def assert_tabellen(ist, soll):
+    """Both products' tables are identical, bit for bit."""
+    for produkt in ('police', 'depot'):
+        assert ist[produkt].spalten == soll[produkt].spalten
+        np.testing.assert_array_equal(ist[produkt].daten, soll[produkt].daten, err_msg=produkt)
+
+
+@pytest.fixture
+def kunden():
+    """Parameter dicts of every mode with varied laufzeit, rollovers and Renditen."""
+    def erzeugen(n=24, modi=MODI):
+        rng = np.random.default_rng(7)
+        daten = []
+        for k in range(n):
+            data = szenario(int(rng.integers(1, 41)), int(rng.integers(0, 6)), modi[k % len(modi)])
+            data['rendite_aktienfonds_police'] = float(rng.choice([-3.0, 0.0, 4.0, 8.0]))
+            data['rendite_aktienfonds_sparplan'] = float(rng.choice([-2.0, 3.0, 7.0]))
+            data['effektivkosten_police'] = float(rng.choice([0.5, 1.0, 1.8]))
+            daten.append(data)
+        return daten
+    return erzeugen
@@ -0,0 +1,25 @@
+"""Scenarios shared by the tests and the benchmarks."""
+from vergleichsrechner import PRODUKTE, SparplanParameter, Szenario, Umschichtung
+
+MODI = ('jaehrlich', 'monatlich', 'portfolio')
+
+
+def szenario(laufzeit=30, anzahl_umschichtungen=3, modus='jaehrlich'):
+    """A parameters.json dict with every tax step active, in one of ``MODI``."""
+    umschichtungen = tuple(
+        Umschichtung(1 + k * laufzeit // (anzahl_umschichtungen + 1), PRODUKTE[(k + 1) % len(PRODUKTE)],
+                     1.0 if k % 2 else 0.5)
+        for k in range(anzahl_umschichtungen)
+    )
+    sparplan = SparplanParameter(
+        rendite_aktienfonds=7.0, rendite_mischfonds=4.5, rendite_rentenfonds=2.0, freistellungsauftrag=1000,
+        teilfreistellung_aktienfonds=30.0, teilfreistellung_mischfonds=15.0, basiszins=2.29, effektivkosten=0.5,
+        steuerlast=26.375, sparrate=100, dynamik=2.0, beitragskosten=2.5,
+    )
+    data = Szenario(sparplan=sparplan, laufzeit=laufzeit, umschichtungen=umschichtungen).to_json()
+    if modus == 'monatlich':
+        data.update(monatlich=True, sparrate_police=100, dynamik_police=2.0, beitragskosten_police=4.0)
+    elif modus == 'portfolio':
+        data['umschichtungen'] = [dict(u, umschichten_von=PRODUKTE[k % len(PRODUKTE)])
+                                  for k, u in enumerate(data['umschichtungen'])]
+    return data
@@ -0,0 +1,67 @@
+import datetime as dt
+import io
+import json
+
+import numpy as np
+import pytest
+
+from conftest import szenario
+from vergleichsrechner import Szenario, simulate_depot, simulate_police
+from vergleichsrechner.ablage import Ablage, main
+
+
+@pytest.fixture
+def ablage():
+    ablage = Ablage()
+    yield ablage
+    ablage.close()
+
+
+def test_speichern_und_laden(ablage):
+    """A stored scenario reads back with its inputs and bit-identical tables."""
+    s = Szenario.from_json(szenario(12, 3, 'portfolio'))
+    id = ablage.speichere(' Muster ', s, erstellt=dt.datetime(2024, 5, 1, 9, 30))
+    gespeichert = ablage.laden(id)
+    assert (gespeichert.kunde, gespeichert.erstellt, gespeichert.szenario) == ('Muster', '2024-05-01T09:30:00', s)
+    police, depot = simulate_police(s), simulate_depot(s)
+    assert gespeichert.police.tabelle.spalten == police.tabelle.spalten
+    np.testing.assert_array_equal(gespeichert.police.tabelle.daten, police.tabelle.daten)
+    np.testing.assert_array_equal(gespeichert.depot.tabelle.daten, depot.tabelle.daten)
+    assert (gespeichert.police.nach_steuer, gespeichert.depot.nach_steuer) == (police.nach_steuer, depot.nach_steuer)
+    ablage.loesche(id)
+    with pytest.raises(KeyError):
+        ablage.laden(id)
+    with pytest.raises(ValueError, match='Kundennamen'):
+        ablage.speichere('  ', s)
+
+
+def test_suche(ablage):
+    s = Szenario.from_json(szenario(3, 0))
+    for kunde, tag in (('Muster', 1), ('mustermann', 2), ('Meier', 3), ('Mu_x', 4), ('Muster', 5)):
+        ablage.speichere(kunde, s, police=simulate_police(s), depot=simulate_depot(s), erstellt=dt.date(2024, 3, tag))
+    assert [e.kunde for e in ablage.suche('mu')] == ['Muster', 'Mu_x', 'mustermann', 'Muster']
+    assert [e.kunde for e in ablage.suche('MU_')] == ['Mu_x']
+    assert [e.erstellt for e in ablage.suche('muster', von=dt.date(2024, 3, 2), bis=dt.date(2024, 3, 4))] == [
+        '2024-03-02']
+    assert len(ablage.suche(limit=2)) == 2 and len(ablage) == 5
+
+
+def test_import(tmp_path):
+    """Directories and JSONL files are imported like ``runner`` reads them; broken inputs are counted."""
+    (tmp_path / 'ordner').mkdir()
+    (tmp_path / 'ordner' / 'Schmidt.json').write_text(json.dumps(szenario(5, 1)), encoding='utf-8')
+    (tmp_path / 'ordner' / 'kaputt.json').write_text('{"laufzeit": ', encoding='utf-8')
+    zeilen = [dict(szenario(4, 0), kunde='Lange', erstellt='2023-01-02T03:04:05'), szenario(6, 2)]
+    (tmp_path / 'kunden.jsonl').write_text('\n'.join(map(json.dumps, zeilen)), encoding='utf-8')
+    datenbank = tmp_path / 'szenarien.db'
+    assert main([str(datenbank), '--import', str(tmp_path / 'ordner')]) == 1
+    ablage = Ablage(datenbank)
+    try:
+        assert ablage.importiere(tmp_path / 'kunden.jsonl', kunde='Vorgabe', log=io.StringIO()) == (2, 0)
+        eintraege = {e.kunde: e for e in ablage.suche()}
+        assert sorted(eintraege) == ['Lange', 'Schmidt', 'Vorgabe']
+        assert eintraege['Lange'].erstellt == '2023-01-02T03:04:05'
+        assert eintraege['Vorgabe'].quelle == f'{tmp_path / "kunden.jsonl"}:2'
+        assert ablage.laden(eintraege['Schmidt'].id).szenario == Szenario.from_json(szenario(5, 1))
+    finally:
+        ablage.close()
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, assert_ergebnisse, erwartet, szenario
+from vergleichsrechner import Szenario
+from vergleichsrechner.backtest import Renditen, auswertung, backtest, lies_renditen, main, renditen_aus_spalten
+
+JAHRE = 12
+RENDITEN = {'aktienfonds': 7.0, 'mischfonds': 4.5, 'rentenfonds': 2.0}
+
+
+def _gleiche_renditen(data):
+    # The backtest gives both products the same historical return
+    return dict(data, **{f'rendite_{name}_police': wert for name, wert in RENDITEN.items()},
+                **{f'rendite_{name}_sparplan': wert for name, wert in RENDITEN.items()})
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_konstante_reihe(modus):
+    """A constant series gives every window the deterministic projection of its laufzeit."""
+    data = _gleiche_renditen(szenario(JAHRE, 3, modus))
+    renditen = Renditen(np.arange(2000, 2000 + JAHRE), np.tile(np.array(list(RENDITEN.values())) / 100, (JAHRE, 1)))
+    p = Szenario.from_json(data).to_parameter()
+    ergebnisse = backtest(p, data['umschichtungen'], renditen)
+    assert ergebnisse['startjahre'].tolist() == list(range(2000, 2000 + JAHRE))
+    for laufzeit in (1, 5, JAHRE):
+        soll = erwartet(dict(data, laufzeit=laufzeit))
+        for start in range(JAHRE - laufzeit + 1):
+            assert_ergebnisse({key: ergebnisse[key][laufzeit - 1, start] for key in ERGEBNIS_FELDER}, soll)
+        assert np.isnan(ergebnisse['vorteil'][laufzeit - 1, JAHRE - laufzeit + 1:]).all()
+    zusammenfassung = auswertung(ergebnisse)
+    assert zusammenfassung['fenster'].tolist() == list(range(JAHRE, 0, -1))
+    np.testing.assert_allclose(zusammenfassung['police_vorn'] + zusammenfassung['sparplan_vorn'], 1.0)
+
+
+def test_basiszins_je_jahr():
+    """A basiszins column replaces the input year by year."""
+    data = _gleiche_renditen(szenario(4, 0))
+    basiszins = np.array([0.0, 1.0, 2.29, 3.0])
+    renditen = renditen_aus_spalten({'jahr': [2001, 2000, 2002, 2003], 'aktienfonds': [7.0] * 4,
+                                     'mischfonds': [4.5] * 4, 'rentenfonds': [2.0] * 4,
+                                     'basiszins': basiszins[[1, 0, 2, 3]]})
+    np.testing.assert_array_equal(renditen.basiszins, basiszins / 100)
+    ergebnisse = backtest(Szenario.from_json(data).to_parameter(), [], renditen)
+    for start in range(4):
+        soll = erwartet(dict(data, laufzeit=1, basiszins_sparplan=basiszins[start]))
+        assert ergebnisse['fondssparplan'][0, start] == pytest.approx(soll['fondssparplan'], rel=1e-12)
+
+
+def test_monatswerte():
+    """Months compound to calendar years; incomplete years at either end are dropped."""
+    jahr = [1999] * 2 + [2000] * 12 + [2001] * 12 + [2002] * 3
+    monat = [11, 12] + list(range(1, 13)) * 2 + [1, 2, 3]
+    spalten = {'jahr': jahr, 'monat': monat, 'aktienfonds': [1.0] * len(jahr), 'mischfonds': [0.5] * len(jahr),
+               'rentenfonds': [0.0] * len(jahr)}
+    renditen = renditen_aus_spalten(spalten)
+    assert renditen.jahre.tolist() == [2000, 2001]
+    np.testing.assert_allclose(renditen.rendite[:, 0], 1.01 ** 12 - 1)
+    np.testing.assert_allclose(renditen.rendite[:, 1], 1.005 ** 12 - 1)
+
+
+@pytest.mark.parametrize('spalten, meldung', [
+    ({'jahr': [2000], 'aktienfonds': [1.0], 'mischfonds': [1.0]}, 'fehlende Spalten: rentenfonds'),
+    ({'jahr': [2000, 2002], 'aktienfonds': [1.0, 1.0], 'mischfonds': [1.0, 1.0], 'rentenfonds': [1.0, 1.0]},
+     'lückenlos'),
+    ({'jahr': [2000, 2001], 'aktienfonds': [1.0, np.nan], 'mischfonds': [1.0, 1.0], 'rentenfonds': [1.0, 1.0]},
+     'fehlende Werte'),
+    ({'jahr': [2000], 'monat': [13], 'aktienfonds': [1.0], 'mischfonds': [1.0], 'rentenfonds': [1.0]}, 'monat'),
+    ({'jahr': [2000], 'monat': [1], 'aktienfonds': [1.0], 'mischfonds': [1.0], 'rentenfonds': [1.0]},
+     'keine vollständigen Jahre'),
+])
+def test_ungueltig(spalten, meldung):
+    with pytest.raises(ValueError, match=meldung):
+        renditen_aus_spalten(spalten)
+
+
+def test_csv_mit_dezimalkomma(tmp_path):
+    komma = tmp_path / 'renditen.csv'
+    komma.write_text('Jahr;Aktienfonds;Mischfonds;Rentenfonds\n2000;1.234,5;4,5;-2\n2001;7;4,5;2\n\n',
+                     encoding='utf-8')
+    punkt = tmp_path / 'punkt.csv'
+    punkt.write_text('jahr,aktienfonds,mischfonds,rentenfonds\n2000,1234.5,4.5,-2\n2001,7,4.5,2\n', encoding='utf-8')
+    for renditen in (lies_renditen(komma), lies_renditen(punkt)):
+        np.testing.assert_allclose(renditen.rendite, [[12.345, 0.045, -0.02], [0.07, 0.045, 0.02]])
+
+
+def test_parquet(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    pfad = tmp_path / 'renditen.parquet'
+    pq.write_table(pa.table({'jahr': [2000, 2001], 'aktienfonds': [7.0, -3.0], 'mischfonds': [4.5, 1.0],
+                             'rentenfonds': [2.0, 0.5]}), pfad)
+    np.testing.assert_allclose(lies_renditen(pfad).rendite, [[0.07, 0.045, 0.02], [-0.03, 0.01, 0.005]])
+
+
+def test_main(tmp_path, capsys):
+    reihe = tmp_path / 'renditen.csv'
+    reihe.write_text('jahr,aktienfonds,mischfonds,rentenfonds\n' +
+                     ''.join(f'{2000 + k},{7 - k},4.5,2\n' for k in range(6)), encoding='utf-8')
+    parameter = tmp_path / 'parameters.json'
+    parameter.write_text(json.dumps(Szenario().to_json()), encoding='utf-8')
+    assert main([str(reihe), str(parameter), '--laufzeit', '3']) == 0
+    zeilen = capsys.readouterr().out.splitlines()
+    assert len(zeilen) == 2 and zeilen[1].split('\t')[:2] == ['3', '4']
+    assert main([str(reihe), str(parameter), '--laufzeit', '7']) == 1
@@ -0,0 +1,40 @@
+import numpy as np
+
+from conftest import ERGEBNIS_FELDER, assert_ergebnisse, baseline_als_json, erwartet, lade_baseline, szenario
+from vergleichsrechner import Szenario, simulate, simulate_batch
+from vergleichsrechner.batch import VERLAUF_DEPOT, VERLAUF_POLICE, parameter_arrays, simulate_arrays
+
+
+def test_batch_baseline():
+    faelle = lade_baseline()
+    ergebnisse = simulate_batch(baseline_als_json())
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(ergebnisse[key], [fall[key] for fall in faelle], rtol=1e-9, err_msg=key)
+
+
+def test_batch_wie_einzeln(kunden):
+    """Mixed modes in one batch give every client the single-scenario result."""
+    daten = kunden(30)
+    ergebnisse = simulate_batch(daten, chunk_size=7)
+    for i, data in enumerate(daten):
+        assert_ergebnisse(ergebnisse, erwartet(data), index=i)
+
+
+def test_chunks(kunden):
+    """Splitting the clients into chunks does not change a single result."""
+    daten = kunden(20, modi=('jaehrlich',))
+    ganz = simulate_batch(daten)
+    for key, werte in simulate_batch(daten, chunk_size=3).items():
+        np.testing.assert_array_equal(werte, ganz[key], err_msg=key)
+
+
+def test_verlauf_wie_tabellen():
+    """The yearly columns of a batch are those of the engine tables."""
+    daten = [szenario(25, 3), szenario(10, 1), szenario(1, 0)]
+    ergebnisse = simulate_arrays(parameter_arrays(daten), [data['umschichtungen'] for data in daten], verlauf=True)
+    for i, data in enumerate(daten):
+        tabellen = simulate(Szenario.from_json(data).to_parameter(), data['umschichtungen'])
+        for produkt, spalten in (('police', VERLAUF_POLICE), ('depot', VERLAUF_DEPOT)):
+            for name in spalten:
+                np.testing.assert_allclose(ergebnisse['verlauf'][produkt][name][:data['laufzeit'], i],
+                                           tabellen[produkt][name], rtol=1e-12, err_msg=f'{produkt}: {name}')
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from conftest import szenario
+from vergleichsrechner import Szenario
+from vergleichsrechner.cache import LRUCache, cache_key, memoize, simulate_cached
+from vergleichsrechner.engine import Projektion, simulate
+from vergleichsrechner.portfolio import simulate_portfolio
+from vergleichsrechner.sparrate import simulate_sparrate
+
+
+def test_cache_key():
+    """Dict order does not change the key; list order and values do."""
+    a = {'x': 1.0, 'y': [1, 2], 'z': np.float64(0.5)}
+    b = {'z': 0.5, 'y': [1, 2], 'x': 1.0}
+    assert cache_key('simulate', a) == cache_key('simulate', b)
+    assert cache_key('simulate', a) != cache_key('simulate', dict(b, y=[2, 1]))
+    assert cache_key('simulate', a) != cache_key('simulate', dict(b, x=1.0000001))
+    assert cache_key(np.arange(3)) == cache_key([0, 1, 2])
+    with pytest.raises(TypeError, match='Cache-Schlüssel'):
+        cache_key(object())
+
+
+def test_lru_verdraengt_aelteste():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.get('b') is None and cache.misses == 1
+
+
+def test_lru_bytes():
+    cache = LRUCache(10, max_bytes=2000)
+    for key in range(3):
+        cache.put(key, np.zeros(100))
+    assert len(cache) == 2 and 0 not in cache
+    assert cache.bytes == 1600
+    cache.put(1, np.zeros(10))
+    assert cache.bytes == 880
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_memoize_zwei_ebenen():
+    """A hit in either tier skips the computation; results are read-only."""
+    aufrufe = []
+
+    def rechnen():
+        aufrufe.append(1)
+        return {'werte': np.arange(3.0)}
+
+    session, andere, global_cache = LRUCache(4), LRUCache(4), LRUCache(4)
+    wert = memoize('k', rechnen, session, global_cache)
+    assert memoize('k', rechnen, session, global_cache) is wert
+    assert memoize('k', rechnen, andere, global_cache) is wert
+    assert len(aufrufe) == 1 and 'k' in andere
+    with pytest.raises(ValueError):
+        wert['werte'][0] = 1.0
+
+
+@pytest.mark.parametrize('modus, referenz', [('jaehrlich', simulate), ('monatlich', simulate_sparrate),
+                                             ('portfolio', simulate_portfolio)])
+def test_simulate_cached(modus, referenz):
+    data = szenario(20, 3, modus)
+    p = Szenario.from_json(data).to_parameter()
+    session = LRUCache(4)
+    ergebnis = simulate_cached(p, data['umschichtungen'], session, Projektion())
+    assert simulate_cached(p, data['umschichtungen'], session) is ergebnis
+    soll = referenz(p, data['umschichtungen'])
+    for produkt in ('police', 'depot'):
+        np.testing.assert_array_equal(ergebnis[produkt].daten, soll[produkt].daten, err_msg=produkt)
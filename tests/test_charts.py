@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import szenario
+from vergleichsrechner import Szenario, simulate
+from vergleichsrechner.charts import CHART_CACHE, KATEGORIEN, _figuren, balken_png, balken_vega, verlauf_png, verlauf_vega
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+@pytest.fixture
+def tabellen():
+    data = szenario(8, 2)
+    return simulate(Szenario.from_json(data).to_parameter(), data['umschichtungen'])
+
+
+def test_png_zwischengespeichert(tabellen):
+    """Each chart is drawn once per data; the figure is reused and pyplot never holds one."""
+    pytest.importorskip('matplotlib')
+    import matplotlib.pyplot as plt
+
+    CHART_CACHE.clear()
+    treffer = CHART_CACHE.hits
+    png = balken_png([12000.0, 11500.5, 11800.25])
+    assert png.startswith(PNG)
+    assert balken_png((12000, 11500.5, 11800.25)) is png
+    assert balken_png([12000.0, 11500.5, 11800.0]) is not png
+    figur = _figuren['balken']
+    verlauf = verlauf_png(tabellen['police'], tabellen['depot'], 11000.0, 11200.0)
+    assert verlauf.startswith(PNG)
+    assert verlauf_png(tabellen['police'], tabellen['depot'], 11000.0, 11200.0) is verlauf
+    assert CHART_CACHE.hits == treffer + 2 and len(CHART_CACHE) == 3
+    assert _figuren['balken'] is figur and not figur.axes
+    assert plt.get_fignums() == []
+
+
+def test_vega(tabellen):
+    balken = balken_vega([12000.0, 11500.5, 11800.25])
+    assert [(d['kategorie'], d['text']) for d in balken['data']['values']] == [
+        (KATEGORIEN[0], '12.000 €'), (KATEGORIEN[1], '11.500 €'), (KATEGORIEN[2], '11.800 €')]
+    werte = verlauf_vega(tabellen['police'], tabellen['depot'], 11000.0, 11200.0)['data']['values']
+    for linie, auszahlung in ((KATEGORIEN[2], 11200.0), (KATEGORIEN[1], 11000.0), (KATEGORIEN[0], None)):
+        punkte = [d for d in werte if d['linie'] == linie]
+        jahre = len(tabellen['police']['Jahr'])
+        assert len(punkte) == jahre + (auszahlung is not None)
+        if auszahlung is not None:
+            assert punkte[-1] == {'linie': linie, 'jahr': int(tabellen['police']['Jahr'][-1]) + 1, 'wert': auszahlung}
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from conftest import assert_tabellen, lade_baseline, szenario
+from vergleichsrechner import Szenario, fondspolice_nach_steuer, simulate
+
+BASELINE = lade_baseline()
+
+
+@pytest.mark.parametrize('fall', BASELINE, ids=range(len(BASELINE)))
+def test_baseline(fall):
+    p = fall['parameter']
+    tabellen = simulate(p, fall['umschichtungen'])
+    for produkt in ('police', 'depot'):
+        for name, werte in fall[produkt].items():
+            np.testing.assert_allclose(tabellen[produkt][name], werte, rtol=1e-12, atol=1e-8,
+                                       err_msg=f'{produkt}: {name}')
+    rentenkapital = tabellen['police']['Jahresende nach Kosten'][-1]
+    assert rentenkapital == pytest.approx(fall['fondspolice_rentenkapital'], rel=1e-12)
+    nach_steuer = fondspolice_nach_steuer(rentenkapital, p['einmalbeitrag_police'], p['teilfreistellung_police'],
+                                          p['steuersatz_police'])
+    assert nach_steuer == pytest.approx(fall['fondspolice'], rel=1e-12)
+    assert tabellen['depot']['Kapital abzüglich Steuer'][-1] == pytest.approx(fall['fondssparplan'], rel=1e-12)
+
+
+def test_umschichtung_nach_laufzeit():
+    """Umschichtungen after the last year leave both tables unchanged."""
+    p = Szenario.from_json(szenario(10, 0)).to_parameter()
+    spaet = [{'jahr': 10, 'umschichten_in': 'Rentenfonds', 'anteil': 1.0},
+             {'jahr': 40, 'umschichten_in': 'Mischfonds', 'anteil': 0.5}]
+    assert_tabellen(simulate(p, spaet), simulate(p, []))
@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+import pytest
+
+from conftest import szenario
+from vergleichsrechner import Szenario, simulate, simulate_batch
+from vergleichsrechner.export import excel_bytes, export_cached, iter_csv, tabelle_csv
+
+
+@pytest.fixture
+def tabellen():
+    data = szenario(12, 3)
+    return simulate(Szenario.from_json(data).to_parameter(), data['umschichtungen'])
+
+
+def test_csv_wie_pandas(tabellen):
+    """The streamed CSV is what ``DataFrame.to_csv(index=False)`` wrote before."""
+    pd = pytest.importorskip('pandas')
+    for tabelle in tabellen.values():
+        frame = pd.DataFrame({name: tabelle[name] for name in tabelle}).round(2)
+        assert tabelle_csv(tabelle) == frame.to_csv(index=False)
+
+
+def test_csv_bloecke():
+    """Blocks of any size join to the same text."""
+    ergebnisse = simulate_batch([szenario(laufzeit, 1) for laufzeit in range(1, 12)])
+    ganz = ''.join(iter_csv(ergebnisse))
+    assert ganz.count('\n') == 12
+    for zeilen in (1, 4, 11, 100):
+        bloecke = list(iter_csv(ergebnisse, zeilen=zeilen))
+        assert ''.join(bloecke) == ganz
+        assert len(bloecke) == -(-11 // zeilen)
+    assert ''.join(iter_csv({'a': np.array([])})) == 'a\n'
+
+
+def test_excel(tabellen):
+    openpyxl = pytest.importorskip('openpyxl')
+    daten = excel_bytes(tabellen['police'], tabellen['depot'], [('Fondspolice', 12345.67)])
+    workbook = openpyxl.load_workbook(io.BytesIO(daten), read_only=True)
+    assert workbook.sheetnames == ['Zusammenfassung', 'Fondspolice', 'Fondssparplan']
+    assert list(workbook['Zusammenfassung'].values) == [('Fondspolice', 12345.67)]
+    zeilen = list(workbook['Fondssparplan'].values)
+    depot = tabellen['depot']
+    assert zeilen[0] == tuple(depot)
+    assert len(zeilen) == depot.jahre + 1
+    np.testing.assert_allclose([zeile[-1] for zeile in zeilen[1:]], depot[depot.spalten[-1]], atol=0.005)
+
+
+def test_export_cached():
+    aufrufe = []
+
+    def erzeugen():
+        aufrufe.append(1)
+        return b'daten'
+
+    eingaben = {'laufzeit': 7, 'werte': [1.5, 2.5]}
+    assert export_cached('csv', eingaben, erzeugen) == b'daten'
+    assert export_cached('csv', dict(reversed(eingaben.items())), erzeugen) == b'daten'
+    assert len(aufrufe) == 1
+    export_cached('xlsx', eingaben, erzeugen)
+    assert len(aufrufe) == 2
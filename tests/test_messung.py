@@ -0,0 +1,76 @@
+import json
+import logging
+import time
+
+import pytest
+
+from vergleichsrechner.messung import Lauf, Messung, logger, phase, protokoll_datei, starte_lauf
+
+
+def test_rollendes_fenster():
+    messung = Messung(fenster=3)
+    for sekunden in (0.5, 0.001, 0.002, 0.003):
+        messung.erfasse('engine', sekunden)
+    messung.erfasse('charts', 0.01)
+    (name, anzahl, p50, p95, letzter), charts = messung.zusammenfassung()
+    assert (name, anzahl, letzter) == ('engine', 3, pytest.approx(3.0))
+    assert p50 == pytest.approx(2.0) and p95 == pytest.approx(2.9)
+    assert charts[:2] == ('charts', 1)
+    messung.zuruecksetzen()
+    assert messung.zusammenfassung() == []
+
+
+def test_lauf_bucht_phasen():
+    """Laps and phases of a rerun are booked to it; nested phases count within the lap."""
+    messung = Messung()
+    lauf = starte_lauf('test')
+    lauf.messung = messung
+    with phase('engine'):
+        with phase('police'):
+            time.sleep(0.002)
+    lauf.zwischenzeit('rechnen')
+    with phase('engine'):
+        pass
+    phasen = lauf.beende()
+    assert list(phasen) == ['police', 'engine', 'rechnen']
+    assert phasen['rechnen'] >= phasen['engine'] >= phasen['police'] >= 2.0
+    assert [zeile[0] for zeile in messung.zusammenfassung()] == ['police', 'engine', 'rechnen', 'test']
+    assert [zeile[1] for zeile in messung.zusammenfassung()] == [1, 1, 1, 1]
+
+
+def test_phase_ohne_lauf():
+    """Outside a rerun a phase goes straight to the shared window."""
+    messung = Messung()
+    lauf = Lauf('test', messung=messung)
+    with phase('export'):
+        pass
+    assert lauf.beende() == {}
+    assert [zeile[0] for zeile in messung.zusammenfassung()] == ['test']
+
+
+def test_cprofile():
+    lauf = Lauf('test', profil='cprofile', messung=Messung())
+    sum(range(1000))
+    lauf.beende()
+    assert 'function calls' in lauf.profil
+    with pytest.raises(ValueError, match='unbekannter Profiler'):
+        Lauf('test', profil='perf')
+
+
+def test_protokoll_datei(tmp_path):
+    pfad = tmp_path / 'messung.jsonl'
+    handler_vorher = list(logger.handlers)
+    try:
+        protokoll_datei(pfad)
+        protokoll_datei(pfad)
+        assert len(logger.handlers) == len(handler_vorher) + 1
+        Lauf('rerun', sitzung='abc', messung=Messung()).beende()
+    finally:
+        for handler in set(logger.handlers) - set(handler_vorher):
+            logger.removeHandler(handler)
+            handler.close()
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+    eintrag, = (json.loads(zeile) for zeile in pfad.read_text(encoding='utf-8').splitlines())
+    assert eintrag['lauf'] == 'rerun' and eintrag['sitzung'] == 'abc'
+    assert eintrag['phasen_ms'] == {} and eintrag['gesamt_ms'] >= 0
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, erwartet, szenario
+from vergleichsrechner import Szenario
+from vergleichsrechner.montecarlo import (PRODUKTE, draw_shocks, korrelationsmatrix, lognormal_returns, perzentile,
+                                          simulate_paths)
+
+OHNE_VOLATILITAET = {'Aktienfonds': 0.0, 'Mischfonds': 0.0, 'Rentenfonds': 0.0}
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_montecarlo_ohne_volatilitaet(modus):
+    """Without volatility every path is the deterministic projection."""
+    data = szenario(20, 3, modus)
+    p = Szenario.from_json(data).to_parameter()
+    pfade = simulate_paths(p, data['umschichtungen'], pfade=5, seed=1, volatilitaet=OHNE_VOLATILITAET)
+    soll = erwartet(data)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(pfade[key], np.full(5, soll[key]), rtol=1e-10, err_msg=key)
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_seed(modus):
+    """The same seed gives the same paths, another seed other paths."""
+    data = szenario(15, 2, modus)
+    p = Szenario.from_json(data).to_parameter()
+    erste = simulate_paths(p, data['umschichtungen'], pfade=50, seed=7)
+    zweite = simulate_paths(p, data['umschichtungen'], pfade=50, seed=7)
+    andere = simulate_paths(p, data['umschichtungen'], pfade=50, seed=8)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_array_equal(erste[key], zweite[key], err_msg=key)
+        assert not np.array_equal(erste[key], andere[key]), key
+
+
+def test_momente():
+    """Simulated returns have the configured mean, volatility and correlation."""
+    z, vol = draw_shocks(1, 400000, seed=3)
+    renditen = lognormal_returns(np.array([0.06, 0.04, 0.02]), vol, z[0])
+    np.testing.assert_allclose(renditen.mean(axis=0), [0.06, 0.04, 0.02], atol=2e-3)
+    np.testing.assert_allclose(renditen.std(axis=0), vol, rtol=1e-2)
+    np.testing.assert_allclose(np.corrcoef(z[0], rowvar=False), korrelationsmatrix(), atol=1e-2)
+
+
+def test_korrelation_nicht_positiv_definit():
+    korrelation = {(PRODUKTE[0], PRODUKTE[1]): 0.9, (PRODUKTE[0], PRODUKTE[2]): 0.9, (PRODUKTE[1], PRODUKTE[2]): -0.9}
+    with pytest.raises(ValueError, match='positiv definit'):
+        draw_shocks(5, 10, korrelation=korrelation)
+
+
+def test_perzentile():
+    data = szenario(10, 1)
+    p = Szenario.from_json(data).to_parameter()
+    pfade = simulate_paths(p, data['umschichtungen'], pfade=1000, seed=2)
+    for key, werte in perzentile(pfade).items():
+        assert werte.shape == (3,)
+        assert np.all(np.diff(werte) > 0), key
+        assert werte[1] == pytest.approx(np.median(pfade[key])), key
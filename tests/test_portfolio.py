@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, assert_ergebnisse, erwartet, szenario
+from vergleichsrechner import PRODUKTE, Szenario, simulate_batch
+from vergleichsrechner.portfolio import ist_portfolio, portfolio_arrays, simulate_portfolio
+
+
+def test_ganze_umschichtung_aus_einem_fonds():
+    """Moving 100% out of the fund that holds everything is the same decision as a full switch."""
+    ganz = szenario(30, 0)
+    ganz['umschichtungen'] = [{'jahr': 10, 'umschichten_in': 'Rentenfonds', 'anteil': 1.0},
+                              {'jahr': 20, 'umschichten_in': 'Mischfonds', 'anteil': 1.0}]
+    aus = dict(ganz, umschichtungen=[dict(ganz['umschichtungen'][0], umschichten_von='Aktienfonds'),
+                                     dict(ganz['umschichtungen'][1], umschichten_von='Rentenfonds')])
+    assert not ist_portfolio(aus['umschichtungen'])
+    ergebnisse = simulate_batch([ganz, aus])
+    for key in ERGEBNIS_FELDER:
+        assert ergebnisse[key][0] == ergebnisse[key][1]
+    assert_ergebnisse(erwartet(aus), erwartet(ganz))
+    teil = dict(aus, umschichtungen=[dict(aus['umschichtungen'][0], anteil=0.5)])
+    assert ist_portfolio(teil['umschichtungen'])
+    # The year, not the position in the list, decides when an event acts
+    umgekehrt = dict(aus, umschichtungen=aus['umschichtungen'][::-1])
+    assert not ist_portfolio(umgekehrt['umschichtungen'])
+    assert_ergebnisse(erwartet(umgekehrt), erwartet(ganz))
+
+
+def _kette(data, jahre, anteil):
+    # Switches of the whole holding through every fund, each out of the fund that holds it
+    umschichtungen, von = [], PRODUKTE[0]
+    for k, jahr in enumerate(jahre):
+        nach = PRODUKTE[(k + 1) % len(PRODUKTE)]
+        umschichtungen.append({'jahr': jahr, 'umschichten_von': von, 'umschichten_in': nach, 'anteil': anteil})
+        von = nach
+    return dict(data, umschichtungen=umschichtungen)
+
+
+@pytest.mark.parametrize('jahre', ((10,), (0, 12, 25), (3, 4, 29)))
+def test_teilumschichtung_stetig(jahre):
+    """The sleeve engine gives a whole-holding chain the single engine's result, and 1 - ε almost that."""
+    ganz = _kette(szenario(30, 0), jahre, 1.0)
+    p = Szenario.from_json(ganz).to_parameter()
+    soll = erwartet(ganz)
+    assert_ergebnisse({key: werte[0] for key, werte in portfolio_arrays(p, ganz['umschichtungen']).items()}, soll)
+    jaehrlich = portfolio_arrays(p, ganz['umschichtungen'], jaehrlich=True)
+    for laufzeit in (1, 2, 11, 26, 30):
+        assert_ergebnisse({key: werte[laufzeit - 1, 0] for key, werte in jaehrlich.items()},
+                          erwartet(dict(ganz, laufzeit=laufzeit)))
+    for epsilon in (1e-6, 1e-9):
+        fast = _kette(ganz, jahre, 1 - epsilon)
+        assert ist_portfolio(fast['umschichtungen'])
+        assert_ergebnisse(erwartet(fast), soll, rtol=10 * epsilon)
+
+
+def test_teilumschichtung_monatlich_abgelehnt():
+    with pytest.raises(ValueError, match='Teilumschichtungen'):
+        simulate_batch([szenario(20, 0), dict(szenario(20, 2, 'portfolio'), monatlich=True)])
+
+
+def test_anteil_null():
+    """Moving nothing out of a sleeve leaves the contract as it was."""
+    data = szenario(20, 0)
+    nichts = dict(data, umschichtungen=[{'jahr': 0, 'umschichten_von': 'Aktienfonds', 'umschichten_in': 'Mischfonds',
+                                         'anteil': 0.0},
+                                        {'jahr': 7, 'umschichten_von': 'Aktienfonds', 'umschichten_in': 'Rentenfonds',
+                                         'anteil': 0.0}])
+    assert ist_portfolio(nichts['umschichtungen'])
+    assert_ergebnisse(erwartet(nichts), erwartet(data))
+
+
+def test_police_ohne_steuer():
+    """The police moves shares without tax, so equal Renditen make every split the same contract."""
+    data = dict(szenario(25, 3, 'portfolio'), rendite_mischfonds_police=8.0, rendite_rentenfonds_police=8.0)
+    p = Szenario.from_json(data).to_parameter()
+    police = simulate_portfolio(p, data['umschichtungen'])['police']
+    ohne = simulate_portfolio(p, [])['police']
+    for name in ('Jahresende nach Kosten', 'Kosten Fondsguthaben', 'Wertsteigerung'):
+        np.testing.assert_allclose(police[name], ohne[name], rtol=1e-12, err_msg=name)
+    assert erwartet(data)['fondspolice'] == pytest.approx(erwartet(dict(data, umschichtungen=[]))['fondspolice'],
+                                                          rel=1e-12)
+
+
+def test_arrays_wie_einzeln(kunden):
+    """Clients with different event lists in one batch get their own results."""
+    daten = kunden(12, modi=('portfolio',))
+    ergebnisse = simulate_batch(daten, chunk_size=5)
+    for i, data in enumerate(daten):
+        assert_ergebnisse(ergebnisse, erwartet(data), index=i)
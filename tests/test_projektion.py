@@ -0,0 +1,39 @@
+from conftest import assert_tabellen, szenario
+from vergleichsrechner import Projektion, Szenario, simulate
+
+
+def test_projektion_inkrementell():
+    """Every update resumes from a snapshot and still equals a fresh run."""
+    p = Szenario.from_json(szenario(20, 0)).to_parameter()
+    u = szenario(20, 4)['umschichtungen']
+    schritte = [
+        (p, []),
+        (p, u[:2]),
+        (p, u),
+        (p, u[:1] + u[2:]),
+        ({**p, 'laufzeit': 29}, u),
+        ({**p, 'laufzeit': 9}, u),
+        ({**p, 'effektivkosten_police': 0.015}, u),
+        ({**p, 'basiszins_sparplan': 0.03}, u),
+        ({**p, 'laufzeit': 24, 'rendite_mischfonds_sparplan': 0.05}, u[1:]),
+    ]
+    projektion = Projektion()
+    for parameter, umschichtungen in schritte:
+        assert_tabellen(projektion.update(parameter, umschichtungen), simulate(parameter, umschichtungen))
+
+
+def test_startjahr():
+    """Only the years from the first change (or the old last year) on are recomputed, per product."""
+    p = Szenario.from_json(szenario(20, 0)).to_parameter()
+    u = szenario(20, 4)['umschichtungen']
+    projektion = Projektion()
+    projektion.update(p, u[:2])
+    assert (projektion.start_police, projektion.start_depot) == (0, 0)
+    projektion.update(p, u[:3])
+    assert projektion.start_police == projektion.start_depot == u[2]['jahr']
+    projektion.update({**p, 'laufzeit': 29}, u[:3])
+    assert projektion.start_police == projektion.start_depot == 19
+    projektion.update({**p, 'laufzeit': 29, 'effektivkosten_police': 0.015}, u[:3])
+    assert (projektion.start_police, projektion.start_depot) == (0, 30)
+    projektion.update({**p, 'laufzeit': 29, 'effektivkosten_police': 0.015, 'basiszins_sparplan': 0.03}, u[:3])
+    assert (projektion.start_police, projektion.start_depot) == (30, 0)
@@ -0,0 +1,72 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from conftest import assert_ergebnisse, erwartet, szenario
+from vergleichsrechner.runner import main, rechne_chunk
+
+
+def test_ungueltige_zeilen():
+    """Lines that are not a JSON object are reported; the rest of the chunk is computed."""
+    gut = [szenario(10, 2), szenario(5, 0, 'monatlich')]
+    items = [
+        ('k.jsonl:1', 'zeile', json.dumps(gut[0])),
+        ('k.jsonl:2', 'zeile', '[1, 2]'),
+        ('k.jsonl:3', 'zeile', '42'),
+        ('k.jsonl:4', 'zeile', '{"laufzeit": '),
+        ('k.jsonl:5', 'zeile', json.dumps(gut[1])),
+    ]
+    rows, fehler = rechne_chunk(items, overrides={'basiszins_sparplan': 3.0})
+    assert [quelle for quelle, _ in fehler] == ['k.jsonl:2', 'k.jsonl:3', 'k.jsonl:4']
+    assert [row[0] for row in rows] == ['k.jsonl:1', 'k.jsonl:5']
+    for row, data in zip(rows, gut):
+        soll = erwartet(dict(data, basiszins_sparplan=3.0))
+        assert_ergebnisse(dict(zip(('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan'), row[1:])), soll)
+
+
+def _zeilen(pfad):
+    with open(pfad, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_jsonl_in_reihenfolge(tmp_path, workers):
+    """Rows come back in input order whatever the chunking and the number of processes."""
+    daten = [szenario(laufzeit, laufzeit % 4) for laufzeit in range(1, 12)]
+    eingabe = tmp_path / 'kunden.jsonl'
+    eingabe.write_text(''.join(json.dumps(data) + '\n\n' for data in daten), encoding='utf-8')
+    ausgabe = tmp_path / 'ergebnisse.csv'
+    assert main([str(eingabe), '--out', str(ausgabe), '--workers', str(workers), '--chunk-size', '3']) == 0
+    zeilen = _zeilen(ausgabe)
+    assert [zeile['quelle'] for zeile in zeilen] == [f'{eingabe}:{2 * i + 1}' for i in range(len(daten))]
+    for zeile, data in zip(zeilen, daten):
+        assert_ergebnisse({key: float(wert) for key, wert in zeile.items() if key != 'quelle'}, erwartet(data))
+
+
+def test_ordner_mit_fehlern(tmp_path):
+    """A directory is searched recursively in sorted order; broken files fail the run but not the others."""
+    daten = {'b/parameters.json': szenario(8, 1), 'a/c/parameters.json': szenario(3, 0, 'monatlich')}
+    for name, data in daten.items():
+        (tmp_path / name).parent.mkdir(parents=True)
+        (tmp_path / name).write_text(json.dumps(data), encoding='utf-8')
+    (tmp_path / 'b' / 'kaputt.json').write_text('[]', encoding='utf-8')
+    ausgabe = tmp_path / 'ergebnisse.csv'
+    assert main([str(tmp_path), '--out', str(ausgabe), '--workers', '1', '--set', 'basiszins_sparplan=3.0']) == 1
+    zeilen = _zeilen(ausgabe)
+    assert [zeile['quelle'] for zeile in zeilen] == [str(tmp_path / name) for name in sorted(daten)]
+    for zeile in zeilen:
+        soll = erwartet(dict(daten[str(Path(zeile['quelle']).relative_to(tmp_path))], basiszins_sparplan=3.0))
+        assert_ergebnisse({key: float(wert) for key, wert in zeile.items() if key != 'quelle'}, soll)
+
+
+def test_parquet(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    eingabe = tmp_path / 'kunden.jsonl'
+    eingabe.write_text(json.dumps(szenario(12, 2)), encoding='utf-8')
+    ausgabe = tmp_path / 'ergebnisse.parquet'
+    assert main([str(eingabe), '--out', str(ausgabe), '--workers', '1']) == 0
+    tabelle = pq.read_table(ausgabe).to_pylist()
+    assert [zeile.pop('quelle') for zeile in tabelle] == [f'{eingabe}:1']
+    assert_ergebnisse(tabelle[0], erwartet(szenario(12, 2)))
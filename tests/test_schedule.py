@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from vergleichsrechner.schedule import (PRODUKTE, build_schedule, first_difference, in_jahresfolge, per_year,
+                                        schedule_arrays)
+
+
+def _nachschlagen(laufzeit, umschichtungen):
+    """Schedule by rescanning the listed events for every year, as the app did before the schedule."""
+    produkt, jn, anteil = [], [], []
+    for i in range(laufzeit + 1):
+        name, flag, share = 'Aktienfonds', 0, 0.0
+        for event in umschichtungen:
+            if event['jahr'] <= i:
+                name = event['umschichten_in']
+            if event['jahr'] == i:
+                flag, share = 1, event['anteil']
+        produkt.append(PRODUKTE.index(name) if name in PRODUKTE else 0)
+        jn.append(flag)
+        anteil.append(share)
+    return produkt, jn, anteil
+
+
+def _zufaellig(rng, laufzeit):
+    namen = PRODUKTE + ('Geldmarkt',)
+    return [{'jahr': int(rng.integers(-2, laufzeit + 3)), 'umschichten_in': namen[rng.integers(len(namen))],
+             'anteil': float(rng.choice([0.25, 0.5, 1.0]))} for _ in range(rng.integers(0, 7))]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_wie_nachschlagen(seed):
+    """Unsorted, repeated, negative and late years and unknown names resolve like the per-year rescan."""
+    rng = np.random.default_rng(seed)
+    laufzeit = int(rng.integers(0, 25))
+    umschichtungen = _zufaellig(rng, laufzeit)
+    produkt, jn, anteil = _nachschlagen(laufzeit, umschichtungen)
+    schedule = build_schedule(laufzeit, umschichtungen)
+    np.testing.assert_array_equal(schedule['produkt'], produkt)
+    np.testing.assert_array_equal(schedule['jn'], jn)
+    np.testing.assert_array_equal(schedule['anteil'], anteil)
+    assert schedule['letztes'].tolist() == [False] * laufzeit + [True]
+
+
+def test_arrays_wie_einzeln():
+    rng = np.random.default_rng(1)
+    laufzeit = rng.integers(0, 25, size=30)
+    umschichtungen = [_zufaellig(rng, int(l)) for l in laufzeit]
+    code, jn, anteil = schedule_arrays(laufzeit, umschichtungen)
+    assert code.shape == (laufzeit.max() + 1, 30)
+    for i, (l, events) in enumerate(zip(laufzeit, umschichtungen)):
+        schedule = build_schedule(int(l), events)
+        np.testing.assert_array_equal(code[:l + 1, i], schedule['produkt'])
+        np.testing.assert_array_equal(jn[:l + 1, i], schedule['jn'])
+        np.testing.assert_array_equal(anteil[:l + 1, i], schedule['anteil'])
+        assert not jn[l + 1:, i].any()
+
+
+def test_leer():
+    assert len(build_schedule(-1, [])) == 0
+    code, jn, anteil = schedule_arrays(np.array([], dtype=np.int64), [])
+    assert code.shape == jn.shape == anteil.shape == (0, 0)
+
+
+def test_in_jahresfolge():
+    """Only lists with moves between funds are sorted by year; ties keep their listed order."""
+    zurueck = [{'jahr': 5, 'umschichten_in': 'Rentenfonds', 'anteil': 1.0},
+               {'jahr': 2, 'umschichten_in': 'Mischfonds', 'anteil': 1.0}]
+    assert in_jahresfolge(zurueck) is zurueck
+    von = [dict(u, umschichten_von='Aktienfonds') for u in zurueck]
+    von.insert(1, {'jahr': 5, 'umschichten_in': 'Mischfonds', 'umschichten_von': 'Rentenfonds', 'anteil': 0.5})
+    assert in_jahresfolge(von) == [von[2], von[0], von[1]]
+
+
+def test_per_year():
+    schedule = build_schedule(4, [{'jahr': 2, 'umschichten_in': 'Rentenfonds', 'anteil': 1.0}])
+    assert per_year(schedule, 0.06, 0.04, 0.02).tolist() == [0.06, 0.06, 0.02, 0.02, 0.02]
+
+
+def test_first_difference():
+    u = [{'jahr': 3, 'umschichten_in': 'Mischfonds', 'anteil': 1.0}]
+    assert first_difference(build_schedule(9, u), build_schedule(9, u)) == 10
+    assert first_difference(build_schedule(9, []), build_schedule(9, u)) == 3
+    # The old last year is no longer the last one
+    assert first_difference(build_schedule(9, u), build_schedule(14, u)) == 9
+    assert first_difference(build_schedule(9, u), build_schedule(9, [dict(u[0], anteil=0.5)])) == 3
+    assert first_difference(build_schedule(-1, []), build_schedule(9, u)) == 0
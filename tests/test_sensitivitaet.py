@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, erwartet, szenario
+from vergleichsrechner import Szenario
+from vergleichsrechner.sensitivitaet import SCHRITT_BETRAG, SCHRITT_PROZENT, ist_betrag, rangfolge, sensitivitaet
+
+
+def _json_schritt(feld, schritt):
+    # parameters.json keeps rates in percent
+    return schritt if ist_betrag(feld) else schritt * 100
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_wie_einzelne_laeufe(modus):
+    """Derivatives match central differences of single runs; tornado steps are single runs."""
+    data = szenario(15, 2, modus)
+    ergebnisse = sensitivitaet(Szenario.from_json(data).to_parameter(), data['umschichtungen'])
+    basis = erwartet(data)
+    for i, feld in enumerate(ergebnisse['felder']):
+        h = 1e-3 if ist_betrag(feld) else 1e-7
+        plus = erwartet(dict(data, **{feld: data.get(feld, 0) + _json_schritt(feld, h)}))
+        minus = erwartet(dict(data, **{feld: data.get(feld, 0) - _json_schritt(feld, h)}))
+        schritt = SCHRITT_BETRAG if ist_betrag(feld) else SCHRITT_PROZENT
+        assert ergebnisse['schritt'][i] == schritt
+        hoch = erwartet(dict(data, **{feld: data.get(feld, 0) + _json_schritt(feld, schritt)}))
+        for key in ERGEBNIS_FELDER:
+            soll = (plus[key] - minus[key]) / (2 * h)
+            assert ergebnisse[key]['ableitung'][i] == pytest.approx(soll, rel=1e-4, abs=1e-4), (feld, key)
+            assert ergebnisse[key]['hoch'][i] == pytest.approx(hoch[key] - basis[key], rel=1e-9, abs=1e-7), \
+                (feld, key)
+    for key in ERGEBNIS_FELDER:
+        assert ergebnisse[key]['wert'] == pytest.approx(basis[key], rel=1e-10)
+
+
+def test_bekannte_ableitungen():
+    """The police is linear in its Einmalbeitrag, and the Steuersatz does not touch the Rentenkapital."""
+    data = szenario(20, 3)
+    ergebnisse = sensitivitaet(Szenario.from_json(data).to_parameter(), data['umschichtungen'])
+    felder = list(ergebnisse['felder'])
+    rentenkapital = ergebnisse['fondspolice_rentenkapital']
+    assert rentenkapital['ableitung'][felder.index('einmalbeitrag_police')] == pytest.approx(
+        rentenkapital['wert'] / 10000, rel=1e-9)
+    assert rentenkapital['ableitung'][felder.index('steuersatz_police')] == 0.0
+    assert ergebnisse['fondssparplan']['ableitung'][felder.index('rendite_aktienfonds_police')] == 0.0
+
+
+def test_untergrenze_null():
+    """Inputs at 0 that cannot be negative take a one-sided difference and a tornado step that stays at 0."""
+    data = dict(szenario(10, 0), freistellungsauftrag_sparplan=0, effektivkosten_sparplan=0.0)
+    felder = ('freistellungsauftrag_sparplan', 'effektivkosten_sparplan', 'rendite_rentenfonds_sparplan')
+    ergebnisse = sensitivitaet(Szenario.from_json(data).to_parameter(), data['umschichtungen'], felder)
+    depot = ergebnisse['fondssparplan']
+    assert depot['tief'][0] == depot['tief'][1] == 0.0
+    assert depot['ableitung'][0] > 0 > depot['ableitung'][1]
+    schritt = erwartet(dict(data, effektivkosten_sparplan=1e-3))['fondssparplan'] - depot['wert']
+    assert depot['ableitung'][1] == pytest.approx(schritt / 1e-5, rel=1e-3)
+
+
+def test_rangfolge():
+    ergebnisse = {'fondspolice': {'hoch': np.array([1.0, -5.0, 2.0]), 'tief': np.array([-1.0, 4.0, -2.0])},
+                  'fondssparplan': {'hoch': np.array([3.0, 0.0, 2.0]), 'tief': np.array([-0.5, 0.0, -6.0])}}
+    assert rangfolge(ergebnisse).tolist() == [2, 1, 0]
@@ -0,0 +1,101 @@
+import json
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, MODI, assert_ergebnisse, erwartet, szenario
+from vergleichsrechner.service import MicroBatcher, antwort, pruefe_parameter, start_server
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, pfad, daten):
+    anfrage = urllib.request.Request(f'http://127.0.0.1:{server.server_port}{pfad}', json.dumps(daten).encode('utf-8'),
+                                     {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(anfrage, timeout=30) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+@pytest.mark.parametrize('modus', MODI)
+def test_einzeln_wie_batch(server, modus):
+    data = szenario(25, 3, modus)
+    status, einzeln = _post(server, '/vergleich', data)
+    assert status == 200
+    status, batch = _post(server, '/vergleich/batch', [szenario(10, 0), data])
+    assert status == 200
+    soll = erwartet(data)
+    assert_ergebnisse(einzeln, soll)
+    assert_ergebnisse(batch, soll, index=1)
+    assert einzeln['depot']['Kapital abzüglich Steuer'][-1] == pytest.approx(soll['fondssparplan'], rel=1e-10)
+    assert einzeln['police']['Jahresende nach Kosten'][-1] == pytest.approx(soll['fondspolice_rentenkapital'],
+                                                                          rel=1e-10)
+
+
+def test_micro_batch_gemischt(kunden):
+    """Clients of every mode evaluated in one micro-batch get their own engine's result."""
+    daten = kunden(12)
+    batcher = MicroBatcher(max_wait=0.5)
+    try:
+        futures = [batcher.submit(pruefe_parameter(data)) for data in daten]
+        ergebnisse = [future.result(timeout=30) for future in futures]
+    finally:
+        batcher.close()
+    assert batcher.batches < len(daten)
+    for data, (werte, index) in zip(daten, ergebnisse):
+        assert_ergebnisse(antwort(werte, index, tabellen=False), erwartet(data))
+
+
+def test_micro_batch_fehler_einzeln():
+    """A parameter set the engine rejects fails its own request only."""
+    daten = [szenario(15, 2), dict(szenario(15, 2, 'portfolio'), monatlich=True), szenario(8, 1, 'monatlich')]
+    batcher = MicroBatcher(max_wait=0.5)
+    try:
+        futures = [batcher.submit(data) for data in daten]
+        with pytest.raises(ValueError, match='Teilumschichtungen'):
+            futures[1].result(timeout=30)
+        for i in (0, 2):
+            werte, index = futures[i].result(timeout=30)
+            assert_ergebnisse(antwort(werte, index, tabellen=False), erwartet(daten[i]))
+    finally:
+        batcher.close()
+
+
+@pytest.mark.parametrize('aenderung, meldung', [
+    ({'monatlich': True}, 'Teilumschichtungen'),
+    ({'sparrate_police': -100}, 'sparrate_police'),
+    ({'dynamik_sparplan': 'viel'}, 'dynamik_sparplan'),
+    ({'monatlich': 'ja'}, 'monatlich'),
+    ({'effektivkosten_police': float('nan')}, 'effektivkosten_police'),
+    ({'einmalbeitrag_sparplan': float('inf')}, 'einmalbeitrag_sparplan'),
+    ({'umschichtungen': [{'jahr': 5, 'umschichten_in': 'Rentenfonds', 'anteil': 5.0}]}, 'anteil'),
+    ({'umschichtungen': [{'jahr': 5, 'umschichten_in': 'Rentenfonds', 'anteil': -1.0}]}, 'anteil'),
+])
+def test_ungueltig(server, aenderung, meldung):
+    data = dict(szenario(20, 2, 'portfolio'), **aenderung)
+    status, einzeln = _post(server, '/vergleich', data)
+    assert status == 400 and meldung in einzeln['fehler']
+    status, batch = _post(server, '/vergleich/batch', [szenario(10, 0), data])
+    assert status == 400 and batch['fehler'].startswith('Eintrag 1:') and meldung in batch['fehler']
+
+
+def test_batch_csv(server):
+    daten = [szenario(10, 2, modus) for modus in MODI]
+    anfrage = urllib.request.Request(f'http://127.0.0.1:{server.server_port}/vergleich/batch?format=csv',
+                                     json.dumps(daten).encode('utf-8'))
+    with urllib.request.urlopen(anfrage, timeout=30) as r:
+        zeilen = r.read().decode('utf-8').splitlines()
+    assert zeilen[0].split(',') == list(ERGEBNIS_FELDER)
+    werte = np.array([[float(x) for x in zeile.split(',')] for zeile in zeilen[1:]])
+    for i, data in enumerate(daten):
+        assert_ergebnisse(dict(zip(ERGEBNIS_FELDER, werte[i])), erwartet(data))
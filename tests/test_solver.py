@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pytest
+
+from conftest import MODI, szenario
+from vergleichsrechner import Szenario, simulate_depot, simulate_police
+from vergleichsrechner.solver import break_even, break_even_batch
+
+
+def _einzeln(data, feld, von, bis):
+    s = Szenario.from_json(data)
+    return break_even(s.to_parameter(), s.umschichtungen_json(), feld, von, bis)
+
+
+@pytest.mark.parametrize('modus', MODI)
+@pytest.mark.parametrize('feld, von, bis', [('effektivkosten_police', 0.0, 6.0),
+                                            ('rendite_aktienfonds_police', 0.0, 15.0)])
+def test_batch_wie_einzeln(modus, feld, von, bis):
+    daten = [szenario(30, 3, modus), szenario(18, 2, modus)]
+    ergebnisse = break_even_batch(daten, feld, von, bis)
+    for i, data in enumerate(daten):
+        soll = _einzeln(data, feld, von / 100, bis / 100) * 100
+        np.testing.assert_allclose(ergebnisse['schwelle'][i], soll, rtol=0, atol=1e-6)
+        assert ergebnisse['aktuell'][i] == pytest.approx(data[feld])
+    assert not math.isnan(ergebnisse['schwelle'][0])
+
+
+@pytest.mark.parametrize('modus', MODI)
+def test_laufzeit_wie_einzeln(modus):
+    daten = [dict(szenario(30, 3, modus), effektivkosten_police=k) for k in (0.8, 1.5, 2.5)]
+    ergebnisse = break_even_batch(daten, 'laufzeit', 1, 40)
+    for i, data in enumerate(daten):
+        # The single solve counts the last year from 0
+        soll = _einzeln(data, 'laufzeit', 0, 39) + 1
+        np.testing.assert_equal(ergebnisse['schwelle'][i], soll)
+    assert not np.isnan(ergebnisse['schwelle']).all()
+
+
+def test_laufzeit_ab_null():
+    """A bracket starting at 0 years still sees a break-even after the second year."""
+    data = dict(szenario(30, 0), rendite_aktienfonds_police=9.0, effektivkosten_police=0.5,
+                rendite_aktienfonds_sparplan=9.0, effektivkosten_sparplan=1.5, freistellungsauftrag_sparplan=0)
+    assert _einzeln(data, 'laufzeit', 0, 39) == 1
+    for von in (0, 1):
+        assert break_even_batch([data], 'laufzeit', von, 40)['schwelle'][0] == 2
+
+
+def test_laufzeit_vor_dem_ersten_jahr():
+    """A bracket starting before the first year searches from the first year."""
+    data = dict(szenario(30, 0), rendite_aktienfonds_police=9.0, effektivkosten_police=0.5,
+                rendite_aktienfonds_sparplan=9.0, effektivkosten_sparplan=1.5, freistellungsauftrag_sparplan=0)
+    assert _einzeln(data, 'laufzeit', -1, 39) == _einzeln(data, 'laufzeit', 0, 39) == 1
+
+
+def test_laufzeit_ausserhalb():
+    """Clients whose laufzeit lies beyond the bracket get no current advantage."""
+    daten = [szenario(30, 2), szenario(12, 2), szenario(20, 2)]
+    ergebnisse = break_even_batch(daten, 'laufzeit', 1, 20)
+    assert np.isnan(ergebnisse['vorteil'][0])
+    soll = [_vorteil(data) for data in daten[1:]]
+    np.testing.assert_allclose(ergebnisse['vorteil'][1:], soll, rtol=1e-10)
+
+
+def _vorteil(data):
+    s = Szenario.from_json(data)
+    return simulate_police(s).nach_steuer - simulate_depot(s).nach_steuer
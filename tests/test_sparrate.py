@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import assert_ergebnisse, erwartet, szenario
+from vergleichsrechner import Szenario, simulate
+from vergleichsrechner.sparrate import simulate_sparrate
+
+
+def _police_monatlich(p, jahre):
+    """Fondspolice month by month: the start value booked annually, each payment from its month on."""
+    rendite, kosten = p['rendite_aktienfonds_police'], p['effektivkosten_police']
+    rendite_monat = (1 + rendite) ** (1 / 12) - 1
+    kosten_monat = 1 - (1 - kosten) ** (1 / 12)
+    wert = p['einmalbeitrag_police']
+    zeilen = []
+    for t in range(jahre):
+        rate = p['sparrate_police'] * (1 + p['dynamik_police']) ** t * (1 - p['beitragskosten_police'])
+        wertsteigerung = wert * rendite
+        abzug = (wert + wertsteigerung) * kosten
+        zahlungen = []
+        for _ in range(12):
+            zahlungen.append(rate)
+            for j, zahlung in enumerate(zahlungen):
+                plus = zahlung * rendite_monat
+                minus = (zahlung + plus) * kosten_monat
+                wertsteigerung += plus
+                abzug += minus
+                zahlungen[j] = zahlung + plus - minus
+        wert = wert + 12 * rate + wertsteigerung - abzug
+        zeilen.append((wertsteigerung, abzug, wert))
+    return zeilen
+
+
+def test_wie_monatlich_gerechnet():
+    data = dict(szenario(15, 0, 'monatlich'), effektivkosten_police=1.5)
+    p = Szenario.from_json(data).to_parameter()
+    police = simulate_sparrate(p, [])['police']
+    soll = np.array(_police_monatlich(p, 15))
+    np.testing.assert_allclose(police['Wertsteigerung'], soll[:, 0], rtol=1e-12)
+    np.testing.assert_allclose(police['Kosten Fondsguthaben'], soll[:, 1], rtol=1e-12)
+    np.testing.assert_allclose(police['Jahresende nach Kosten'], soll[:, 2], rtol=1e-12)
+    np.testing.assert_allclose(police['Einzahlung'][1:], 1200 * 1.02 ** np.arange(1, 15), rtol=1e-12)
+    assert police['Einzahlung'][0] == 10000 + 1200
+
+
+def test_basisertrag_anteilig():
+    """A payment counts for the Basisertrag one twelfth less per full month before it."""
+    data = szenario(3, 0, 'monatlich')
+    p = Szenario.from_json(data).to_parameter()
+    depot = simulate_sparrate(p, [])['depot']
+    rate = 100 * 1.02 ** np.arange(3) * (1 - 0.025)
+    beginn = depot['Jahresbeginn']
+    np.testing.assert_allclose(depot['Basisertrag'], (beginn + rate * 78 / 12) * 0.7 * 0.0229, rtol=1e-12)
+    assert beginn[0] == 10000
+
+
+@pytest.mark.parametrize('laufzeit, anzahl', [(1, 0), (15, 3), (30, 5)])
+def test_sparrate_ohne_zahlungen(laufzeit, anzahl):
+    """Ticking 'monatlich' with a Sparrate of 0 changes nothing."""
+    data = szenario(laufzeit, anzahl)
+    p = Szenario.from_json(data).to_parameter()
+    monatlich = dict(p, monatlich=True, sparrate_police=0.0, sparrate_sparplan=0.0)
+    jaehrlich = simulate(p, data['umschichtungen'])
+    tabellen = simulate_sparrate(monatlich, data['umschichtungen'])
+    for produkt in ('police', 'depot'):
+        for name in jaehrlich[produkt].spalten:
+            np.testing.assert_allclose(tabellen[produkt][name], jaehrlich[produkt][name], rtol=1e-12, atol=1e-9,
+                                       err_msg=f'{produkt}: {name}')
+    assert_ergebnisse(erwartet(dict(data, monatlich=True, sparrate_police=0, sparrate_sparplan=0)),
+                      erwartet(data))
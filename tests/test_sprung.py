@@ -0,0 +1,71 @@
+import numpy as np
+
+from conftest import ERGEBNIS_FELDER, assert_ergebnisse, baseline_als_json, erwartet, lade_baseline, szenario
+from vergleichsrechner import Szenario, simulate_batch
+from vergleichsrechner.sweep import achse, sweep
+
+
+def test_baseline():
+    faelle = lade_baseline()
+    ergebnisse = simulate_batch(baseline_als_json(), sprung=True)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(ergebnisse[key], [fall[key] for fall in faelle], rtol=1e-9, err_msg=key)
+
+
+def test_wie_einzeln(kunden):
+    """Jumping gives every client the single-scenario result; other modes step as before."""
+    daten = kunden(30)
+    ergebnisse = simulate_batch(daten, chunk_size=7, sprung=True)
+    for i, data in enumerate(daten):
+        assert_ergebnisse(ergebnisse, erwartet(data), rtol=1e-9, index=i)
+
+
+def test_wachstum_nahe_eins():
+    """Growth factors at and around 1 take the series of the geometric sums without losing digits."""
+    grenze = 100 / 99 - 1
+    daten = []
+    for laufzeit in (2, 30, 80):
+        for rendite in (0.0, -1.0, grenze * 100, grenze * 100 + 1e-7, grenze * 100 - 0.05, 0.1):
+            daten.append(dict(szenario(laufzeit, 2), rendite_aktienfonds_police=rendite,
+                              rendite_mischfonds_police=rendite, rendite_rentenfonds_police=rendite,
+                              rendite_aktienfonds_sparplan=rendite + 0.5, rendite_mischfonds_sparplan=rendite,
+                              rendite_rentenfonds_sparplan=rendite, effektivkosten_sparplan=1.0))
+    schritt = simulate_batch(daten)
+    sprung = simulate_batch(daten, sprung=True)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(sprung[key], schritt[key], rtol=1e-11, err_msg=key)
+
+
+def test_vorabpauschale_zweige():
+    """Renditen on both sides of 0.7 * Basiszins and Freistellungsaufträge that run out mid-segment."""
+    daten = [dict(szenario(40, 1), rendite_aktienfonds_sparplan=rendite, rendite_mischfonds_sparplan=rendite,
+                  rendite_rentenfonds_sparplan=rendite, basiszins_sparplan=3.0, freistellungsauftrag_sparplan=fsa)
+             for rendite in (1.0, 2.09, 2.11, 6.0) for fsa in (0, 20, 300, 5000)]
+    schritt = simulate_batch(daten)
+    sprung = simulate_batch(daten, sprung=True)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(sprung[key], schritt[key], rtol=1e-10, err_msg=key)
+
+
+def test_sweep_sprung():
+    data = szenario(40, 5)
+    p = Szenario.from_json(data).to_parameter()
+    achsen = {'rendite_aktienfonds_sparplan': achse('rendite_aktienfonds_sparplan', np.linspace(-2, 9, 12))}
+    schritt = sweep(p, data['umschichtungen'], achsen)
+    sprung = sweep(p, data['umschichtungen'], achsen, sprung=True)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(sprung[key], schritt[key], rtol=1e-9, err_msg=key)
+
+
+def test_umschichtungen_ausserhalb():
+    """Events before year 0, after the last year and several in one year match the stepped run."""
+    umschichtungen = [{'jahr': -3, 'umschichten_in': 'Mischfonds', 'anteil': 1.0},
+                      {'jahr': 4, 'umschichten_in': 'Rentenfonds', 'anteil': 0.5},
+                      {'jahr': 4, 'umschichten_in': 'Aktienfonds', 'anteil': 1.0},
+                      {'jahr': 50, 'umschichten_in': 'Rentenfonds', 'anteil': 1.0}]
+    daten = [dict(szenario(laufzeit, 0), umschichtungen=umschichtungen) for laufzeit in (1, 4, 5, 6, 20)]
+    schritt = simulate_batch(daten)
+    sprung = simulate_batch(daten, sprung=True)
+    for key in ERGEBNIS_FELDER:
+        np.testing.assert_allclose(sprung[key], schritt[key], rtol=1e-10, err_msg=key)
+    assert_ergebnisse(schritt, erwartet(daten[-1]), index=len(daten) - 1)
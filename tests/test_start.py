@@ -0,0 +1,35 @@
+"""Cold start: the app's package imports stay lazy and within a hard budget."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from vergleichsrechner.aufwaermen import APP_MODULE, SCHWERE_MODULE
+
+WURZEL = Path(__file__).parent.parent
+
+# About 0.15 s on one core, nearly all of it NumPy; the budget leaves room for slower containers
+IMPORT_BUDGET = 0.5
+
+MESSEN = f"""
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in {APP_MODULE!r}:
+    importlib.import_module(name)
+dauer = time.perf_counter() - start
+print(json.dumps({{'sekunden': dauer, 'schwer': [m for m in {SCHWERE_MODULE!r} if m in sys.modules]}}))
+"""
+
+
+def kalt_importieren():
+    ausgabe = subprocess.run([sys.executable, '-c', MESSEN], cwd=WURZEL, capture_output=True, text=True, check=True)
+    return json.loads(ausgabe.stdout)
+
+
+def test_import_budget():
+    """The app's package imports stay lazy and within ``IMPORT_BUDGET`` (best of three fresh processes)."""
+    messungen = [kalt_importieren() for _ in range(3)]
+    assert messungen[0]['schwer'] == [], f'beim Import geladen: {messungen[0]["schwer"]}'
+    schnellste = min(m['sekunden'] for m in messungen)
+    assert schnellste < IMPORT_BUDGET, f'Import dauert {schnellste:.3f} s, Budget {IMPORT_BUDGET} s'
+
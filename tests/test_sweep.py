@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from conftest import ERGEBNIS_FELDER, assert_ergebnisse, erwartet, szenario
+from vergleichsrechner import Szenario
+from vergleichsrechner.sweep import achse, sweep
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_sweep_wie_einzeln(modus):
+    data = szenario(25, 3, modus)
+    p = Szenario.from_json(data).to_parameter()
+    kosten = np.array([0.5, 1.2, 2.0])
+    zins = np.array([0.0, 2.5])
+    ergebnisse = sweep(p, data['umschichtungen'], {'effektivkosten_police': achse('effektivkosten_police', kosten),
+                                                   'basiszins_sparplan': achse('basiszins_sparplan', zins)})
+    for i, k in enumerate(kosten):
+        for j, z in enumerate(zins):
+            soll = erwartet(dict(data, effektivkosten_police=k, basiszins_sparplan=z))
+            assert_ergebnisse({key: ergebnisse[key][i, j] for key in ERGEBNIS_FELDER}, soll)
+
+
+@pytest.mark.parametrize('modus', ('jaehrlich', 'monatlich', 'portfolio'))
+def test_sweep_laufzeit(modus):
+    """One pass over a laufzeit axis equals a run per laufzeit."""
+    data = szenario(30, 3, modus)
+    p = Szenario.from_json(data).to_parameter()
+    laufzeiten = np.array([1, 2, 7, 16, 30])
+    ergebnisse = sweep(p, data['umschichtungen'], {'laufzeit': achse('laufzeit', laufzeiten)})
+    for i, laufzeit in enumerate(laufzeiten):
+        assert_ergebnisse({key: ergebnisse[key][i] for key in ERGEBNIS_FELDER},
+                          erwartet(dict(data, laufzeit=int(laufzeit))))
+
+
+def test_drei_achsen():
+    """Axes keep the given order, a laufzeit axis included, and chunking does not change a value."""
+    data = szenario(20, 2)
+    p = Szenario.from_json(data).to_parameter()
+    achsen = {'rendite_aktienfonds_police': achse('rendite_aktienfonds_police', [2.0, 5.0, 8.0, 11.0]),
+              'laufzeit': achse('laufzeit', [20, 5, 12]),
+              'einmalbeitrag_sparplan': achse('einmalbeitrag_sparplan', [5000, 20000])}
+    ergebnisse = sweep(p, data['umschichtungen'], achsen)
+    klein = sweep(p, data['umschichtungen'], achsen, chunk_size=3)
+    assert ergebnisse['vorteil'].shape == (4, 3, 2)
+    for key in ERGEBNIS_FELDER + ('vorteil',):
+        np.testing.assert_array_equal(klein[key], ergebnisse[key], err_msg=key)
+    np.testing.assert_array_equal(ergebnisse['vorteil'], ergebnisse['fondspolice'] - ergebnisse['fondssparplan'])
+    for i, rendite in enumerate([2.0, 5.0, 8.0, 11.0]):
+        for j, laufzeit in enumerate([5, 12, 20]):
+            for k, einmalbeitrag in enumerate([5000, 20000]):
+                soll = erwartet(dict(data, rendite_aktienfonds_police=rendite, laufzeit=laufzeit,
+                                     einmalbeitrag_sparplan=einmalbeitrag))
+                assert_ergebnisse({key: ergebnisse[key][i, j, k] for key in ERGEBNIS_FELDER}, soll)
+
+
+def test_achse():
+    """Percent inputs become fractions, amounts stay in euro, laufzeit becomes sorted unique last indices."""
+    np.testing.assert_allclose(achse('basiszins_sparplan', [0, 2.5]), [0.0, 0.025])
+    np.testing.assert_array_equal(achse('einmalbeitrag_police', [1000, 2500]), [1000.0, 2500.0])
+    np.testing.assert_array_equal(achse('laufzeit', [10, 3.4, 10.2, 1]), [0, 2, 9])
+
+
+@pytest.mark.parametrize('achsen, meldung', [
+    ({}, 'Achsen'),
+    ({name: np.array([0.01]) for name in ('effektivkosten_police', 'effektivkosten_sparplan',
+                                          'basiszins_sparplan', 'steuersatz_police')}, 'Achsen'),
+    ({'sparrate_police': np.array([100.0])}, 'nicht variierbar: sparrate_police'),
+    ({'laufzeit': np.array([-1, 4])}, 'mindestens ein Jahr'),
+])
+def test_ungueltig(achsen, meldung):
+    p = Szenario.from_json(szenario(5, 0)).to_parameter()
+    with pytest.raises(ValueError, match=meldung):
+        sweep(p, [], achsen)
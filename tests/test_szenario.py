@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from conftest import MODI, szenario
+from vergleichsrechner import Szenario, Umschichtung, fondspolice_nach_steuer, simulate, simulate_depot, simulate_police
+
+
+@pytest.mark.parametrize('modus', MODI)
+def test_json_rundreise(modus):
+    """A saved parameters.json reads back into the same Szenario and writes out unchanged."""
+    data = szenario(12, 3, modus)
+    s = Szenario.from_json(data)
+    assert s.to_json() == {**s.to_json(), **data}
+    assert Szenario.from_json(s.to_json()) == s
+
+
+def test_alte_json_dateien():
+    """Files saved before anteil and the Sparrate fields existed keep the defaults."""
+    s = Szenario.from_json({'laufzeit': 5, 'rendite_aktienfonds_police': 6.0,
+                            'umschichtungen': [{'jahr': 2, 'umschichten_in': 'Rentenfonds'}]})
+    assert s.police.rendite_aktienfonds == 6.0
+    assert s.sparplan == Szenario().sparplan
+    assert s.umschichtungen == (Umschichtung(2, 'Rentenfonds', 1.0),)
+    assert not s.monatlich
+    assert 'umschichten_von' not in s.umschichtungen_json()[0]
+
+
+def test_to_parameter():
+    """Rates go from percent to fractions, amounts stay in euro and laufzeit becomes the last index."""
+    p = Szenario.from_json(szenario(12, 0, 'monatlich')).to_parameter()
+    assert p['laufzeit'] == 11
+    assert p['monatlich'] is True
+    assert p['rendite_aktienfonds_sparplan'] == pytest.approx(0.07)
+    assert p['steuerlast_sparplan'] == pytest.approx(0.26375)
+    assert p['einmalbeitrag_police'] == 10000
+    assert p['freistellungsauftrag_sparplan'] == 1000
+    assert p['sparrate_police'] == 100 and p['dynamik_police'] == pytest.approx(0.02)
+
+
+def test_ergebnisse_wie_engine():
+    data = szenario(20, 3)
+    s = Szenario.from_json(data)
+    p = s.to_parameter()
+    tabellen = simulate(p, data['umschichtungen'])
+    police, depot = simulate_police(s), simulate_depot(s)
+    np.testing.assert_array_equal(police.tabelle.daten, tabellen['police'].daten)
+    np.testing.assert_array_equal(depot.tabelle.daten, tabellen['depot'].daten)
+    assert police.rentenkapital == tabellen['police']['Jahresende nach Kosten'][-1]
+    assert police.nach_steuer == fondspolice_nach_steuer(police.rentenkapital, p['einmalbeitrag_police'],
+                                                         p['teilfreistellung_police'], p['steuersatz_police'])
+    assert depot.nach_steuer == tabellen['depot']['Kapital abzüglich Steuer'][-1]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from vergleichsrechner import Tabelle
+
+SPALTEN = ('Jahr', 'UmschichtungJN', 'Jahresbeginn', 'Jahresende nach Kosten')
+ZEILEN = [(0, 0, 10000.0, 10123.456), (1, 1, 10123.456, 10250.5), (2, 0, 10250.5, 10377.125)]
+
+
+@pytest.fixture
+def tabelle():
+    return Tabelle.aus_zeilen(SPALTEN, ZEILEN)
+
+
+def test_wie_dict(tabelle):
+    """Columns read like the dict of arrays the tables used to be, as views into one block."""
+    assert list(tabelle) == list(SPALTEN) and len(tabelle) == 4 and tabelle.jahre == 3
+    assert tabelle['Jahr'].dtype == np.int64 and tabelle['Jahr'].tolist() == [0, 1, 2]
+    assert tabelle['UmschichtungJN'].tolist() == [0, 1, 0]
+    spalte = tabelle['Jahresbeginn']
+    assert spalte.tolist() == [10000.0, 10123.456, 10250.5]
+    assert np.shares_memory(spalte, tabelle.daten)
+    assert tabelle.nbytes == 3 * 4 * 8
+    with pytest.raises(KeyError):
+        tabelle['Rendite']
+
+
+def test_float32(tabelle):
+    klein = tabelle.astype(np.float32)
+    assert klein.nbytes == tabelle.nbytes // 2 and klein.spalten == tabelle.spalten
+    np.testing.assert_allclose(klein['Jahresende nach Kosten'], tabelle['Jahresende nach Kosten'], rtol=1e-7)
+    assert klein['Jahr'].dtype == np.int64
+
+
+def test_ungueltig():
+    with pytest.raises(ValueError, match='eindeutig'):
+        Tabelle(np.zeros((2, 2)), ('Jahr', 'Jahr'))
+    with pytest.raises(ValueError, match='passt nicht'):
+        Tabelle(np.zeros((2, 3)), ('Jahr', 'Rendite'))
+
+
+def test_to_frame(tabelle):
+    pd = pytest.importorskip('pandas')
+    df = tabelle.to_frame()
+    assert list(df.columns) == list(SPALTEN) and df['Jahr'].dtype == np.int64
+    teil = tabelle.to_frame(['Jahresende nach Kosten', 'Jahr'], runden=2)
+    pd.testing.assert_frame_equal(teil, pd.DataFrame({'Jahresende nach Kosten': [10123.46, 10250.5, 10377.12],
+                                                      'Jahr': np.arange(3, dtype=np.int64)}))
@@ -0,0 +1,28 @@
+"""Calculation core of the Vergleichsrechner (Fondspolice vs. Fondssparplan).
+
+Importing the package only pulls in NumPy; the Streamlit app, the batch
+runner and the service are all clients of it.
+"""
+from vergleichsrechner.batch import simulate_batch
+from vergleichsrechner.engine import (
+    DEPOT_SPALTEN,
+    POLICE_SPALTEN,
+    PRODUKTE,
+    Projektion,
+    fondspolice_nach_steuer,
+    project_depot,
+    project_police,
+    simulate,
+)
+from vergleichsrechner.formatting import euro_formatter, format_german
+from vergleichsrechner.szenario import (
+    DepotErgebnis,
+    PoliceErgebnis,
+    PoliceParameter,
+    SparplanParameter,
+    Szenario,
+    Umschichtung,
+    simulate_depot,
+    simulate_police,
+)
+from vergleichsrechner.tabelle import Tabelle
@@ -0,0 +1,248 @@
+"""Local scenario store in SQLite.
+
+    python -m vergleichsrechner.ablage szenarien.db --import szenarien/
+    python -m vergleichsrechner.ablage szenarien.db --kunde Muster
+
+Every saved scenario keeps its inputs next to the final values and both
+yearly tables (the raw ``Tabelle`` blocks), so opening one is a single
+primary-key read and no projection. ``kunde`` and ``erstellt`` are
+indexed, so searching by client name prefix or by date stays fast with
+tens of thousands of rows. Existing parameters.json files and JSONL files
+are imported in bulk, in the input formats of ``runner``.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from vergleichsrechner.runner import iter_inputs, lade
+from vergleichsrechner.szenario import (DepotErgebnis, PoliceErgebnis, Szenario, simulate_depot,
+                                        simulate_police)
+from vergleichsrechner.tabelle import Tabelle
+
+SUCHLIMIT = 100
+IMPORT_CHUNK = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS szenarien (
+    id INTEGER PRIMARY KEY,
+    kunde TEXT NOT NULL COLLATE NOCASE,
+    erstellt TEXT NOT NULL,
+    quelle TEXT,
+    parameter TEXT NOT NULL,
+    fondspolice_rentenkapital REAL,
+    fondspolice REAL,
+    fondssparplan REAL,
+    spalten_police TEXT NOT NULL,
+    police BLOB NOT NULL,
+    spalten_depot TEXT NOT NULL,
+    depot BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS szenarien_kunde ON szenarien (kunde, erstellt);
+CREATE INDEX IF NOT EXISTS szenarien_erstellt ON szenarien (erstellt);
+"""
+
+EINFUEGEN = ('INSERT INTO szenarien (kunde, erstellt, quelle, parameter, fondspolice_rentenkapital, fondspolice, '
+             'fondssparplan, spalten_police, police, spalten_depot, depot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+EINTRAG_FELDER = ('id', 'kunde', 'erstellt', 'quelle', 'fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+
+@dataclass(frozen=True)
+class Eintrag:
+    """One search hit: identification and final values, without the tables."""
+    id: int
+    kunde: str
+    erstellt: str
+    quelle: str
+    fondspolice_rentenkapital: float
+    fondspolice: float
+    fondssparplan: float
+
+
+@dataclass(frozen=True)
+class Gespeichert:
+    """A stored scenario with its results, as read by ``Ablage.laden``."""
+    id: int
+    kunde: str
+    erstellt: str
+    szenario: Szenario
+    police: PoliceErgebnis
+    depot: DepotErgebnis
+
+
+def _zahl(wert):
+    # SQLite stores NaN as NULL
+    return np.nan if wert is None else wert
+
+
+def _zeitpunkt(wert, ende=False):
+    """ISO text for a ``datetime``, ``date`` or ISO string; a date as ``ende`` covers the whole day."""
+    if isinstance(wert, dt.datetime):
+        return wert.isoformat(timespec='seconds')
+    if isinstance(wert, dt.date):
+        return f'{wert.isoformat()}T23:59:59' if ende else wert.isoformat()
+    return str(wert)
+
+
+def _jetzt():
+    return dt.datetime.now().isoformat(timespec='seconds')
+
+
+def _blob(tabelle):
+    return '\t'.join(tabelle.spalten), np.ascontiguousarray(tabelle.daten, dtype='<f8').tobytes()
+
+
+def _tabelle(spalten, blob):
+    spalten = spalten.split('\t')
+    return Tabelle(np.frombuffer(blob, dtype='<f8').reshape(-1, len(spalten)), spalten)
+
+
+def _zeile(kunde, szenario, police, depot, erstellt, quelle):
+    return (kunde, erstellt, quelle, json.dumps(szenario.to_json(), separators=(',', ':')),
+            police.rentenkapital, police.nach_steuer, depot.nach_steuer, *_blob(police.tabelle), *_blob(depot.tabelle))
+
+
+class Ablage:
+    """Thread-safe store of scenarios and their results in one SQLite file."""
+
+    def __init__(self, pfad=':memory:'):
+        self.pfad = str(pfad)
+        self._conn = sqlite3.connect(self.pfad, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if self.pfad != ':memory:':
+                # Readers in other processes (app, CLI) do not block a running import
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM szenarien').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def speichere(self, kunde, szenario, police=None, depot=None, erstellt=None, quelle=None):
+        """Store a scenario and return its id; missing results are computed first."""
+        if not kunde or not str(kunde).strip():
+            raise ValueError('Bitte einen Kundennamen angeben')
+        police = police if police is not None else simulate_police(szenario)
+        depot = depot if depot is not None else simulate_depot(szenario)
+        zeile = _zeile(str(kunde).strip(), szenario, police, depot, _zeitpunkt(erstellt or _jetzt()), quelle)
+        with self._lock, self._conn:
+            return self._conn.execute(EINFUEGEN, zeile).lastrowid
+
+    def laden(self, id):
+        """The stored scenario ``id`` with its tables; raises ``KeyError`` if there is none."""
+        with self._lock:
+            zeile = self._conn.execute(
+                'SELECT id, kunde, erstellt, parameter, fondspolice_rentenkapital, fondspolice, fondssparplan, '
+                'spalten_police, police, spalten_depot, depot FROM szenarien WHERE id = ?', (id,),
+            ).fetchone()
+        if zeile is None:
+            raise KeyError(f'Szenario {id} nicht gefunden')
+        id, kunde, erstellt, parameter, rentenkapital, fondspolice, fondssparplan, *tabellen = zeile
+        return Gespeichert(
+            id, kunde, erstellt, Szenario.from_json(json.loads(parameter)),
+            PoliceErgebnis(_tabelle(tabellen[0], tabellen[1]), _zahl(rentenkapital), _zahl(fondspolice)),
+            DepotErgebnis(_tabelle(tabellen[2], tabellen[3]), _zahl(fondssparplan)),
+        )
+
+    def suche(self, kunde='', von=None, bis=None, limit=SUCHLIMIT):
+        """Newest scenarios whose client name starts with ``kunde`` (any case), optionally within a date range."""
+        bedingungen, werte = [], []
+        if kunde:
+            # Prefix LIKE on a NOCASE column is answered from the index
+            muster = kunde.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            bedingungen.append("kunde LIKE ? ESCAPE '\\'")
+            werte.append(f'{muster}%')
+        if von is not None:
+            bedingungen.append('erstellt >= ?')
+            werte.append(_zeitpunkt(von))
+        if bis is not None:
+            bedingungen.append('erstellt <= ?')
+            werte.append(_zeitpunkt(bis, ende=True))
+        where = f'WHERE {" AND ".join(bedingungen)} ' if bedingungen else ''
+        with self._lock:
+            zeilen = self._conn.execute(
+                f'SELECT {", ".join(EINTRAG_FELDER)} FROM szenarien {where}ORDER BY erstellt DESC, id DESC LIMIT ?',
+                (*werte, limit),
+            ).fetchall()
+        return [Eintrag(*zeile[:4], *map(_zahl, zeile[4:])) for zeile in zeilen]
+
+    def loesche(self, id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM szenarien WHERE id = ?', (id,))
+
+    def importiere(self, pfad, kunde=None, log=sys.stderr):
+        """Compute and store every input of ``runner.iter_inputs``; returns ``(anzahl, fehler)``.
+
+        The client is the ``kunde`` field of the input, else ``kunde``, else
+        the file name (or ``datei:zeile`` for JSONL). Files keep their
+        modification time as ``erstellt``.
+        """
+        anzahl = fehler = 0
+        zeilen = []
+        for quelle, kind, payload in iter_inputs(pfad):
+            try:
+                data = lade(kind, payload)
+                szenario = Szenario.from_json(data)
+                police, depot = simulate_police(szenario), simulate_depot(szenario)
+            except (OSError, AttributeError, KeyError, TypeError, ValueError) as exc:
+                fehler += 1
+                print(f'Fehler in {quelle}: {type(exc).__name__}: {exc}', file=log)
+                continue
+            if kind == 'datei':
+                name, erstellt = Path(quelle).stem, dt.datetime.fromtimestamp(os.path.getmtime(quelle))
+            else:
+                name, erstellt = quelle, _jetzt()
+            zeilen.append(_zeile(str(data.get('kunde') or kunde or name), szenario, police, depot,
+                                 _zeitpunkt(data.get('erstellt') or erstellt), quelle))
+            if len(zeilen) >= IMPORT_CHUNK:
+                anzahl += self._einfuegen(zeilen)
+                zeilen = []
+        anzahl += self._einfuegen(zeilen)
+        return anzahl, fehler
+
+    def _einfuegen(self, zeilen):
+        with self._lock, self._conn:
+            self._conn.executemany(EINFUEGEN, zeilen)
+        return len(zeilen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.ablage',
+        description='Szenarien in der lokalen Ablage importieren und suchen.',
+    )
+    parser.add_argument('datenbank', help='SQLite-Datei der Ablage')
+    parser.add_argument('--import', dest='eingabe', help='Ordner mit parameters.json-Dateien oder JSONL-Datei')
+    parser.add_argument('--kunde', default='', help='Kundenname (beim Import: Vorgabe, sonst: Suche nach Anfang)')
+    parser.add_argument('--von', type=dt.date.fromisoformat, help='frühestes Datum (JJJJ-MM-TT)')
+    parser.add_argument('--bis', type=dt.date.fromisoformat, help='spätestes Datum (JJJJ-MM-TT)')
+    args = parser.parse_args(argv)
+    ablage = Ablage(args.datenbank)
+    try:
+        if args.eingabe:
+            anzahl, fehler = ablage.importiere(args.eingabe, args.kunde or None)
+            print(f'{anzahl} Szenarien importiert, {fehler} Fehler', file=sys.stderr)
+            return 1 if fehler else 0
+        for eintrag in ablage.suche(args.kunde, args.von, args.bis):
+            print(f'{eintrag.id}\t{eintrag.erstellt}\t{eintrag.kunde}\t{eintrag.fondspolice:.2f}\t'
+                  f'{eintrag.fondssparplan:.2f}')
+        return 0
+    finally:
+        ablage.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Warm-up for fresh app and worker processes.
+
+    python -m vergleichsrechner.aufwaermen
+
+Imports every module the app uses and runs each calculation path once on
+a small scenario, so the first real request does not pay for imports,
+``.pyc`` compilation, NumPy's first-call setup or the column index caches.
+pandas and matplotlib are loaded last and only on request, since the
+package itself never imports them up front (``SCHWERE_MODULE``). Run it in
+the container image build or at process start; the app runs it once per
+server process in a background thread.
+"""
+import argparse
+import importlib
+import sys
+import time
+
+# Everything streamlit_app.py imports from the package
+APP_MODULE = (
+    'vergleichsrechner',
+    'vergleichsrechner.ablage',
+    'vergleichsrechner.backtest',
+    'vergleichsrechner.batch',
+    'vergleichsrechner.cache',
+    'vergleichsrechner.charts',
+    'vergleichsrechner.export',
+    'vergleichsrechner.messung',
+    'vergleichsrechner.montecarlo',
+    'vergleichsrechner.sensitivitaet',
+    'vergleichsrechner.solver',
+    'vergleichsrechner.sweep',
+)
+
+# Loaded on first use only; importing APP_MODULE must not pull them in
+SCHWERE_MODULE = ('matplotlib', 'pandas', 'PIL', 'openpyxl', 'pyarrow')
+
+
+def aufwaermen(tabellen=True, diagramme=True):
+    """Import and exercise the engine; returns the seconds per step."""
+    zeiten = {}
+
+    def schritt(name, ausfuehren):
+        start = time.perf_counter()
+        ausfuehren()
+        zeiten[name] = time.perf_counter() - start
+
+    schritt('import', lambda: [importlib.import_module(name) for name in APP_MODULE])
+
+    import numpy as np
+
+    from vergleichsrechner import Projektion, Szenario, Umschichtung, simulate, simulate_batch
+    from vergleichsrechner.backtest import Renditen, auswertung, backtest
+    from vergleichsrechner.charts import balken_png
+    from vergleichsrechner.montecarlo import simulate_paths
+    from vergleichsrechner.portfolio import simulate_portfolio
+    from vergleichsrechner.sensitivitaet import sensitivitaet
+    from vergleichsrechner.solver import break_even
+    from vergleichsrechner.sparrate import simulate_sparrate
+    from vergleichsrechner.sweep import achse, sweep
+
+    szenario = Szenario(laufzeit=10, umschichtungen=(Umschichtung(4, 'Mischfonds'),))
+    p, u = szenario.to_parameter(), szenario.umschichtungen_json()
+    schritt('engine', lambda: (simulate(p, u), Projektion().update(p, u)))
+    schritt('sparrate', lambda: simulate_sparrate(dict(p, monatlich=True), u))
+    schritt('portfolio', lambda: simulate_portfolio(p, [dict(u[0], anteil=0.5, umschichten_von='Aktienfonds')]))
+    schritt('batch', lambda: (simulate_batch([szenario.to_json()] * 2),
+                              simulate_batch([szenario.to_json()] * 2, sprung=True)))
+    schritt('montecarlo', lambda: simulate_paths(p, u, pfade=100, seed=0))
+    schritt('sweep', lambda: sweep(p, u, {'effektivkosten_police': achse('effektivkosten_police', [0.0, 1.0]),
+                                          'laufzeit': achse('laufzeit', [1, 10])}))
+    schritt('backtest', lambda: auswertung(backtest(p, u, Renditen(np.arange(12), np.full((12, 3), 0.05)))))
+    schritt('sensitivitaet', lambda: sensitivitaet(p, u))
+    schritt('break_even', lambda: break_even(p, u, 'effektivkosten_police', 0.0, 0.05))
+    if tabellen:
+        schritt('pandas', lambda: simulate(p, u)['police'].to_frame(runden=2))
+    if diagramme:
+        schritt('matplotlib', lambda: balken_png([1.0, 2.0, 3.0]))
+    return zeiten
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.aufwaermen',
+        description='Rechenkern und Bibliotheken vorab laden.',
+    )
+    parser.add_argument('--ohne-tabellen', action='store_true', help='pandas nicht vorab laden')
+    parser.add_argument('--ohne-diagramme', action='store_true', help='matplotlib nicht vorab laden')
+    args = parser.parse_args(argv)
+    zeiten = aufwaermen(tabellen=not args.ohne_tabellen, diagramme=not args.ohne_diagramme)
+    for name, sekunden in zeiten.items():
+        print(f'{name:<12}{sekunden * 1000:9.1f} ms', file=sys.stderr)
+    print(f'{"gesamt":<12}{sum(zeiten.values()) * 1000:9.1f} ms', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Rolling-window backtest on historical fund returns.
+
+    python -m vergleichsrechner.backtest renditen.csv parameters.json
+    python -m vergleichsrechner.backtest renditen.parquet parameters.json --laufzeit 20
+
+The return series is a local CSV or Parquet file with one row per year,
+or per month with an extra ``monat`` column. Columns are ``jahr``,
+``aktienfonds``, ``mischfonds``, ``rentenfonds`` and optionally
+``basiszins``, all rates in percent; CSV files may use ``,`` or ``;`` as
+separator (``;`` with decimal commas). Monthly returns are compounded to
+calendar years and a year's Basiszins is that of its first month; partial
+years at either end are dropped. No series ships with the package.
+
+Both products earn the historical return of the fund they hold instead of
+the ``rendite_*`` inputs. Every start year is one client of the batch
+kernel and ``jaehrlich`` records every laufzeit on the way, so all windows
+of the series are one year recursion over ``jahre`` columns.
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from vergleichsrechner.batch import project_batch
+from vergleichsrechner.portfolio import ist_portfolio, portfolio_schedule, project_portfolio, pruefe_sparrate
+from vergleichsrechner.schedule import PRODUKTE, build_schedule
+from vergleichsrechner.sparrate import project_sparrate, sparrate_argumente
+
+# Column of the series file per entry of ``PRODUKTE``
+FONDS_SPALTEN = tuple(name.lower() for name in PRODUKTE)
+
+ERGEBNIS_FELDER = ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+PERZENTILE = (5, 50, 95)
+
+MONATE = 12
+
+
+@dataclass(frozen=True, eq=False)
+class Renditen:
+    """Annual series: ``rendite`` has one column per ``PRODUKTE`` entry, rates as fractions."""
+    jahre: np.ndarray
+    rendite: np.ndarray
+    basiszins: np.ndarray | None = None
+
+
+def _zahl(text, komma):
+    text = text.strip()
+    if not text:
+        return np.nan
+    # With ';' as separator a comma is the decimal mark and points group thousands
+    if komma and ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    return float(text)
+
+
+def _lies_csv(pfad):
+    with open(pfad, newline='', encoding='utf-8-sig') as f:
+        try:
+            dialekt = csv.Sniffer().sniff(f.read(4096), delimiters=',;\t')
+        except csv.Error:
+            raise ValueError(f'{os.path.basename(pfad)}: Trennzeichen nicht erkannt')
+        f.seek(0)
+        zeilen = csv.reader(f, dialekt)
+        namen = [name.strip().lower() for name in next(zeilen, [])]
+        werte = [zeile for zeile in zeilen if any(feld.strip() for feld in zeile)]
+    if any(len(zeile) != len(namen) for zeile in werte):
+        raise ValueError(f'{os.path.basename(pfad)}: Zeilen mit abweichender Spaltenzahl')
+    komma = dialekt.delimiter == ';'
+    try:
+        return {name: np.array([_zahl(zeile[i], komma) for zeile in werte]) for i, name in enumerate(namen)}
+    except ValueError:
+        raise ValueError(f'{os.path.basename(pfad)}: nicht numerische Werte')
+
+
+def _lies_parquet(pfad):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Parquet-Renditedateien benötigen pyarrow (pip install pyarrow)')
+    # Memory-mapped, so a long monthly history is read without an extra copy
+    tabelle = pq.read_table(pfad, memory_map=True)
+    return {name.strip().lower(): spalte.to_numpy().astype(np.float64)
+            for name, spalte in zip(tabelle.column_names, tabelle.columns)}
+
+
+def renditen_aus_spalten(spalten, quelle='Renditedatei'):
+    """``Renditen`` from the columns of a series file; raises ``ValueError``."""
+    fehlend = [name for name in ('jahr',) + FONDS_SPALTEN if name not in spalten]
+    if fehlend:
+        raise ValueError(f'{quelle}: fehlende Spalten: {", ".join(fehlend)}')
+    namen = ('jahr', 'monat') + FONDS_SPALTEN + ('basiszins',)
+    spalten = {name: np.asarray(spalten[name], dtype=np.float64) for name in namen if name in spalten}
+    if any(np.isnan(werte).any() for werte in spalten.values()):
+        raise ValueError(f'{quelle}: fehlende Werte')
+    jahr = spalten['jahr'].astype(np.int64)
+    rendite = np.column_stack([spalten[name] for name in FONDS_SPALTEN]) / 100
+    basiszins = spalten['basiszins'] / 100 if 'basiszins' in spalten else None
+
+    if 'monat' in spalten:
+        monat = spalten['monat'].astype(np.int64)
+        if ((monat < 1) | (monat > MONATE)).any():
+            raise ValueError(f'{quelle}: monat muss zwischen 1 und 12 liegen')
+        folge = np.lexsort((monat, jahr))
+        jahr, monat, rendite = jahr[folge], monat[folge], rendite[folge]
+        if len(np.unique(jahr * MONATE + monat)) < len(jahr):
+            raise ValueError(f'{quelle}: Monate doppelt vorhanden')
+        jahr, start, anzahl = np.unique(jahr, return_index=True, return_counts=True)
+        rendite = np.multiply.reduceat(1 + rendite, start, axis=0) - 1 if len(start) else rendite[:0]
+        if basiszins is not None:
+            basiszins = basiszins[folge][start]
+        # Only complete years count; a gap inside the series is caught below
+        voll = anzahl == MONATE
+        jahr, rendite = jahr[voll], rendite[voll]
+        basiszins = None if basiszins is None else basiszins[voll]
+    else:
+        folge = np.argsort(jahr, kind='stable')
+        jahr, rendite = jahr[folge], rendite[folge]
+        basiszins = None if basiszins is None else basiszins[folge]
+
+    if not len(jahr):
+        raise ValueError(f'{quelle}: keine vollständigen Jahre')
+    if (np.diff(jahr) != 1).any():
+        raise ValueError(f'{quelle}: Jahre müssen lückenlos aufeinander folgen')
+    for werte in (jahr, rendite, basiszins):
+        if werte is not None:
+            werte.flags.writeable = False
+    return Renditen(jahr, rendite, basiszins)
+
+
+def lies_renditen(pfad):
+    """Read a series file (``.parquet`` or CSV) into ``Renditen``."""
+    pfad = str(pfad)
+    lesen = _lies_parquet if pfad.endswith('.parquet') else _lies_csv
+    return renditen_aus_spalten(lesen(pfad), os.path.basename(pfad))
+
+
+@functools.lru_cache(maxsize=8)
+def _lade(pfad, geaendert, groesse):
+    return lies_renditen(pfad)
+
+
+def lade_renditen(pfad):
+    """Read a series file; a file is parsed once per process until it changes."""
+    pfad = os.path.abspath(pfad)
+    stat = os.stat(pfad)
+    return _lade(pfad, stat.st_mtime_ns, stat.st_size)
+
+
+def backtest(p, umschichtungen, renditen):
+    """Both products for every start year and laufzeit the series covers.
+
+    ``p`` holds the inputs in app units (fractions, ``laufzeit`` ignored),
+    keyed like parameters.json. Returns ``startjahre`` and arrays of shape
+    ``(jahre, jahre)`` for the final values and ``vorteil`` (Fondspolice
+    minus Fondssparplan): entry ``[l, s]`` is the contract of ``l + 1``
+    years starting in ``startjahre[s]``, NaN where the series ends earlier.
+    Without a ``basiszins`` column the Basiszins input applies every year.
+    """
+    jahre = len(renditen.jahre)
+    # Year i of the contract starting at s earns the return of year s + i
+    index = np.arange(jahre)[:, None] + np.arange(jahre)
+    gueltig = index < jahre
+    index = np.minimum(index, jahre - 1)
+    serie = renditen.rendite[index]
+    basiszins_jahre = None if renditen.basiszins is None else renditen.basiszins[index]
+    teilfreistellung = np.array([p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                                 p['teilfreistellung_rentenfonds_sparplan']])
+    laufzeit = jahre - 1
+    if ist_portfolio(umschichtungen):
+        pruefe_sparrate(p.get('monatlich'))
+        abgang, ziel = portfolio_schedule(laufzeit, [umschichtungen])
+        rendite = serie.transpose(0, 2, 1)
+        ergebnisse = project_portfolio(
+            laufzeit, abgang, ziel, rendite, rendite, teilfreistellung[:, None],
+            p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+            p['einmalbeitrag_sparplan'], p['freistellungsauftrag_sparplan'], p['basiszins_sparplan'],
+            p['effektivkosten_sparplan'], p['steuerlast_sparplan'], jaehrlich=True, basiszins_jahre=basiszins_jahre,
+        )
+    else:
+        schedule = build_schedule(laufzeit, umschichtungen)
+        produkt = schedule['produkt']
+        rendite = serie[np.arange(jahre), :, produkt]
+        kern, sparraten = (project_sparrate, sparrate_argumente(p)) if p.get('monatlich') else (project_batch, {})
+        ergebnisse = kern(
+            laufzeit, schedule['jn'][:, None], schedule['anteil'][:, None],
+            rendite, rendite, teilfreistellung[produkt][:, None],
+            p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+            p['einmalbeitrag_sparplan'], p['teilfreistellung_aktienfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+            p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'], jaehrlich=True,
+            basiszins_jahre=basiszins_jahre, **sparraten,
+        )
+    ergebnisse = {key: np.where(gueltig, ergebnisse[key], np.nan) for key in ERGEBNIS_FELDER}
+    ergebnisse['vorteil'] = ergebnisse['fondspolice'] - ergebnisse['fondssparplan']
+    ergebnisse['startjahre'] = renditen.jahre
+    return ergebnisse
+
+
+def auswertung(ergebnisse, q=PERZENTILE):
+    """Distribution over the start years, per laufzeit (index ``l`` is ``l + 1`` years).
+
+    Returns the number of ``fenster``, the shares of windows in which
+    ``police_vorn`` or ``sparplan_vorn`` holds, and the percentiles ``q``
+    of every result, shape ``(len(q), jahre)``.
+    """
+    vorteil = ergebnisse['vorteil']
+    fenster = np.count_nonzero(~np.isnan(vorteil), axis=1)
+    zusammenfassung = {
+        'fenster': fenster,
+        'police_vorn': np.count_nonzero(vorteil > 0, axis=1) / fenster,
+        'sparplan_vorn': np.count_nonzero(vorteil < 0, axis=1) / fenster,
+    }
+    for key in ERGEBNIS_FELDER + ('vorteil',):
+        zusammenfassung[key] = np.nanpercentile(ergebnisse[key], q, axis=1)
+    return zusammenfassung
+
+
+def main(argv=None):
+    from vergleichsrechner.szenario import Szenario
+
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.backtest',
+        description='Fondspolice und Fondssparplan über alle historischen Zeitfenster vergleichen.',
+    )
+    parser.add_argument('renditen', help='Renditereihe (.csv oder .parquet)')
+    parser.add_argument('parameter', help='parameters.json')
+    parser.add_argument('--laufzeit', type=int, help='nur diese Laufzeit in Jahren ausgeben')
+    args = parser.parse_args(argv)
+    with open(args.parameter, encoding='utf-8') as f:
+        szenario = Szenario.from_json(json.load(f))
+    try:
+        renditen = lade_renditen(args.renditen)
+        ergebnisse = backtest(szenario.to_parameter(), szenario.umschichtungen_json(), renditen)
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    zusammenfassung = auswertung(ergebnisse)
+    laufzeiten = range(len(renditen.jahre)) if args.laufzeit is None else [args.laufzeit - 1]
+    print('laufzeit\tfenster\tpolice_vorn\tsparplan_vorn\tvorteil_p5\tvorteil_median\tvorteil_p95')
+    for l in laufzeiten:
+        if not 0 <= l < len(renditen.jahre):
+            print(f'Laufzeit {l + 1} liegt außerhalb der Reihe ({len(renditen.jahre)} Jahre)', file=sys.stderr)
+            return 1
+        p5, p50, p95 = zusammenfassung['vorteil'][:, l]
+        print(f'{l + 1}\t{zusammenfassung["fenster"][l]}\t{zusammenfassung["police_vorn"][l]:.3f}\t'
+              f'{zusammenfassung["sparplan_vorn"][l]:.3f}\t{p5:.2f}\t{p50:.2f}\t{p95:.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
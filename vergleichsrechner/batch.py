@@ -0,0 +1,292 @@
+"""Vectorized police/depot comparison for many clients at once.
+
+All clients are stepped through the year recursion together; every
+per-client quantity is a NumPy array of length ``n`` and per-year inputs
+have shape ``(jahre, n)`` so that one year is a contiguous row.
+"""
+import numpy as np
+
+from vergleichsrechner.portfolio import ist_portfolio, portfolio_arrays, pruefe_sparrate
+from vergleichsrechner.schedule import schedule_arrays
+from vergleichsrechner.sparrate import SPARRATE_FELDER, project_sparrate, sparrate_arrays
+from vergleichsrechner.sprung import project_sprung
+
+# Keys of parameters.json that are stored in percent
+PROZENT_FELDER = (
+    'rendite_mischfonds_police',
+    'rendite_rentenfonds_police',
+    'rendite_aktienfonds_police',
+    'teilfreistellung_police',
+    'effektivkosten_police',
+    'steuersatz_police',
+    'rendite_aktienfonds_sparplan',
+    'rendite_mischfonds_sparplan',
+    'rendite_rentenfonds_sparplan',
+    'teilfreistellung_aktienfonds_sparplan',
+    'teilfreistellung_mischfonds_sparplan',
+    'teilfreistellung_rentenfonds_sparplan',
+    'basiszins_sparplan',
+    'effektivkosten_sparplan',
+    'ausgabeaufschlag_sparplan',
+    'steuerlast_sparplan',
+    'steuerlast_auszahlung_sparplan',
+)
+
+BETRAG_FELDER = (
+    'einmalbeitrag_police',
+    'einmalbeitrag_sparplan',
+    'freistellungsauftrag_sparplan',
+)
+
+# Yearly columns ``project_batch(..., verlauf=True)`` records, named as in the engine tables
+VERLAUF_POLICE = ('Jahresbeginn', 'Rendite', 'Wertsteigerung', 'Kosten Fondsguthaben', 'Jahresende nach Kosten')
+VERLAUF_DEPOT = ('Jahresbeginn', 'Rendite', 'Wertsteigerung', 'Kosten auf Fondsguthaben', 'Jahresende nach Kosten',
+                 'Vorabpauschale', 'Steuerlast', 'Umschichten', 'Steuerlast Umschichtung', 'Kapital abzüglich Steuer')
+
+CHUNK_SIZE = 8192
+
+
+def parameter_arrays(parameter_sets):
+    """Columns of N parameters.json dicts, converted like the app does.
+
+    Percent fields are divided by 100 and ``laufzeit`` becomes the index of
+    the last year. ``monatlich`` marks the clients in the monthly Sparrate
+    mode; if there are any, the ``sparrate_arrays`` columns are added.
+    """
+    n = len(parameter_sets)
+    arrays = {}
+    for key in PROZENT_FELDER:
+        arrays[key] = np.fromiter((p[key] for p in parameter_sets), np.float64, n) / 100
+    for key in BETRAG_FELDER:
+        arrays[key] = np.fromiter((p[key] for p in parameter_sets), np.float64, n)
+    arrays['laufzeit'] = np.fromiter((p['laufzeit'] for p in parameter_sets), np.int64, n) - 1
+    arrays['monatlich'] = np.fromiter((bool(p.get('monatlich')) for p in parameter_sets), np.bool_, n)
+    if arrays['monatlich'].any():
+        arrays.update(sparrate_arrays(parameter_sets))
+    return arrays
+
+
+def project_batch(laufzeit, jn, anteil, rendite_police, rendite_depot, teilfreistellung_depot,
+                  einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                  einmalbeitrag_sparplan, teilfreistellung_aktienfonds_sparplan, freistellungsauftrag_sparplan,
+                  basiszins_sparplan, effektivkosten_sparplan, steuerlast_sparplan, verlauf=False, jaehrlich=False,
+                  basiszins_jahre=None):
+    """Run the year recursion of ``project_police``/``project_depot`` for N clients.
+
+    ``jn``, ``anteil``, ``rendite_police``, ``rendite_depot`` and
+    ``teilfreistellung_depot`` are per-year inputs of shape ``(jahre, n)``;
+    the remaining parameters are scalars or arrays of length ``n``.
+    ``basiszins_jahre``, if given, is a per-year Basiszins that replaces
+    ``basiszins_sparplan``.
+    Returns the final values per client. With ``verlauf`` the result also
+    holds the ``VERLAUF_POLICE``/``VERLAUF_DEPOT`` columns of every year,
+    shape ``(jahre, n)``; rows after a client's laufzeit are meaningless.
+    With ``jaehrlich`` the final values have shape ``(jahre, n)`` and row
+    ``t`` holds the result of a contract whose last year is ``t``, so one
+    pass evaluates every laufzeit up to ``laufzeit``.
+    """
+    laufzeit = np.asarray(laufzeit)
+    jahre = len(jn)
+    shape = np.broadcast_shapes(
+        laufzeit.shape, np.shape(jn)[1:], np.shape(anteil)[1:], np.shape(rendite_police)[1:],
+        np.shape(rendite_depot)[1:], np.shape(teilfreistellung_depot)[1:], np.shape(basiszins_jahre)[1:],
+        *map(np.shape, (einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                        einmalbeitrag_sparplan, teilfreistellung_aktienfonds_sparplan, freistellungsauftrag_sparplan,
+                        basiszins_sparplan, effektivkosten_sparplan, steuerlast_sparplan)),
+    )
+    rentenkapital = np.zeros((jahre,) + shape if jaehrlich else shape)
+    fondssparplan = np.zeros((jahre,) + shape if jaehrlich else shape)
+
+    police_nk = np.broadcast_to(np.asarray(einmalbeitrag_police, dtype=np.float64), shape)
+    depot_nk = steuer_ums = vp_laufend = ertraege_laufend = 0.0
+    if verlauf:
+        verlauf_police = {name: np.empty((jahre,) + shape) for name in VERLAUF_POLICE}
+        verlauf_depot = {name: np.empty((jahre,) + shape) for name in VERLAUF_DEPOT}
+    for t in range(jahre):
+        # --- Fondspolice ---
+        beginn = police_nk
+        wert = beginn * rendite_police[t]
+        ende = beginn + wert
+        kosten = ende * effektivkosten_police
+        police_nk = ende - kosten
+        if verlauf:
+            for name, value in zip(VERLAUF_POLICE, (beginn, rendite_police[t], wert, kosten, police_nk)):
+                verlauf_police[name][t] = value
+
+        # --- Fondssparplan ---
+        beginn = einmalbeitrag_sparplan if t == 0 else depot_nk - steuer_ums
+        wert = beginn * rendite_depot[t]
+        ende = beginn + wert
+        kosten = ende * effektivkosten_sparplan
+        if basiszins_jahre is not None:
+            basiszins_sparplan = basiszins_jahre[t]
+        basisertrag = beginn * 0.7 * basiszins_sparplan
+        zuwachs = ende - beginn
+        vorabpauschale = np.where((zuwachs <= basisertrag) & (zuwachs >= 0), 0.0, basisertrag)
+        if t == 0:
+            vp_laufend = vorabpauschale
+            ertraege_laufend = wert
+        else:
+            neu = jn[t - 1] == 1
+            vp_laufend = np.where(neu, vorabpauschale, vp_laufend + vorabpauschale)
+            ertraege_laufend = np.where(neu, wert, ertraege_laufend + wert)
+        vp_zu_besteuern = vorabpauschale - vorabpauschale * teilfreistellung_depot[t]
+        fsa = freistellungsauftrag_sparplan
+        fsa_uebrig = np.where(vp_zu_besteuern >= fsa, 0.0, fsa - vp_zu_besteuern)
+        danach_zu_besteuern = np.where(fsa >= vp_zu_besteuern, 0.0, vp_zu_besteuern - fsa)
+        steuer_vp = danach_zu_besteuern * steuerlast_sparplan
+        depot_nk = ende - kosten - steuer_vp
+        letztes = laufzeit == t
+        umschichtung = np.where(letztes, 1.0, jn[t] * anteil[t])
+        umschichten = depot_nk * umschichtung
+        if t == 0:
+            minus_vp = (ertraege_laufend - vp_laufend) * jn[t]
+            ums_zu_besteuern = minus_vp - minus_vp * teilfreistellung_depot[t]
+        else:
+            minus_vp = (ertraege_laufend - vp_laufend) * umschichtung
+            ums_zu_besteuern = minus_vp - minus_vp * teilfreistellung_aktienfonds_sparplan
+        nach_fsa = np.where(fsa_uebrig > ums_zu_besteuern, 0.0, ums_zu_besteuern - fsa_uebrig)
+        steuer_ums = nach_fsa * steuerlast_sparplan
+        if verlauf:
+            werte = (beginn, rendite_depot[t], wert, kosten, depot_nk, vorabpauschale, steuer_vp, umschichten,
+                     steuer_ums, umschichten - steuer_ums)
+            for name, value in zip(VERLAUF_DEPOT, werte):
+                verlauf_depot[name][t] = value
+
+        if jaehrlich:
+            # Same steps as for the last year, where the whole depot is paid out
+            minus_vp = (ertraege_laufend - vp_laufend) * (jn[t] if t == 0 else 1.0)
+            tf = teilfreistellung_depot[t] if t == 0 else teilfreistellung_aktienfonds_sparplan
+            zu_besteuern = minus_vp - minus_vp * tf
+            nach_fsa = np.where(fsa_uebrig > zu_besteuern, 0.0, zu_besteuern - fsa_uebrig)
+            rentenkapital[t] = police_nk
+            fondssparplan[t] = depot_nk * 1.0 - nach_fsa * steuerlast_sparplan
+        else:
+            rentenkapital = np.where(letztes, police_nk, rentenkapital)
+            fondssparplan = np.where(letztes, umschichten - steuer_ums, fondssparplan)
+
+    ertraege = rentenkapital - einmalbeitrag_police
+    zu_besteuern = ertraege - ertraege * teilfreistellung_police
+    fondspolice = rentenkapital - zu_besteuern / 2 * steuersatz_police
+    ergebnisse = {
+        'fondspolice_rentenkapital': rentenkapital,
+        'fondspolice': fondspolice,
+        'fondssparplan': fondssparplan,
+    }
+    if verlauf:
+        ergebnisse['verlauf'] = {'police': verlauf_police, 'depot': verlauf_depot}
+    return ergebnisse
+
+
+def _rendite_tabellen(p):
+    police = np.stack([p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'],
+                       p['rendite_rentenfonds_police']])
+    depot = np.stack([p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                      p['rendite_rentenfonds_sparplan']])
+    teilfreistellung = np.stack([p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                                 p['teilfreistellung_rentenfonds_sparplan']])
+    return police, depot, teilfreistellung
+
+
+def project_arrays(p, schedule, verlauf=False, jaehrlich=False, sparraten=None):
+    """``project_batch`` for ``parameter_arrays`` columns and their ``schedule_arrays``.
+
+    With ``sparraten`` (see ``sparrate_arrays``) the clients run in the
+    monthly Sparrate mode of ``project_sparrate``.
+    """
+    code, jn, anteil = schedule
+    police, depot, teilfreistellung = _rendite_tabellen(p)
+    spalten = np.arange(code.shape[1])
+    kern = project_batch if sparraten is None else project_sparrate
+    return kern(
+        p['laufzeit'], jn, anteil,
+        police[code, spalten], depot[code, spalten], teilfreistellung[code, spalten],
+        p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        p['einmalbeitrag_sparplan'], p['teilfreistellung_aktienfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+        p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'],
+        verlauf=verlauf, jaehrlich=jaehrlich, **(sparraten or {}),
+    )
+
+
+def simulate_arrays(p, umschichtungen, verlauf=False, jaehrlich=False, schedule=None):
+    """Final values for clients given as ``parameter_arrays`` columns.
+
+    Clients with ``monatlich`` run in the monthly Sparrate mode and those
+    with partial Umschichtungen between funds in ``portfolio``.
+    ``schedule`` is ``schedule_arrays(p['laufzeit'], umschichtungen)``, for
+    callers that evaluate the same clients repeatedly.
+    """
+    if schedule is None:
+        schedule = schedule_arrays(p['laufzeit'], umschichtungen)
+    ergebnisse = project_arrays(p, schedule, verlauf, jaehrlich)
+    ergebnisse = _sparrate(ergebnisse, p, umschichtungen, verlauf, jaehrlich)
+    return _portfolio(ergebnisse, p, umschichtungen, verlauf, jaehrlich)
+
+
+def _sparrate(ergebnisse, p, umschichtungen, verlauf=False, jaehrlich=False):
+    # Clients in the monthly Sparrate mode are recomputed in project_sparrate
+    clients = np.flatnonzero(p.get('monatlich', ()))
+    if not len(clients):
+        return ergebnisse
+    pruefe_sparrate(any(ist_portfolio(umschichtungen[i]) for i in clients))
+    q = {key: values[clients] for key, values in p.items()}
+    schedule = schedule_arrays(q['laufzeit'], [umschichtungen[i] for i in clients])
+    sparraten = {key: q[key] for key in SPARRATE_FELDER}
+    r = project_arrays(q, schedule, verlauf, jaehrlich, sparraten)
+    return _uebernehmen(ergebnisse, r, clients, verlauf, jaehrlich)
+
+
+def _portfolio(ergebnisse, p, umschichtungen, verlauf=False, jaehrlich=False):
+    # Clients with partial Umschichtungen between funds are recomputed in the sleeve engine
+    clients = np.flatnonzero([ist_portfolio(u) for u in umschichtungen])
+    if not len(clients):
+        return ergebnisse
+    q = {key: values[clients] for key, values in p.items()}
+    r = portfolio_arrays(q, [umschichtungen[i] for i in clients], verlauf=verlauf, jaehrlich=jaehrlich)
+    return _uebernehmen(ergebnisse, r, clients, verlauf, jaehrlich)
+
+
+def _uebernehmen(ergebnisse, r, clients, verlauf, jaehrlich):
+    # Overwrite the columns of ``clients`` with ``r``, which may cover fewer years
+    for key in ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan'):
+        if jaehrlich:
+            ergebnisse[key][:len(r[key]), clients] = r[key]
+        else:
+            ergebnisse[key][clients] = r[key]
+    if verlauf:
+        for produkt, spalten in (('police', VERLAUF_POLICE), ('depot', VERLAUF_DEPOT)):
+            for name in spalten:
+                werte = r['verlauf'][produkt][name]
+                ergebnisse['verlauf'][produkt][name][:len(werte), clients] = werte
+    return ergebnisse
+
+
+def simulate_batch(parameter_sets, umschichtungen=None, chunk_size=CHUNK_SIZE, sprung=False):
+    """Compare Fondspolice and Fondssparplan for N parameters.json dicts.
+
+    ``umschichtungen`` defaults to the lists stored in the parameter sets.
+    Returns arrays of length N for ``fondspolice_rentenkapital``,
+    ``fondspolice`` and ``fondssparplan``. With ``sprung`` the years
+    without Umschichtung are skipped analytically (see ``sprung``).
+    Parameter sets with ``monatlich`` run in the monthly Sparrate mode and
+    those with partial Umschichtungen between funds in ``portfolio``.
+    """
+    if umschichtungen is None:
+        umschichtungen = [p.get('umschichtungen', []) for p in parameter_sets]
+    ergebnisse = {
+        'fondspolice_rentenkapital': np.empty(len(parameter_sets)),
+        'fondspolice': np.empty(len(parameter_sets)),
+        'fondssparplan': np.empty(len(parameter_sets)),
+    }
+    # Chunks keep the per-year working set in cache and bound the schedule memory
+    for start in range(0, len(parameter_sets), chunk_size):
+        stop = start + chunk_size
+        p = parameter_arrays(parameter_sets[start:stop])
+        teil = umschichtungen[start:stop]
+        if sprung:
+            chunk = _portfolio(_sparrate(project_sprung(p, teil), p, teil), p, teil)
+        else:
+            chunk = simulate_arrays(p, teil)
+        for key, values in chunk.items():
+            ergebnisse[key][start:stop] = values
+    return ergebnisse
@@ -0,0 +1,153 @@
+"""Bounded LRU caches for simulation results.
+
+Results are keyed by a canonical hash of every input. The app keeps a
+small cache per session in front of one process-wide cache, so a session
+finds its own recent results even while other sessions churn the shared
+one, and neither grows beyond its entry and byte limits.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from vergleichsrechner.engine import simulate
+from vergleichsrechner.portfolio import ist_portfolio, simulate_portfolio
+from vergleichsrechner.sparrate import simulate_sparrate
+from vergleichsrechner.tabelle import Tabelle
+
+SESSION_GROESSE = 8
+GLOBAL_GROESSE = 256
+GLOBAL_BYTES = 256 * 1024 * 1024
+
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f'{type(value).__name__} ist kein gültiger Cache-Schlüssel')
+
+
+def cache_key(*teile):
+    """Stable hash of JSON-like inputs; dict order does not matter, list order does."""
+    text = json.dumps(teile, sort_keys=True, separators=(',', ':'), default=_plain)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def nbytes(value):
+    """Approximate memory held by a cached result."""
+    if isinstance(value, (np.ndarray, Tabelle)):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value) + 8 * len(value)
+    return 64
+
+
+def _freeze(value):
+    # Cached arrays are shared between reruns and sessions
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, Tabelle):
+        value.daten.flags.writeable = False
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _freeze(v)
+    return value
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entries and bytes."""
+
+    def __init__(self, maxsize, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = nbytes(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.maxsize
+                                  or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+GLOBAL_CACHE = LRUCache(GLOBAL_GROESSE, GLOBAL_BYTES)
+
+
+def memoize(key, compute, session_cache=None, global_cache=GLOBAL_CACHE):
+    """Return the cached value for ``key`` or compute and store it in both tiers."""
+    _missing = object()
+    if session_cache is not None:
+        value = session_cache.get(key, _missing)
+        if value is not _missing:
+            return value
+    value = global_cache.get(key, _missing)
+    if value is _missing:
+        value = _freeze(compute())
+        global_cache.put(key, value)
+    if session_cache is not None:
+        session_cache.put(key, value)
+    return value
+
+
+def simulate_cached(parameter, umschichtungen, session_cache=None, projektion=None):
+    """``engine.simulate`` behind the session and global caches.
+
+    On a miss, a session's ``engine.Projektion`` resumes from the first
+    changed year instead of recomputing the whole contract. The monthly
+    Sparrate mode and the sleeve engine of ``portfolio`` always compute the
+    whole contract.
+    """
+    key = cache_key('simulate', parameter, umschichtungen)
+    if ist_portfolio(umschichtungen):
+        return memoize(key, lambda: simulate_portfolio(parameter, umschichtungen), session_cache)
+    if parameter.get('monatlich'):
+        return memoize(key, lambda: simulate_sparrate(parameter, umschichtungen), session_cache)
+    if projektion is None:
+        return memoize(key, lambda: simulate(parameter, umschichtungen), session_cache)
+    return memoize(key, lambda: projektion.update(parameter, umschichtungen), session_cache)
@@ -0,0 +1,327 @@
+"""Result charts, rendered once per data and cached as PNG.
+
+The ``*_png`` functions draw on one reusable ``matplotlib.figure.Figure``
+per chart instead of pyplot figures, so nothing piles up in pyplot's figure
+registry, and cache the PNG bytes by a hash of the plotted data in a
+byte-bounded LRU shared by all sessions. Matplotlib is only imported on the
+first cache miss. The ``*_vega`` functions build Vega-Lite specs of the same
+charts for ``st.vega_lite_chart``, which the browser renders without
+matplotlib at all.
+"""
+import io
+import threading
+
+import numpy as np
+
+from vergleichsrechner.cache import LRUCache, cache_key
+from vergleichsrechner.formatting import euro_formatter
+from vergleichsrechner.messung import phase
+
+KATEGORIEN = ('Fondspolice Rentenkapital', 'Fondspolice', 'Fondssparplan')
+FARBEN = ('#92d050', '#00a44a', '#00b0f0')
+HINTERGRUND = '#d6e8ee'
+
+DIAGRAMM_GROESSE = 64
+DIAGRAMM_BYTES = 64 * 1024 * 1024
+
+# Same output as st.pyplot
+SAVEFIG = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+CHART_CACHE = LRUCache(DIAGRAMM_GROESSE, DIAGRAMM_BYTES)
+
+_figuren = {}
+_lock = threading.Lock()
+
+
+def _euro(wert):
+    return f'{wert:,.0f} €'.replace(',', '.')
+
+
+def _figur(name):
+    from matplotlib.figure import Figure
+
+    fig = _figuren.get(name)
+    if fig is None:
+        fig = _figuren[name] = Figure(figsize=(10, 7), facecolor=HINTERGRUND)
+    return fig
+
+
+def _rendern(name, daten, zeichnen):
+    key = cache_key('diagramm', name, daten)
+    png = CHART_CACHE.get(key)
+    if png is None:
+        # Figures are shared, so drawing is serialized across sessions
+        with phase('matplotlib'), _lock:
+            fig = _figur(name)
+            try:
+                zeichnen(fig, *daten)
+                puffer = io.BytesIO()
+                fig.savefig(puffer, **SAVEFIG)
+            finally:
+                fig.clear()
+        png = puffer.getvalue()
+        CHART_CACHE.put(key, png)
+    return png
+
+
+def _ohne_rahmen(ax):
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+
+def _balken(fig, werte):
+    ax = fig.subplots()
+    ax.set_facecolor(HINTERGRUND)
+    bars = ax.bar(KATEGORIEN, werte, color=FARBEN)
+    ax.set_xlabel(' ')
+    ax.set_yticks([])
+    _ohne_rahmen(ax)
+    fig.tight_layout()
+    for bar in bars:
+        yval = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2, yval + 10, _euro(yval), ha='center', va='bottom')
+
+
+def _verlauf(fig, jahre_police, police, jahre_depot, depot, fondspolice, fondssparplan):
+    from matplotlib.ticker import FuncFormatter
+
+    ax = fig.subplots()
+    ax.set_facecolor(HINTERGRUND)
+    # Depot and Fondspolice end one year later at their after-tax payout
+    ax.plot(jahre_depot + [jahre_depot[-1] + 1], depot + [fondssparplan], linestyle='-', color=FARBEN[2])
+    ax.plot(jahre_police + [jahre_police[-1] + 1], police + [fondspolice], linestyle='-', color=FARBEN[1])
+    ax.plot(jahre_police, police, linestyle='-', color=FARBEN[0])
+    ax.set_xlabel(' ')
+    ax.set_ylabel(' ')
+    _ohne_rahmen(ax)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: euro_formatter(y)))
+    fig.tight_layout()
+
+
+def _monte_carlo(fig, baender):
+    ax = fig.subplots()
+    ax.set_facecolor(HINTERGRUND)
+    median = [b[1] for b in baender]
+    fehler = [[b[1] - b[0] for b in baender], [b[2] - b[1] for b in baender]]
+    ax.bar(KATEGORIEN, median, yerr=fehler, capsize=12, color=FARBEN)
+    ax.set_yticks([])
+    _ohne_rahmen(ax)
+    for x, b in enumerate(baender):
+        ax.text(x, b[2], _euro(b[2]), ha='center', va='bottom')
+        ax.text(x, b[1], _euro(b[1]), ha='center', va='bottom')
+    fig.tight_layout()
+
+
+def _heatmap(fig, x, y, vorteil, x_titel, y_titel):
+    from matplotlib.colors import Normalize, TwoSlopeNorm
+    from matplotlib.image import NonUniformImage
+    from matplotlib.ticker import FuncFormatter
+
+    ax = fig.subplots()
+    z = np.array(vorteil).T
+    # Green where the Fondspolice is ahead, red where the Fondssparplan is
+    if z.min() < 0 < z.max():
+        norm = TwoSlopeNorm(0.0, z.min(), z.max())
+    else:
+        norm = Normalize(z.min(), z.max())
+    # A raster image instead of one mesh patch per grid point keeps large grids cheap
+    bild = NonUniformImage(ax, cmap='RdYlGn', norm=norm, interpolation='nearest',
+                           extent=(x[0], x[-1], y[0], y[-1]))
+    bild.set_data(x, y, z)
+    ax.add_image(bild)
+    ax.set_xlim(x[0], x[-1])
+    ax.set_ylim(y[0], y[-1])
+    if z.min() < 0 < z.max():
+        ax.contour(x, y, z, levels=[0.0], colors='#41528b', linewidths=1.5)
+    ax.set_xlabel(x_titel)
+    ax.set_ylabel(y_titel)
+    leiste = fig.colorbar(bild, ax=ax, format=FuncFormatter(lambda v, _: euro_formatter(v)))
+    leiste.set_label('Vorteil Fondspolice')
+    fig.tight_layout()
+
+
+def _fenster(fig, startjahre, vorteil):
+    from matplotlib.ticker import FuncFormatter
+
+    ax = fig.subplots()
+    ax.set_facecolor(HINTERGRUND)
+    # Fondspolice colour where it is ahead, Fondssparplan colour where the depot is
+    ax.bar(startjahre, vorteil, color=[FARBEN[1] if v > 0 else FARBEN[2] for v in vorteil])
+    ax.axhline(0.0, color='#41528b', linewidth=1)
+    ax.set_xlabel('Startjahr')
+    ax.set_ylabel('Vorteil Fondspolice')
+    _ohne_rahmen(ax)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: euro_formatter(y)))
+    fig.tight_layout()
+
+
+def _tornado(fig, titel, police, sparplan):
+    from matplotlib.ticker import FuncFormatter
+
+    ax = fig.subplots()
+    ax.set_facecolor(HINTERGRUND)
+    # Largest swing at the top; each input has a bar per product from its low to its high step
+    y = np.arange(len(titel))[::-1]
+    for versatz, (tief, hoch), farbe, name in ((0.2, police, FARBEN[1], KATEGORIEN[1]),
+                                               (-0.2, sparplan, FARBEN[2], KATEGORIEN[2])):
+        links = np.minimum(tief, hoch)
+        ax.barh(y + versatz, np.abs(np.subtract(hoch, tief)), left=links, height=0.4, color=farbe, label=name)
+    ax.axvline(0.0, color='#41528b', linewidth=1)
+    ax.set_yticks(y, titel)
+    ax.legend(frameon=False)
+    _ohne_rahmen(ax)
+    ax.xaxis.set_major_formatter(FuncFormatter(lambda x, _: euro_formatter(x)))
+    fig.tight_layout()
+
+
+def _liste(werte):
+    return [float(w) for w in werte]
+
+
+def balken_png(werte):
+    """Bar chart of the three final values, in ``KATEGORIEN`` order."""
+    return _rendern('balken', (_liste(werte),), _balken)
+
+
+def verlauf_png(police, depot, fondspolice, fondssparplan):
+    """Yearly 'Jahresende nach Kosten' of both products, ending at the payouts.
+
+    ``police`` and ``depot`` are the engine tables.
+    """
+    daten = ([int(j) for j in police['Jahr']], _liste(police['Jahresende nach Kosten']),
+             [int(j) for j in depot['Jahr']], _liste(depot['Jahresende nach Kosten']),
+             float(fondspolice), float(fondssparplan))
+    return _rendern('verlauf', daten, _verlauf)
+
+
+def monte_carlo_png(baender):
+    """Median bars with 5th-95th percentile whiskers; ``baender`` holds three (p5, p50, p95)."""
+    return _rendern('monte_carlo', ([_liste(b) for b in baender],), _monte_carlo)
+
+
+def heatmap_png(x, y, vorteil, x_titel, y_titel):
+    """Fondspolice minus Fondssparplan over two inputs; ``vorteil[i, j]`` belongs to ``x[i]``, ``y[j]``."""
+    daten = (_liste(x), _liste(y), [_liste(zeile) for zeile in vorteil], x_titel, y_titel)
+    return _rendern('heatmap', daten, _heatmap)
+
+
+def fenster_png(startjahre, vorteil):
+    """Fondspolice minus Fondssparplan per start year of the backtest windows."""
+    return _rendern('fenster', ([int(j) for j in startjahre], _liste(vorteil)), _fenster)
+
+
+def tornado_png(titel, police, sparplan):
+    """Change of Fondspolice and Fondssparplan when each input moves down and up one step.
+
+    ``police`` and ``sparplan`` are pairs ``(tief, hoch)`` of changes, one value per entry of ``titel``.
+    """
+    daten = (list(titel), [_liste(w) for w in police], [_liste(w) for w in sparplan])
+    return _rendern('tornado', daten, _tornado)
+
+
+def _vega(layer, daten):
+    return {
+        'data': {'values': daten},
+        'background': HINTERGRUND,
+        'config': {'view': {'stroke': None}, 'axis': {'grid': False, 'domain': False}},
+        'height': 420,
+        'layer': layer,
+    }
+
+
+_FARBSKALA = {'domain': list(KATEGORIEN), 'range': list(FARBEN)}
+
+
+def balken_vega(werte):
+    daten = [{'kategorie': k, 'wert': float(w), 'text': _euro(w)} for k, w in zip(KATEGORIEN, werte)]
+    x = {'field': 'kategorie', 'type': 'nominal', 'sort': list(KATEGORIEN), 'title': None, 'axis': {'labelAngle': 0}}
+    y = {'field': 'wert', 'type': 'quantitative', 'axis': None}
+    return _vega([
+        {'mark': 'bar', 'encoding': {'x': x, 'y': y, 'color': {'field': 'kategorie', 'scale': _FARBSKALA,
+                                                                'legend': None}}},
+        {'mark': {'type': 'text', 'baseline': 'bottom', 'dy': -4},
+         'encoding': {'x': x, 'y': y, 'text': {'field': 'text'}}},
+    ], daten)
+
+
+def verlauf_vega(police, depot, fondspolice, fondssparplan):
+    linien = (
+        ('Fondssparplan', depot['Jahr'], depot['Jahresende nach Kosten'], fondssparplan),
+        ('Fondspolice', police['Jahr'], police['Jahresende nach Kosten'], fondspolice),
+        ('Fondspolice Rentenkapital', police['Jahr'], police['Jahresende nach Kosten'], None),
+    )
+    daten = []
+    for name, jahre, werte, auszahlung in linien:
+        daten.extend({'linie': name, 'jahr': int(j), 'wert': float(w)} for j, w in zip(jahre, werte))
+        if auszahlung is not None:
+            daten.append({'linie': name, 'jahr': int(jahre[-1]) + 1, 'wert': float(auszahlung)})
+    return _vega([{
+        'mark': 'line',
+        'encoding': {
+            'x': {'field': 'jahr', 'type': 'quantitative', 'title': None, 'axis': {'tickMinStep': 1}},
+            'y': {'field': 'wert', 'type': 'quantitative', 'title': None,
+                  'axis': {'labelExpr': "'€ ' + format(datum.value, ',.0f')"}},
+            'color': {'field': 'linie', 'scale': _FARBSKALA, 'legend': None},
+        },
+    }], daten)
+
+
+def monte_carlo_vega(baender):
+    daten = [{'kategorie': k, 'p5': float(b[0]), 'p50': float(b[1]), 'p95': float(b[2]),
+              'text50': _euro(b[1]), 'text95': _euro(b[2])} for k, b in zip(KATEGORIEN, baender)]
+    x = {'field': 'kategorie', 'type': 'nominal', 'sort': list(KATEGORIEN), 'title': None, 'axis': {'labelAngle': 0}}
+    return _vega([
+        {'mark': 'bar', 'encoding': {'x': x, 'y': {'field': 'p50', 'type': 'quantitative', 'axis': None},
+                                     'color': {'field': 'kategorie', 'scale': _FARBSKALA, 'legend': None}}},
+        {'mark': 'rule', 'encoding': {'x': x, 'y': {'field': 'p5', 'type': 'quantitative'}, 'y2': {'field': 'p95'}}},
+        {'mark': {'type': 'text', 'baseline': 'bottom', 'dy': -4},
+         'encoding': {'x': x, 'y': {'field': 'p95', 'type': 'quantitative'}, 'text': {'field': 'text95'}}},
+        {'mark': {'type': 'text', 'baseline': 'bottom', 'dy': -4},
+         'encoding': {'x': x, 'y': {'field': 'p50', 'type': 'quantitative'}, 'text': {'field': 'text50'}}},
+    ], daten)
+
+
+def heatmap_vega(x, y, vorteil, x_titel, y_titel):
+    daten = [{'x': float(a), 'y': float(b), 'vorteil': float(v)}
+             for a, zeile in zip(x, vorteil) for b, v in zip(y, zeile)]
+    return _vega([{
+        'mark': 'rect',
+        'encoding': {
+            'x': {'field': 'x', 'type': 'ordinal', 'title': x_titel, 'axis': {'labelOverlap': True}},
+            'y': {'field': 'y', 'type': 'ordinal', 'title': y_titel, 'sort': 'descending',
+                  'axis': {'labelOverlap': True}},
+            'color': {'field': 'vorteil', 'type': 'quantitative', 'title': 'Vorteil Fondspolice',
+                      'scale': {'scheme': 'redyellowgreen', 'domainMid': 0}},
+        },
+    }], daten)
+
+
+def fenster_vega(startjahre, vorteil):
+    daten = [{'startjahr': int(j), 'vorteil': float(v), 'vorn': KATEGORIEN[1] if v > 0 else KATEGORIEN[2]}
+             for j, v in zip(startjahre, vorteil)]
+    return _vega([{
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'startjahr', 'type': 'ordinal', 'title': 'Startjahr', 'axis': {'labelOverlap': True}},
+            'y': {'field': 'vorteil', 'type': 'quantitative', 'title': 'Vorteil Fondspolice',
+                  'axis': {'labelExpr': "'€ ' + format(datum.value, ',.0f')"}},
+            'color': {'field': 'vorn', 'scale': _FARBSKALA, 'legend': None},
+        },
+    }], daten)
+
+
+def tornado_vega(titel, police, sparplan):
+    daten = [{'eingabe': t, 'produkt': name, 'tief': float(tief), 'hoch': float(hoch)}
+             for name, werte in ((KATEGORIEN[1], police), (KATEGORIEN[2], sparplan))
+             for t, tief, hoch in zip(titel, *werte)]
+    return _vega([{
+        'mark': 'bar',
+        'encoding': {
+            'y': {'field': 'eingabe', 'type': 'nominal', 'sort': list(titel), 'title': None},
+            'yOffset': {'field': 'produkt'},
+            'x': {'field': 'tief', 'type': 'quantitative', 'title': None,
+                  'axis': {'labelExpr': "'€ ' + format(datum.value, ',.0f')"}},
+            'x2': {'field': 'hoch'},
+            'color': {'field': 'produkt', 'scale': _FARBSKALA, 'legend': {'orient': 'bottom', 'title': None}},
+        },
+    }], daten)
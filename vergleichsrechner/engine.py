@@ -0,0 +1,285 @@
+"""Year-by-year projection of Fondspolice and Fondssparplan.
+
+The recursion runs on plain floats, collects one row tuple per year and
+packs them into one ``Tabelle`` per product at the end; callers
+materialize a DataFrame only for the columns they show.
+"""
+from vergleichsrechner.messung import phase
+from vergleichsrechner.schedule import PRODUKTE, build_schedule, first_difference, per_year
+from vergleichsrechner.tabelle import Tabelle
+
+POLICE_SPALTEN = (
+    'Jahr',
+    'UmschichtungJN',
+    'AnteilUmschichtung',
+    'Jahresbeginn',
+    'Nach Beitragskosten und Abschlusskosten',
+    'Rendite',
+    'Wertsteigerung',
+    'Jahresende',
+    'Kosten Fondsguthaben',
+    'Jahresende nach Kosten',
+    'Einzahlung',
+    'Umschichtung',
+    'Umschichten oder Auszahlen',
+    'Einzahlungen',
+    'Erträge',
+    'Teilfreistellung',
+    'zu besteuern',
+    'HEV',
+    'Steuerlast',
+)
+
+DEPOT_SPALTEN = (
+    'Jahr',
+    'UmschichtungJN',
+    'AnteilUmschichtung',
+    'Jahresbeginn',
+    'Nach Orderprov. und Ausgabeaufschl.',
+    'Rendite',
+    'Wertsteigerung',
+    'Wertsteigerunglaufend',
+    'Jahresende',
+    'Kosten auf Fondsguthaben',
+    'Jahresende nach Kosten',
+    'Basisertrag',
+    'Vorabpauschale',
+    'Vorabpauschalelaufend',
+    'Teilfreistellung',
+    'zu besteuern',
+    'Freistellungsauftrag',
+    'Freistellung übrig',
+    'danach zu besteuern',
+    'Steuerlast',
+    'Einzahlung',
+    'Umschichtung',
+    'Umschichten',
+    'Erträgelaufend',
+    'Erträge',
+    'minus Vorabpauschale',
+    'Teilfreistellung Umschichtung',
+    'zu besteuern Umschichtung',
+    'nach Freistellungsauftrag',
+    'Steuerlast Umschichtung',
+    'Kapital abzüglich Steuer',
+)
+
+
+def _police_rows(rows, start, schedule, rendite, einmalbeitrag_police, effektivkosten_police):
+    # Rows before ``start`` are kept; each row holds the state its successor needs
+    del rows[start:]
+    ende_nk = rows[-1][9] if rows else 0.0
+    rendite = rendite[start:].tolist()
+    jns = schedule['jn'][start:].tolist()
+    anteile = schedule['anteil'][start:].tolist()
+    for i, r, jn, anteil in zip(range(start, len(schedule)), rendite, jns, anteile):
+        beginn = einmalbeitrag_police if i == 0 else ende_nk
+        wert = beginn * r
+        ende = beginn + wert
+        kosten = ende * effektivkosten_police
+        ende_nk = ende - kosten
+        umschichtung = jn * anteil
+        rows.append((
+            i + 1, jn, anteil, beginn, beginn, r, wert, ende, kosten, ende_nk,
+            einmalbeitrag_police if i == 0 else 0, umschichtung, ende_nk * umschichtung,
+            0, 0, 0, 0, 0, 0,
+        ))
+    return rows
+
+
+def _police_tabelle(rows, einmalbeitrag_police, teilfreistellung_police, steuersatz_police):
+    return police_steuer(Tabelle.aus_zeilen(POLICE_SPALTEN, rows), einmalbeitrag_police, teilfreistellung_police,
+                         steuersatz_police)
+
+
+def police_steuer(tabelle, einzahlungen, teilfreistellung_police, steuersatz_police):
+    """Fill the payout tax columns of a police ``Tabelle``; ``einzahlungen`` is the sum paid in."""
+    laufzeit = tabelle.jahre - 1
+    # The final payout is taxed in the last year (not when the contract runs a single year)
+    if laufzeit > 0:
+        ertraege = tabelle['Umschichten oder Auszahlen'][laufzeit] - einzahlungen
+        teilfreistellung = ertraege * teilfreistellung_police
+        zu_besteuern = ertraege - teilfreistellung
+        hev = zu_besteuern / 2
+        # Float columns are views into the block
+        tabelle['Einzahlungen'][laufzeit] = einzahlungen
+        tabelle['Erträge'][laufzeit] = ertraege
+        tabelle['Teilfreistellung'][laufzeit] = teilfreistellung
+        tabelle['zu besteuern'][laufzeit] = zu_besteuern
+        tabelle['HEV'][laufzeit] = hev
+        tabelle['Steuerlast'][laufzeit] = hev * steuersatz_police
+    return tabelle
+
+
+def _depot_rows(rows, start, schedule, rendite, teilfreistellung, teilfreistellung_aktienfonds_sparplan,
+                einmalbeitrag_sparplan, freistellungsauftrag_sparplan, basiszins_sparplan, effektivkosten_sparplan,
+                steuerlast_sparplan):
+    del rows[start:]
+    if rows:
+        vorjahr = rows[-1]
+        ende_nk, vp_laufend, ertraege_laufend, steuer_ums = vorjahr[10], vorjahr[13], vorjahr[23], vorjahr[29]
+        neu = vorjahr[1] == 1
+    else:
+        ende_nk = steuer_ums = vp_laufend = ertraege_laufend = 0.0
+        neu = True
+    jahre = zip(
+        range(start, len(schedule)), rendite[start:].tolist(), teilfreistellung[start:].tolist(),
+        schedule['jn'][start:].tolist(), schedule['anteil'][start:].tolist(), schedule['letztes'][start:].tolist(),
+    )
+    for i, r, tf, jn, anteil, letztes in jahre:
+
+        beginn = einmalbeitrag_sparplan if i == 0 else ende_nk - steuer_ums
+        wert = beginn * r
+        ende = beginn + wert
+        kosten = ende * effektivkosten_sparplan
+        basisertrag = beginn * 0.7 * basiszins_sparplan
+        if basisertrag >= ende - beginn >= 0:
+            vorabpauschale = 0
+        else:
+            vorabpauschale = basisertrag
+        vp_laufend = vorabpauschale if neu else vp_laufend + vorabpauschale
+        vp_teilfreistellung = vorabpauschale * tf
+        vp_zu_besteuern = vorabpauschale - vp_teilfreistellung
+        fsa = freistellungsauftrag_sparplan
+        fsa_uebrig = 0 if vp_zu_besteuern >= fsa else fsa - vp_zu_besteuern
+        danach_zu_besteuern = 0 if fsa >= vp_zu_besteuern else vp_zu_besteuern - fsa
+        steuer_vp = danach_zu_besteuern * steuerlast_sparplan
+        ende_nk = ende - kosten - steuer_vp
+        if letztes:
+            umschichtung = 1
+            umschichten = ende_nk
+        else:
+            umschichtung = jn * anteil
+            umschichten = ende_nk * umschichtung
+        ertraege_laufend = wert if neu else ertraege_laufend + wert
+        if i == 0:
+            # The first year weighs its gains by the rollover flag and uses the product's Teilfreistellung
+            ertraege = ertraege_laufend * jn
+            minus_vp = (ertraege_laufend - vp_laufend) * jn
+            ums_teilfreistellung = minus_vp * tf
+        else:
+            ertraege = ertraege_laufend * umschichtung
+            minus_vp = (ertraege_laufend - vp_laufend) * umschichtung
+            ums_teilfreistellung = minus_vp * teilfreistellung_aktienfonds_sparplan
+        ums_zu_besteuern = minus_vp - ums_teilfreistellung
+        nach_fsa = 0 if fsa_uebrig > ums_zu_besteuern else ums_zu_besteuern - fsa_uebrig
+        steuer_ums = nach_fsa * steuerlast_sparplan
+        # Gains and Vorabpauschalen restart after a rollover
+        neu = jn == 1
+
+        rows.append((
+            i + 1, jn, anteil, beginn, beginn, r, wert, 0, ende, kosten, ende_nk,
+            basisertrag, vorabpauschale, vp_laufend, vp_teilfreistellung, vp_zu_besteuern,
+            fsa, fsa_uebrig, danach_zu_besteuern, steuer_vp, einmalbeitrag_sparplan if i == 0 else 0,
+            umschichtung, umschichten, ertraege_laufend, ertraege, minus_vp, ums_teilfreistellung,
+            ums_zu_besteuern, nach_fsa, steuer_ums, umschichten - steuer_ums,
+        ))
+    return rows
+
+
+def project_police(laufzeit, umschichtungen, einmalbeitrag_police,
+                    rendite_aktienfonds_police, rendite_mischfonds_police, rendite_rentenfonds_police,
+                    effektivkosten_police, teilfreistellung_police, steuersatz_police):
+    """Project the Fondspolice; ``laufzeit`` is the index of the last year.
+
+    Returns a ``Tabelle`` with the columns of ``POLICE_SPALTEN``.
+    """
+    schedule = build_schedule(laufzeit, umschichtungen)
+    rendite = per_year(schedule, rendite_aktienfonds_police, rendite_mischfonds_police, rendite_rentenfonds_police)
+    rows = _police_rows([], 0, schedule, rendite, einmalbeitrag_police, effektivkosten_police)
+    return _police_tabelle(rows, einmalbeitrag_police, teilfreistellung_police, steuersatz_police)
+
+
+def project_depot(laufzeit, umschichtungen, einmalbeitrag_sparplan,
+                   rendite_aktienfonds_sparplan, rendite_mischfonds_sparplan, rendite_rentenfonds_sparplan,
+                   teilfreistellung_aktienfonds_sparplan, teilfreistellung_mischfonds_sparplan,
+                   teilfreistellung_rentenfonds_sparplan, freistellungsauftrag_sparplan,
+                   basiszins_sparplan, effektivkosten_sparplan, steuerlast_sparplan):
+    """Project the Fondssparplan; ``laufzeit`` is the index of the last year.
+
+    Returns a ``Tabelle`` with the columns of ``DEPOT_SPALTEN``.
+    """
+    schedule = build_schedule(laufzeit, umschichtungen)
+    rendite = per_year(schedule, rendite_aktienfonds_sparplan, rendite_mischfonds_sparplan, rendite_rentenfonds_sparplan)
+    teilfreistellung = per_year(schedule, teilfreistellung_aktienfonds_sparplan, teilfreistellung_mischfonds_sparplan,
+                                teilfreistellung_rentenfonds_sparplan)
+    rows = _depot_rows([], 0, schedule, rendite, teilfreistellung, teilfreistellung_aktienfonds_sparplan,
+                       einmalbeitrag_sparplan, freistellungsauftrag_sparplan, basiszins_sparplan,
+                       effektivkosten_sparplan, steuerlast_sparplan)
+    return Tabelle.aus_zeilen(DEPOT_SPALTEN, rows)
+
+
+def fondspolice_nach_steuer(rentenkapital, einmalbeitrag_police, teilfreistellung_police, steuersatz_police):
+    """Fondspolice payout after the HEV-halved tax on the gains."""
+    ertraege = rentenkapital - einmalbeitrag_police
+    teilfreistellung = ertraege * teilfreistellung_police
+    zu_besteuern = ertraege - teilfreistellung
+    hev = zu_besteuern / 2
+    return rentenkapital - hev * steuersatz_police
+
+
+def simulate(parameter, umschichtungen):
+    """Both projections for a dict of app inputs (fractions, ``laufzeit`` as last index)."""
+    return Projektion().update(parameter, umschichtungen)
+
+
+class Projektion:
+    """Projection that resumes from the first year whose inputs changed.
+
+    The per-year rows of the last run double as state snapshots. Adding or
+    removing an Umschichtung in year k, or extending the laufzeit, only
+    recomputes the years from k (or the old last year) onwards; changing a
+    police or depot parameter recomputes that product from year 0.
+    """
+
+    POLICE_FELDER = ('einmalbeitrag_police', 'rendite_aktienfonds_police', 'rendite_mischfonds_police',
+                     'rendite_rentenfonds_police', 'effektivkosten_police')
+    DEPOT_FELDER = ('einmalbeitrag_sparplan', 'rendite_aktienfonds_sparplan', 'rendite_mischfonds_sparplan',
+                    'rendite_rentenfonds_sparplan', 'teilfreistellung_aktienfonds_sparplan',
+                    'teilfreistellung_mischfonds_sparplan', 'teilfreistellung_rentenfonds_sparplan',
+                    'freistellungsauftrag_sparplan', 'basiszins_sparplan', 'effektivkosten_sparplan',
+                    'steuerlast_sparplan')
+
+    def __init__(self):
+        self._schedule = build_schedule(-1, [])
+        self._police_parameter = self._depot_parameter = None
+        self._police_rows = []
+        self._depot_rows = []
+        # First year recomputed by the last update, per product
+        self.start_police = self.start_depot = 0
+
+    def update(self, parameter, umschichtungen):
+        p = parameter
+        schedule = build_schedule(p['laufzeit'], umschichtungen)
+        police_parameter = tuple(p[key] for key in self.POLICE_FELDER)
+        depot_parameter = tuple(p[key] for key in self.DEPOT_FELDER)
+        ab = first_difference(self._schedule, schedule)
+        self._schedule = schedule
+
+        self.start_police = ab if police_parameter == self._police_parameter else 0
+        self._police_parameter = police_parameter
+        with phase('police'):
+            _police_rows(
+                self._police_rows, self.start_police, schedule,
+                per_year(schedule, p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'],
+                         p['rendite_rentenfonds_police']),
+                p['einmalbeitrag_police'], p['effektivkosten_police'],
+            )
+            police = _police_tabelle(self._police_rows, p['einmalbeitrag_police'], p['teilfreistellung_police'],
+                                     p['steuersatz_police'])
+
+        self.start_depot = ab if depot_parameter == self._depot_parameter else 0
+        self._depot_parameter = depot_parameter
+        with phase('depot'):
+            _depot_rows(
+                self._depot_rows, self.start_depot, schedule,
+                per_year(schedule, p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                         p['rendite_rentenfonds_sparplan']),
+                per_year(schedule, p['teilfreistellung_aktienfonds_sparplan'],
+                         p['teilfreistellung_mischfonds_sparplan'], p['teilfreistellung_rentenfonds_sparplan']),
+                p['teilfreistellung_aktienfonds_sparplan'], p['einmalbeitrag_sparplan'],
+                p['freistellungsauftrag_sparplan'], p['basiszins_sparplan'], p['effektivkosten_sparplan'],
+                p['steuerlast_sparplan'],
+            )
+            depot = Tabelle.aus_zeilen(DEPOT_SPALTEN, self._depot_rows)
+        return {'police': police, 'depot': depot}
@@ -0,0 +1,79 @@
+"""CSV and Excel export of result tables, built on request and cached.
+
+``iter_csv`` streams any dict of equal-length columns (a yearly table or
+the arrays of ``simulate_batch``) in blocks of rows, so large batch results
+never exist as one string. The output matches ``DataFrame.to_csv(index=False)``.
+Excel needs openpyxl, which is optional.
+"""
+import csv
+import io
+
+import numpy as np
+
+from vergleichsrechner.cache import LRUCache, cache_key, memoize
+from vergleichsrechner.messung import phase
+
+EXPORT_GROESSE = 32
+EXPORT_BYTES = 64 * 1024 * 1024
+CSV_ZEILEN = 4096
+
+EXPORT_CACHE = LRUCache(EXPORT_GROESSE, EXPORT_BYTES)
+
+
+def _werte(spalte, runden):
+    spalte = np.asarray(spalte)
+    if runden is not None and spalte.dtype.kind == 'f':
+        spalte = spalte.round(runden)
+    return spalte.tolist()
+
+
+def iter_csv(spalten, runden=None, zeilen=CSV_ZEILEN):
+    """Yield the CSV text of ``spalten`` in blocks of ``zeilen`` rows, header first."""
+    namen = list(spalten)
+    puffer = io.StringIO()
+    writer = csv.writer(puffer, lineterminator='\n')
+    writer.writerow(namen)
+    anzahl = len(spalten[namen[0]]) if namen else 0
+    for start in range(0, anzahl, zeilen):
+        block = [_werte(spalten[name][start:start + zeilen], runden) for name in namen]
+        writer.writerows(zip(*block))
+        yield puffer.getvalue()
+        puffer.seek(0)
+        puffer.truncate()
+    if puffer.tell():
+        yield puffer.getvalue()
+
+
+def tabelle_csv(tabelle):
+    """A yearly table as shown in the app, rounded to cents."""
+    with phase('csv'):
+        return ''.join(iter_csv(tabelle, runden=2))
+
+
+def excel_bytes(police, depot, zusammenfassung):
+    """Workbook with a summary sheet and both yearly tables.
+
+    ``zusammenfassung`` is a list of ``(bezeichnung, wert)`` rows.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError('Excel-Export benötigt openpyxl (pip install openpyxl)')
+    with phase('excel'):
+        workbook = Workbook(write_only=True)
+        blatt = workbook.create_sheet('Zusammenfassung')
+        for zeile in zusammenfassung:
+            blatt.append(list(zeile))
+        for name, tabelle in (('Fondspolice', police), ('Fondssparplan', depot)):
+            blatt = workbook.create_sheet(name)
+            blatt.append(list(tabelle))
+            for zeile in zip(*(_werte(spalte, 2) for spalte in tabelle.values())):
+                blatt.append(zeile)
+        puffer = io.BytesIO()
+        workbook.save(puffer)
+    return puffer.getvalue()
+
+
+def export_cached(art, eingaben, erzeugen):
+    """The export ``art`` for ``eingaben``, built by ``erzeugen`` only on a cache miss."""
+    return memoize(cache_key('export', art, eingaben), erzeugen, global_cache=EXPORT_CACHE)
@@ -0,0 +1,14 @@
+"""Number formatting for the German UI."""
+
+
+def format_german(value):
+    v1 = f'{value:,.2f} €'
+    v2 = v1.replace(',','#')
+    v3 = v2.replace('.','%')
+    v4 = v3.replace('#','.')
+    v5 = v4.replace('%',',')
+    return v5
+
+
+def euro_formatter(value):
+    return f'€ {value:,.0f}'.replace(',', '.').replace('.', ',')
@@ -0,0 +1,170 @@
+"""Per-phase timings of app reruns, rolling percentiles and optional profiling.
+
+A ``Lauf`` covers one rerun of the app. ``zwischenzeit`` books the time
+since the previous mark to a phase, so the linear app script only needs
+one call at the end of each section. ``phase`` times a block wherever it
+runs (engine, charts, export); inside a rerun it is booked to that
+``Lauf``, elsewhere (e.g. a deferred download) straight to ``MESSUNG``.
+Phases may nest: a lap includes the phases that ran during it.
+
+Every finished rerun is logged as one JSON line on the logger
+``vergleichsrechner.messung``; ``protokoll_datei`` sends those lines to a
+file a local collector can scrape.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+FENSTER = 1000
+PROFIL_ZEILEN = 40
+
+logger = logging.getLogger(__name__)
+
+_lokal = threading.local()
+
+
+class Messung:
+    """Rolling window of durations per phase, shared by all sessions."""
+
+    def __init__(self, fenster=FENSTER):
+        self.fenster = fenster
+        self._werte = {}
+        self._lock = threading.Lock()
+
+    def erfasse(self, name, sekunden):
+        with self._lock:
+            werte = self._werte.get(name)
+            if werte is None:
+                werte = self._werte[name] = deque(maxlen=self.fenster)
+            werte.append(sekunden)
+
+    def zusammenfassung(self):
+        """``(phase, anzahl, p50_ms, p95_ms, letzter_ms)`` per phase in order of first use."""
+        with self._lock:
+            kopie = {name: list(werte) for name, werte in self._werte.items()}
+        zeilen = []
+        for name, werte in kopie.items():
+            p50, p95 = np.percentile(werte, (50, 95)) * 1e3
+            zeilen.append((name, len(werte), float(p50), float(p95), werte[-1] * 1e3))
+        return zeilen
+
+    def zuruecksetzen(self):
+        with self._lock:
+            self._werte.clear()
+
+
+MESSUNG = Messung()
+
+
+def _profiler(art):
+    if art == 'cprofile':
+        import cProfile
+
+        return cProfile.Profile()
+    if art == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError('Profiling mit pyinstrument benötigt pyinstrument (pip install pyinstrument)')
+        return Profiler(async_mode='disabled')
+    raise ValueError(f'unbekannter Profiler: {art}')
+
+
+class Lauf:
+    """Timings of one rerun; ``profil`` is None, 'cprofile' or 'pyinstrument'."""
+
+    def __init__(self, name='rerun', sitzung=None, profil=None, messung=MESSUNG):
+        self.name = name
+        self.sitzung = sitzung
+        self.messung = messung
+        self.phasen = {}
+        self.profil = None
+        self._profiler = _profiler(profil) if profil else None
+        self._start = self._marke = time.perf_counter()
+        if profil == 'cprofile':
+            self._profiler.enable()
+        elif profil:
+            self._profiler.start()
+
+    def erfasse(self, name, sekunden):
+        self.phasen[name] = self.phasen.get(name, 0.0) + sekunden
+
+    def zwischenzeit(self, name):
+        jetzt = time.perf_counter()
+        self.erfasse(name, jetzt - self._marke)
+        self._marke = jetzt
+
+    def _profil_beenden(self):
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return
+        if hasattr(profiler, 'output_text'):
+            profiler.stop()
+            self.profil = profiler.output_text(unicode=True, color=False)
+        else:
+            import pstats
+
+            profiler.disable()
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFIL_ZEILEN)
+            self.profil = text.getvalue()
+
+    def beende(self):
+        """Book all phases and the total, write the log line and return the phases in ms."""
+        gesamt = time.perf_counter() - self._start
+        self._profil_beenden()
+        if getattr(_lokal, 'lauf', None) is self:
+            _lokal.lauf = None
+        for name, sekunden in self.phasen.items():
+            self.messung.erfasse(name, sekunden)
+        self.messung.erfasse(self.name, gesamt)
+        eintrag = {
+            'zeit': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'lauf': self.name,
+            'sitzung': self.sitzung,
+            'gesamt_ms': round(gesamt * 1e3, 3),
+            'phasen_ms': {name: round(sekunden * 1e3, 3) for name, sekunden in self.phasen.items()},
+        }
+        logger.info(json.dumps(eintrag, ensure_ascii=False))
+        return eintrag['phasen_ms']
+
+
+def starte_lauf(name='rerun', sitzung=None, profil=None):
+    """Start a ``Lauf`` for the current thread; one left open by an aborted rerun is dropped."""
+    alt = getattr(_lokal, 'lauf', None)
+    if alt is not None:
+        alt._profil_beenden()
+    _lokal.lauf = Lauf(name, sitzung, profil)
+    return _lokal.lauf
+
+
+@contextmanager
+def phase(name):
+    """Time the block and book it to the current ``Lauf`` or to ``MESSUNG``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        dauer = time.perf_counter() - start
+        lauf = getattr(_lokal, 'lauf', None)
+        (MESSUNG if lauf is None else lauf).erfasse(name, dauer)
+
+
+def protokoll_datei(pfad):
+    """Append the JSON lines of ``logger`` to ``pfad``; calling it again is a no-op."""
+    pfad = os.path.abspath(pfad)
+    if any(getattr(handler, 'baseFilename', None) == pfad for handler in logger.handlers):
+        return
+    handler = logging.FileHandler(pfad, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,95 @@
+"""Monte Carlo simulation with stochastic annual fund returns.
+
+Annual returns per product are lognormal: the configured Rendite is the
+expected simple return, the Volatilität its standard deviation, and the
+products' log returns are correlated. Police and depot share the same
+draws, so both products see the same market. Paths are the batch axis of
+``project_batch``, so the full tax logic runs vectorized across paths.
+"""
+import numpy as np
+
+from vergleichsrechner.batch import project_batch
+from vergleichsrechner.portfolio import ist_portfolio, portfolio_schedule, project_portfolio, pruefe_sparrate
+from vergleichsrechner.schedule import PRODUKTE, build_schedule
+from vergleichsrechner.sparrate import project_sparrate, sparrate_argumente
+
+VOLATILITAET = {"Aktienfonds": 0.16, "Mischfonds": 0.09, "Rentenfonds": 0.05}
+
+# Aktien/Misch, Aktien/Renten, Misch/Renten
+KORRELATION = {("Aktienfonds", "Mischfonds"): 0.8, ("Aktienfonds", "Rentenfonds"): 0.2,
+               ("Mischfonds", "Rentenfonds"): 0.5}
+
+PERZENTILE = (5, 50, 95)
+
+
+def korrelationsmatrix(korrelation=None):
+    """Full matrix over ``PRODUKTE`` from pairwise correlations."""
+    korrelation = KORRELATION if korrelation is None else korrelation
+    matrix = np.eye(len(PRODUKTE))
+    for (a, b), rho in korrelation.items():
+        i, j = PRODUKTE.index(a), PRODUKTE.index(b)
+        matrix[i, j] = matrix[j, i] = rho
+    return matrix
+
+
+def draw_shocks(jahre, pfade, volatilitaet=None, korrelation=None, seed=None):
+    """Correlated log-return shocks of shape ``(jahre, pfade, produkte)``."""
+    volatilitaet = VOLATILITAET if volatilitaet is None else volatilitaet
+    try:
+        chol = np.linalg.cholesky(korrelationsmatrix(korrelation))
+    except np.linalg.LinAlgError:
+        raise ValueError('Korrelationsmatrix ist nicht positiv definit')
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((jahre, pfade, len(PRODUKTE))) @ chol.T
+    return z, np.array([volatilitaet[name] for name in PRODUKTE])
+
+
+def lognormal_returns(mittel, volatilitaet, z):
+    """Simple returns with expectation ``mittel`` and std ``volatilitaet``."""
+    mittel = np.asarray(mittel, dtype=np.float64)
+    sigma2 = np.log1p(volatilitaet ** 2 / (1 + mittel) ** 2)
+    return np.expm1(np.log1p(mittel) - sigma2 / 2 + np.sqrt(sigma2) * z)
+
+
+def simulate_paths(p, umschichtungen, pfade=10000, volatilitaet=None, korrelation=None, seed=None):
+    """Final values per path for one client.
+
+    ``p`` holds the inputs in app units (fractions, ``laufzeit`` as index of
+    the last year), keyed like parameters.json. With ``p['monatlich']`` the
+    paths run through ``project_sparrate``; the annual draws are spread
+    evenly over the months. Partial Umschichtungen between funds run through
+    ``project_portfolio`` with one draw per sleeve.
+    """
+    laufzeit = p['laufzeit']
+    schedule = build_schedule(laufzeit, umschichtungen)
+    z, vol = draw_shocks(laufzeit + 1, pfade, volatilitaet, korrelation, seed)
+    police = lognormal_returns([p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'],
+                                p['rendite_rentenfonds_police']], vol, z)
+    depot = lognormal_returns([p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                               p['rendite_rentenfonds_sparplan']], vol, z)
+    teilfreistellung = np.array([p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                                 p['teilfreistellung_rentenfonds_sparplan']])
+    if ist_portfolio(umschichtungen):
+        pruefe_sparrate(p.get('monatlich'))
+        abgang, ziel = portfolio_schedule(laufzeit, [umschichtungen])
+        return project_portfolio(
+            laufzeit, abgang, ziel, police.transpose(0, 2, 1), depot.transpose(0, 2, 1), teilfreistellung[:, None],
+            p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+            p['einmalbeitrag_sparplan'], p['freistellungsauftrag_sparplan'], p['basiszins_sparplan'],
+            p['effektivkosten_sparplan'], p['steuerlast_sparplan'],
+        )
+    jahre = np.arange(laufzeit + 1)
+    produkt = schedule['produkt']
+    kern, sparraten = (project_sparrate, sparrate_argumente(p)) if p.get('monatlich') else (project_batch, {})
+    return kern(
+        laufzeit, schedule['jn'][:, None], schedule['anteil'][:, None],
+        police[jahre, :, produkt], depot[jahre, :, produkt], teilfreistellung[produkt][:, None],
+        p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        p['einmalbeitrag_sparplan'], p['teilfreistellung_aktienfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+        p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'], **sparraten,
+    )
+
+
+def perzentile(ergebnisse, q=PERZENTILE):
+    """Percentiles of each result array, keyed like the results."""
+    return {key: np.percentile(werte, q) for key, werte in ergebnisse.items()}
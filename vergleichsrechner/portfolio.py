@@ -0,0 +1,335 @@
+"""Portfolio of fund sleeves with partial Umschichtungen.
+
+Both products hold one sleeve per fund type (``PRODUKTE``), each with its
+own Rendite and, in the depot, its own Teilfreistellung and running
+Erträge and Vorabpauschalen. The contract starts fully in Aktienfonds. An
+Umschichtung with ``umschichten_von`` moves ``anteil`` of that sleeve into
+``umschichten_in`` at the start of year ``jahr``; one without it moves
+``anteil`` of every other sleeve, so ``jahr`` 0 events set up a mixed
+portfolio. Several events in one year apply in list order.
+
+The depot books a sale the way the single-product engine books a
+switch: the moved share earns in its new sleeve from the start of year
+``jahr``, its gains less its Vorabpauschalen (including those of year
+``jahr``) are taxed at the end of that year after the Vorabpauschale has
+used the Freistellungsauftrag, and the tax is paid from the proceeds at
+the start of the next year. Gains realized after the first year get the
+Aktienfonds Teilfreistellung, as there. At the end of the last year every
+sleeve is paid out the same way. The police moves shares without tax.
+A chain of switches of the whole holding therefore gives the result of
+the single-product engine, which runs it (see ``ist_portfolio``), and
+moving slightly less than everything gives almost the same result.
+Scenarios without any ``umschichten_von`` event keep the single-product
+engine too.
+
+State is an array of shape ``(sleeves, n)``, so a year is the same few
+array operations for any number of sleeves and clients.
+"""
+import numpy as np
+
+from vergleichsrechner.engine import DEPOT_SPALTEN, POLICE_SPALTEN, police_steuer
+from vergleichsrechner.schedule import CODES, PRODUKTE, in_jahresfolge
+from vergleichsrechner.tabelle import Tabelle
+
+# Sum over the sleeve axis; the ufunc method skips the overhead of ndarray.sum
+summe = np.add.reduce
+
+
+def ist_portfolio(umschichtungen):
+    """Whether an event list needs the sleeve engine.
+
+    A list whose events, in year order, each move the whole holding (anteil
+    1 out of the fund that holds everything, into another one) is a chain
+    of switches of the whole depot and stays with the faster single-product
+    engine. Both engines agree on such a chain, so the result does not
+    depend on which one runs it.
+    """
+    if all(u.get('umschichten_von') is None for u in umschichtungen):
+        return False
+    produkt = CODES[PRODUKTE[0]]
+    for u in in_jahresfolge(umschichtungen):
+        von, ziel = u.get('umschichten_von'), CODES.get(u['umschichten_in'], 0)
+        if u.get('anteil', 1.0) != 1:
+            return True
+        if von is not None and (CODES.get(von, 0) != produkt or ziel == produkt):
+            return True
+        produkt = ziel
+    return False
+
+
+def pruefe_sparrate(monatlich):
+    """Partial Umschichtungen only exist for the Einmalbeitrag; raises ``ValueError``."""
+    if monatlich:
+        raise ValueError('Teilumschichtungen zwischen Fonds gibt es nur ohne monatliche Sparrate')
+
+
+def portfolio_schedule(laufzeit, umschichtungen, sleeves=len(PRODUKTE)):
+    """Transfers of N clients per year; ``umschichtungen`` holds one event list per client.
+
+    ``laufzeit`` is the index of the last year of the longest contract.
+    Returns ``(abgang, ziel)`` with shapes ``(jahre, k, sleeves, n)`` and
+    ``(jahre, k, n)``: the share sold from every sleeve and the sleeve that
+    receives it, for the ``k``-th event of the client in that year.
+    """
+    jahre = max(int(laufzeit) + 1, 0)
+    n = len(umschichtungen)
+    ev_client, ev_jahr, ev_von, ev_in, ev_anteil = [], [], [], [], []
+    for client, events in enumerate(umschichtungen):
+        for event in events:
+            von = event.get('umschichten_von')
+            ev_client.append(client)
+            # Events before the start act at the start, like in build_schedule
+            ev_jahr.append(max(event['jahr'], 0))
+            ev_von.append(-1 if von is None else CODES.get(von, 0))
+            ev_in.append(CODES.get(event['umschichten_in'], 0))
+            ev_anteil.append(event.get('anteil', 1.0))
+    ev_client, ev_jahr, ev_von, ev_in = (np.asarray(a, dtype=np.int64) for a in (ev_client, ev_jahr, ev_von, ev_in))
+    ev_anteil = np.asarray(ev_anteil, dtype=np.float64)
+    im_plan = ev_jahr < jahre
+    ev_client, ev_jahr, ev_von, ev_in, ev_anteil = (
+        a[im_plan] for a in (ev_client, ev_jahr, ev_von, ev_in, ev_anteil))
+
+    # Rank of each event among the client's events of the same year, in list order
+    reihenfolge = np.lexsort((np.arange(len(ev_jahr)), ev_jahr, ev_client))
+    gruppe = ev_client[reihenfolge] * max(jahre, 1) + ev_jahr[reihenfolge]
+    neu = np.r_[True, gruppe[1:] != gruppe[:-1]] if len(gruppe) else np.zeros(0, dtype=bool)
+    beginn = np.maximum.accumulate(np.where(neu, np.arange(len(gruppe)), 0)) if len(gruppe) else gruppe
+    slot = np.empty_like(ev_jahr)
+    slot[reihenfolge] = np.arange(len(gruppe)) - beginn
+    k = int(slot.max()) + 1 if len(slot) else 0
+
+    sleeve = np.arange(sleeves)
+    quelle = np.where(ev_von[:, None] < 0, sleeve != ev_in[:, None], sleeve == ev_von[:, None])
+    abgang = np.zeros((jahre, k, sleeves, n))
+    ziel = np.zeros((jahre, k, n), dtype=np.int64)
+    abgang[ev_jahr, slot, :, ev_client] = quelle * ev_anteil[:, None]
+    ziel[ev_jahr, slot, ev_client] = ev_in
+    return abgang, ziel
+
+
+def project_portfolio(laufzeit, abgang, ziel, rendite_police, rendite_depot, teilfreistellung_depot,
+                      einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                      einmalbeitrag_sparplan, freistellungsauftrag_sparplan, basiszins_sparplan,
+                      effektivkosten_sparplan, steuerlast_sparplan, verlauf=False, jaehrlich=False,
+                      basiszins_jahre=None):
+    """Year recursion over the sleeves of N clients.
+
+    ``abgang`` and ``ziel`` come from ``portfolio_schedule``;
+    ``rendite_police`` and ``rendite_depot`` have shape ``(jahre, sleeves,
+    n)`` and ``teilfreistellung_depot`` ``(sleeves, n)``, all broadcastable.
+    ``basiszins_jahre`` is passed like for ``project_batch``. Results are
+    those of ``project_batch``; with ``verlauf`` they hold the sleeve totals
+    for every column of ``POLICE_SPALTEN``/``DEPOT_SPALTEN``.
+    """
+    laufzeit = np.asarray(laufzeit)
+    jahre, _, sleeves = abgang.shape[:3]
+    shape = np.broadcast_shapes(
+        laufzeit.shape, abgang.shape[3:], np.shape(rendite_police)[2:], np.shape(rendite_depot)[2:],
+        np.shape(teilfreistellung_depot)[1:], np.shape(basiszins_jahre)[1:],
+        *map(np.shape, (einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                        einmalbeitrag_sparplan, freistellungsauftrag_sparplan, basiszins_sparplan,
+                        effektivkosten_sparplan, steuerlast_sparplan)),
+    )
+    rentenkapital = np.zeros((jahre,) + shape if jaehrlich else shape)
+    fondssparplan = np.zeros((jahre,) + shape if jaehrlich else shape)
+    sleeve = np.arange(sleeves).reshape((sleeves,) + (1,) * len(shape))
+    tf = np.broadcast_to(teilfreistellung_depot, (sleeves,) + shape)
+
+    # Everything starts in the Aktienfonds sleeve
+    police = np.where(sleeve == 0, einmalbeitrag_police, 0.0) * np.ones(shape)
+    depot = np.where(sleeve == 0, einmalbeitrag_sparplan, 0.0) * np.ones(shape)
+    vp_laufend = np.zeros((sleeves,) + shape)
+    ertraege_laufend = np.zeros((sleeves,) + shape)
+    steuer_offen = 0.0
+    fsa = np.broadcast_to(freistellungsauftrag_sparplan, shape)
+    if verlauf:
+        verlauf_police = {name: np.zeros((jahre,) + shape) for name in POLICE_SPALTEN}
+        verlauf_depot = {name: np.zeros((jahre,) + shape) for name in DEPOT_SPALTEN}
+    for t in range(jahre):
+        # --- Tax on last year's sales, paid from their proceeds ---
+        depot = depot - steuer_offen
+
+        # --- Umschichtungen at the start of the year ---
+        police_vorher, depot_vorher = summe(police), summe(depot)
+        police_bewegt = umschichten = 0.0
+        # The share moved this year, per receiving sleeve, with the gains and Vorabpauschalen it carries
+        zugang = zugang_ertraege = zugang_vp = 0.0
+        for k in range(abgang.shape[1]):
+            anteil = abgang[t, k]
+            if not anteil.any():
+                continue
+            empfaenger = sleeve == ziel[t, k]
+            bewegt = police * anteil
+            police = police - bewegt + empfaenger * summe(bewegt)
+            police_bewegt = police_bewegt + summe(bewegt)
+
+            verkauf = depot * anteil
+            gewinn = ertraege_laufend * anteil
+            vp = vp_laufend * anteil
+            depot = depot - verkauf + empfaenger * summe(verkauf)
+            ertraege_laufend = ertraege_laufend - gewinn + empfaenger * summe(gewinn)
+            vp_laufend = vp_laufend - vp + empfaenger * summe(vp)
+            zugang = zugang - zugang * anteil + empfaenger * summe(verkauf)
+            zugang_ertraege = zugang_ertraege - zugang_ertraege * anteil + empfaenger * summe(gewinn)
+            zugang_vp = zugang_vp - zugang_vp * anteil + empfaenger * summe(vp)
+            umschichten = umschichten + summe(verkauf)
+
+        # --- Fondspolice ---
+        beginn_police = police
+        wert_police = police * rendite_police[t]
+        ende_police = police + wert_police
+        kosten_police = ende_police * effektivkosten_police
+        police = ende_police - kosten_police
+
+        # --- Fondssparplan ---
+        beginn = depot
+        wert = depot * rendite_depot[t]
+        ende = depot + wert
+        kosten = ende * effektivkosten_sparplan
+        if basiszins_jahre is not None:
+            basiszins_sparplan = basiszins_jahre[t]
+        basisertrag = beginn * 0.7 * basiszins_sparplan
+        vorabpauschale = np.where((wert <= basisertrag) & (wert >= 0), 0.0, basisertrag)
+        vp_laufend = vp_laufend + vorabpauschale
+        ertraege_laufend = ertraege_laufend + wert
+        # Everything in a sleeve grows alike, so the moved share earns its part of the sleeve's year
+        zugang_quote = _quote(zugang, beginn)
+        zugang_ertraege = zugang_ertraege + zugang_quote * wert
+        zugang_vp = zugang_vp + zugang_quote * vorabpauschale
+        vp_teilfreistellung = vorabpauschale * tf
+        vp_sleeve = vorabpauschale - vp_teilfreistellung
+        vp_zu_besteuern = summe(vp_sleeve)
+        fsa_uebrig = np.where(vp_zu_besteuern >= fsa, 0.0, fsa - vp_zu_besteuern)
+        danach_zu_besteuern = np.where(fsa >= vp_zu_besteuern, 0.0, vp_zu_besteuern - fsa)
+        steuer_vp = danach_zu_besteuern * steuerlast_sparplan
+        # The tax on the Vorabpauschale is taken from the sleeves in proportion to their share of it
+        vp_anteil = np.divide(vp_sleeve, vp_zu_besteuern, out=np.zeros_like(vp_sleeve), where=vp_zu_besteuern != 0)
+        depot = ende - kosten - steuer_vp * vp_anteil
+        depot_nk = summe(depot)
+        police_nk = summe(police)
+
+        # Like the single-product engine, the first year weighs its gains by the rollover flag and uses
+        # the Teilfreistellung of the fund held; later years use that of the Aktienfonds
+        if t == 0:
+            gewicht = abgang[0].any(axis=(0, 1)) if abgang.shape[1] else 0.0
+            tf_gewinn = tf
+        else:
+            gewicht = 1.0
+            tf_gewinn = tf[0]
+
+        # --- Sale of the moved share at the end of the year ---
+        wert_verkauf = zugang_quote * depot
+        verkauf_nach_vp = zugang_ertraege - zugang_vp
+        verkauf_tf = verkauf_nach_vp * tf_gewinn
+        verkauf_zu_besteuern = summe(verkauf_nach_vp - verkauf_tf)
+        nach_fsa = np.where(fsa_uebrig > verkauf_zu_besteuern, 0.0, verkauf_zu_besteuern - fsa_uebrig)
+        steuer_ums = nach_fsa * steuerlast_sparplan
+        steuer_offen = steuer_ums * _quote(wert_verkauf, summe(wert_verkauf))
+
+        # --- Payout of every sleeve at the end of the year ---
+        gewinn_nach_vp = (ertraege_laufend - vp_laufend) * gewicht
+        gewinn_tf = gewinn_nach_vp * tf_gewinn
+        zu_besteuern = summe(gewinn_nach_vp - gewinn_tf)
+        ueber_fsa = np.where(fsa_uebrig > zu_besteuern, 0.0, zu_besteuern - fsa_uebrig)
+        auszahlung = depot_nk - ueber_fsa * steuerlast_sparplan
+        letztes = laufzeit == t
+        if jaehrlich:
+            rentenkapital[t] = police_nk
+            fondssparplan[t] = auszahlung
+        else:
+            rentenkapital = np.where(letztes, police_nk, rentenkapital)
+            fondssparplan = np.where(letztes, auszahlung, fondssparplan)
+
+        if verlauf:
+            beginn_p, beginn_d = summe(beginn_police), summe(beginn)
+            anteil_police = _quote(police_bewegt, police_vorher)
+            anteil_depot = _quote(umschichten, depot_vorher)
+            rendite_p = _quote(summe(wert_police), beginn_p)
+            rendite_d = _quote(summe(wert), beginn_d)
+            jn = (abgang[t].any(axis=(0, 1)) if abgang.shape[1] else np.zeros(abgang.shape[3:], dtype=bool)) * 1.0
+            einzahlung_police = einmalbeitrag_police if t == 0 else 0.0
+            werte = (t + 1, jn, anteil_police, beginn_p, beginn_p, rendite_p,
+                     summe(wert_police), summe(ende_police), summe(kosten_police), police_nk,
+                     einzahlung_police, anteil_police, police_bewegt)
+            for name, value in zip(POLICE_SPALTEN, werte):
+                verlauf_police[name][t] = value
+            # The last year pays out every sleeve instead of selling the moved share
+            umschichten_jahr = np.where(letztes, depot_nk, summe(wert_verkauf))
+            steuer_jahr = np.where(letztes, ueber_fsa * steuerlast_sparplan, steuer_ums)
+            werte = (t + 1, jn, anteil_depot, beginn_d, beginn_d, rendite_d, summe(wert),
+                     0.0, summe(ende), summe(kosten), depot_nk, summe(basisertrag),
+                     summe(vorabpauschale), summe(vp_laufend), summe(vp_teilfreistellung),
+                     vp_zu_besteuern, fsa, fsa_uebrig, danach_zu_besteuern, steuer_vp,
+                     einmalbeitrag_sparplan if t == 0 else 0.0, np.where(letztes, 1.0, anteil_depot),
+                     umschichten_jahr, summe(ertraege_laufend),
+                     np.where(letztes, summe(ertraege_laufend * gewicht), summe(zugang_ertraege)),
+                     np.where(letztes, summe(gewinn_nach_vp), summe(verkauf_nach_vp)),
+                     np.where(letztes, summe(gewinn_tf), summe(verkauf_tf)),
+                     np.where(letztes, zu_besteuern, verkauf_zu_besteuern),
+                     np.where(letztes, ueber_fsa, nach_fsa), steuer_jahr,
+                     np.where(letztes, auszahlung, umschichten_jahr - steuer_jahr))
+            for name, value in zip(DEPOT_SPALTEN, werte):
+                verlauf_depot[name][t] = value
+
+        # The moved share starts afresh in its new sleeve
+        ertraege_laufend = ertraege_laufend - zugang_ertraege
+        vp_laufend = vp_laufend - zugang_vp
+
+    ertraege = rentenkapital - einmalbeitrag_police
+    zu_besteuern = ertraege - ertraege * teilfreistellung_police
+    ergebnisse = {
+        'fondspolice_rentenkapital': rentenkapital,
+        'fondspolice': rentenkapital - zu_besteuern / 2 * steuersatz_police,
+        'fondssparplan': fondssparplan,
+    }
+    if verlauf:
+        ergebnisse['verlauf'] = {'police': verlauf_police, 'depot': verlauf_depot}
+    return ergebnisse
+
+
+def _quote(zaehler, nenner):
+    """zaehler / nenner, 0 where nenner is 0."""
+    zaehler, nenner = np.broadcast_arrays(np.asarray(zaehler, dtype=float), np.asarray(nenner, dtype=float))
+    return np.divide(zaehler, nenner, out=np.zeros(zaehler.shape), where=nenner != 0)
+
+
+def _sleeves(aktienfonds, mischfonds, rentenfonds):
+    # Scalars still get a client axis, so the sleeve axis lines up with the state
+    sleeves = np.stack(np.broadcast_arrays(aktienfonds, mischfonds, rentenfonds))
+    return sleeves[:, None] if sleeves.ndim == 1 else sleeves
+
+
+def portfolio_arrays(p, umschichtungen, verlauf=False, jaehrlich=False):
+    """``project_portfolio`` for inputs keyed like parameters.json in engine units.
+
+    The inputs are scalars or arrays per client; ``umschichtungen`` holds
+    one event list per client, or a single list shared by all of them.
+    """
+    pruefe_sparrate(np.any(p.get('monatlich', False)))
+    if not umschichtungen or isinstance(umschichtungen[0], dict):
+        umschichtungen = [umschichtungen]
+    laufzeit = np.asarray(p['laufzeit'], dtype=np.int64)
+    abgang, ziel = portfolio_schedule(laufzeit.max(initial=-1), umschichtungen)
+    jahre = len(abgang)
+    police = _sleeves(p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'], p['rendite_rentenfonds_police'])
+    depot = _sleeves(p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                     p['rendite_rentenfonds_sparplan'])
+    return project_portfolio(
+        laufzeit, abgang, ziel,
+        np.broadcast_to(police, (jahre,) + police.shape), np.broadcast_to(depot, (jahre,) + depot.shape),
+        _sleeves(p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                 p['teilfreistellung_rentenfonds_sparplan']),
+        p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        p['einmalbeitrag_sparplan'], p['freistellungsauftrag_sparplan'], p['basiszins_sparplan'],
+        p['effektivkosten_sparplan'], p['steuerlast_sparplan'], verlauf=verlauf, jaehrlich=jaehrlich,
+    )
+
+
+def simulate_portfolio(parameter, umschichtungen):
+    """Both yearly tables like ``engine.simulate``, as sleeve totals."""
+    p = parameter
+    ergebnisse = portfolio_arrays(p, umschichtungen, verlauf=True)['verlauf']
+    police = Tabelle(np.column_stack([ergebnisse['police'][name][:, 0] for name in POLICE_SPALTEN]), POLICE_SPALTEN)
+    police_steuer(police, p['einmalbeitrag_police'], p['teilfreistellung_police'], p['steuersatz_police'])
+    depot = Tabelle(np.column_stack([ergebnisse['depot'][name][:, 0] for name in DEPOT_SPALTEN]), DEPOT_SPALTEN)
+    return {'police': police, 'depot': depot}
@@ -0,0 +1,199 @@
+"""Recalculate saved scenarios across a process pool.
+
+    python -m vergleichsrechner.runner szenarien/ --out ergebnisse.csv
+    python -m vergleichsrechner.runner kunden.jsonl --out ergebnisse.parquet --set basiszins_sparplan=2.29
+
+Input is a directory of parameters.json files (searched recursively) or a
+JSONL file with one parameter set per line. Work is handed out in chunks
+with a bounded number of chunks in flight, so memory stays flat however
+many inputs there are, and results are streamed to the output file in
+input order.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from vergleichsrechner.batch import simulate_batch
+
+ERGEBNIS_FELDER = ('quelle', 'fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+
+def iter_inputs(pfad):
+    """Yield ``(quelle, kind, payload)`` without reading everything up front."""
+    pfad = Path(pfad)
+    if pfad.is_dir():
+        for wurzel, ordner, dateien in os.walk(pfad):
+            ordner.sort()
+            for datei in sorted(dateien):
+                if datei.endswith('.json'):
+                    quelle = os.path.join(wurzel, datei)
+                    yield quelle, 'datei', quelle
+    else:
+        with open(pfad, encoding='utf-8') as f:
+            for nummer, zeile in enumerate(f, 1):
+                if zeile.strip():
+                    yield f'{pfad}:{nummer}', 'zeile', zeile
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def lade(kind, payload):
+    """Parameter dict of one input as yielded by ``iter_inputs``; raises ``ValueError`` for anything else."""
+    if kind == 'datei':
+        with open(payload, encoding='utf-8') as f:
+            parameter = json.load(f)
+    else:
+        parameter = json.loads(payload)
+    if not isinstance(parameter, dict):
+        raise ValueError('Parameter müssen ein JSON-Objekt sein')
+    return parameter
+
+
+def rechne_chunk(items, overrides=None, sprung=False):
+    """Evaluate one chunk; returns result rows and ``(quelle, fehler)`` pairs."""
+    quellen, parameter_sets, fehler = [], [], []
+    for quelle, kind, payload in items:
+        try:
+            parameter = lade(kind, payload)
+            if overrides:
+                parameter.update(overrides)
+        except (OSError, ValueError) as exc:
+            fehler.append((quelle, str(exc)))
+            continue
+        quellen.append(quelle)
+        parameter_sets.append(parameter)
+    try:
+        ergebnisse = simulate_batch(parameter_sets, sprung=sprung)
+    except (KeyError, TypeError, ValueError):
+        # Fall back to single evaluation to pin down the broken inputs
+        rows = []
+        for quelle, parameter in zip(quellen, parameter_sets):
+            try:
+                einzeln = simulate_batch([parameter], sprung=sprung)
+            except (KeyError, TypeError, ValueError) as exc:
+                fehler.append((quelle, f'{type(exc).__name__}: {exc}'))
+                continue
+            rows.append((quelle, *(float(einzeln[k][0]) for k in ERGEBNIS_FELDER[1:])))
+        return rows, fehler
+    spalten = [ergebnisse[k].tolist() for k in ERGEBNIS_FELDER[1:]]
+    return list(zip(quellen, *spalten)), fehler
+
+
+class CsvWriter:
+    def __init__(self, pfad):
+        self._file = open(pfad, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(ERGEBNIS_FELDER)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    def __init__(self, pfad):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit('Parquet-Ausgabe benötigt pyarrow (pip install pyarrow)')
+        self._pa = pa
+        self._schema = pa.schema([('quelle', pa.string())] + [(k, pa.float64()) for k in ERGEBNIS_FELDER[1:]])
+        self._writer = pq.ParquetWriter(pfad, self._schema)
+
+    def write(self, rows):
+        if rows:
+            spalten = list(zip(*rows))
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(s) for s in spalten], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(pfad):
+    if str(pfad).endswith('.parquet'):
+        return ParquetWriter(pfad)
+    return CsvWriter(pfad)
+
+
+def run(eingabe, ausgabe, workers=None, chunk_size=2048, overrides=None, log=sys.stderr, sprung=False):
+    """Evaluate all inputs and stream the results; returns ``(anzahl, fehler, sekunden)``."""
+    workers = workers or os.cpu_count() or 1
+    writer = open_writer(ausgabe)
+    anzahl = fehler = 0
+    start = time.perf_counter()
+
+    def abschliessen(rows, chunk_fehler):
+        nonlocal anzahl, fehler
+        writer.write(rows)
+        anzahl += len(rows)
+        fehler += len(chunk_fehler)
+        for quelle, text in chunk_fehler:
+            print(f'Fehler in {quelle}: {text}', file=log)
+
+    try:
+        chunks = _chunks(iter_inputs(eingabe), chunk_size)
+        if workers == 1:
+            for chunk in chunks:
+                abschliessen(*rechne_chunk(chunk, overrides, sprung))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Two chunks per worker keep every core busy while bounding memory
+                offen = deque()
+                for chunk in chunks:
+                    if len(offen) >= 2 * workers:
+                        abschliessen(*offen.popleft().result())
+                    offen.append(pool.submit(rechne_chunk, chunk, overrides, sprung))
+                while offen:
+                    abschliessen(*offen.popleft().result())
+    finally:
+        writer.close()
+    dauer = time.perf_counter() - start
+    rate = anzahl / dauer if dauer > 0 else float('inf')
+    print(f'{anzahl} Szenarien in {dauer:.2f} s ({rate:,.0f}/s, {workers} Prozesse), {fehler} Fehler', file=log)
+    return anzahl, fehler, dauer
+
+
+def _override(text):
+    key, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'erwartet SCHLUESSEL=WERT, nicht {text!r}')
+    return key.strip(), json.loads(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.runner',
+        description='Gespeicherte Szenarien parallel neu berechnen.',
+    )
+    parser.add_argument('eingabe', help='Ordner mit parameters.json-Dateien oder JSONL-Datei')
+    parser.add_argument('--out', required=True, help='Ergebnisdatei (.csv oder .parquet)')
+    parser.add_argument('--workers', type=int, default=None, help='Anzahl Prozesse (Standard: alle Kerne)')
+    parser.add_argument('--chunk-size', type=int, default=2048, help='Szenarien pro Arbeitspaket')
+    parser.add_argument('--set', dest='overrides', action='append', type=_override, default=[],
+                        metavar='SCHLUESSEL=WERT',
+                        help='Parameter für alle Szenarien überschreiben, z. B. basiszins_sparplan=2.29')
+    parser.add_argument('--sprung', action='store_true',
+                        help='Jahre ohne Umschichtung analytisch überspringen (nur Endwerte, schneller)')
+    args = parser.parse_args(argv)
+    _, fehler, _ = run(args.eingabe, args.out, args.workers, args.chunk_size, dict(args.overrides),
+                       sprung=args.sprung)
+    return 1 if fehler else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
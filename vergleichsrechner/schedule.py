@@ -0,0 +1,133 @@
+"""Per-year Umschichtung schedule.
+
+A single pass over the events yields, for every year, the product held,
+the rollover flag and share and whether it is the last year. Product
+specific inputs (Rendite, Teilfreistellung) are then read per year with
+one array lookup instead of rescanning the events for every year.
+"""
+import numpy as np
+
+PRODUKTE = ("Aktienfonds", "Mischfonds", "Rentenfonds")
+
+# Unknown product names fall back to Aktienfonds, like the app always did
+CODES = {name: k for k, name in enumerate(PRODUKTE)}
+
+SCHEDULE_DTYPE = np.dtype([
+    ('produkt', np.int8),
+    ('jn', np.int64),
+    ('anteil', np.float64),
+    ('letztes', np.bool_),
+])
+
+
+def in_jahresfolge(umschichtungen):
+    """Events in the order they act.
+
+    Moves between funds (events naming ``umschichten_von``) act in year
+    order, as in ``portfolio``; other lists keep the listed order the app
+    always used.
+    """
+    if any(u.get('umschichten_von') is not None for u in umschichtungen):
+        return sorted(umschichtungen, key=lambda u: u['jahr'])
+    return umschichtungen
+
+
+def build_schedule(laufzeit, umschichtungen):
+    """Schedule of one contract; ``laufzeit`` is the index of the last year.
+
+    The product of year ``i`` comes from the last event (in the order of
+    ``in_jahresfolge``) with ``jahr <= i``; rollover flag and share from
+    the last event in year ``i``.
+    """
+    jahre = max(laufzeit + 1, 0)
+    letzte = [-1] * jahre
+    jn = [0] * jahre
+    anteil = [0.0] * jahre
+    codes = []
+    for index, event in enumerate(in_jahresfolge(umschichtungen)):
+        jahr = event['jahr']
+        codes.append(CODES.get(event['umschichten_in'], 0))
+        start = max(jahr, 0)
+        if start < jahre:
+            letzte[start] = index
+        if 0 <= jahr < jahre:
+            jn[jahr] = 1
+            anteil[jahr] = event['anteil']
+    schedule = np.zeros(jahre, dtype=SCHEDULE_DTYPE)
+    if jahre:
+        # A trailing sentinel answers index -1 (no event yet) with Aktienfonds
+        letzte = np.maximum.accumulate(np.array(letzte, dtype=np.int64))
+        schedule['produkt'] = np.array(codes + [0], dtype=np.int8)[letzte]
+        schedule['jn'] = jn
+        schedule['anteil'] = anteil
+        schedule['letztes'][-1] = True
+    return schedule
+
+
+def per_year(schedule, aktienfonds, mischfonds, rentenfonds):
+    """Per-year value of a product-specific input such as the Rendite."""
+    return np.array([aktienfonds, mischfonds, rentenfonds], dtype=np.float64)[schedule['produkt']]
+
+
+def per_year_arrays(code, aktienfonds, mischfonds, rentenfonds):
+    """``per_year`` for a ``(jahre, n)`` code array; the inputs are scalars or arrays per client."""
+    tabelle = np.stack(np.broadcast_arrays(aktienfonds, mischfonds, rentenfonds))
+    if tabelle.ndim == 1:
+        return tabelle[code]
+    breite = max(tabelle.shape[1], code.shape[1])
+    return np.take_along_axis(np.broadcast_to(tabelle, (3, breite)),
+                              np.broadcast_to(code, (len(code), breite)), axis=0)
+
+
+def first_difference(alt, neu):
+    """First year in which two schedules differ (or the shorter length)."""
+    gemeinsam = min(len(alt), len(neu))
+    unterschiede = np.flatnonzero(alt[:gemeinsam] != neu[:gemeinsam])
+    return int(unterschiede[0]) if len(unterschiede) else gemeinsam
+
+
+def event_arrays(umschichtungen):
+    """Client, year, product code and share of every event, in the order they act.
+
+    ``code`` and ``anteil`` carry a trailing sentinel, so index -1 (no
+    event yet) reads as Aktienfonds without rollover.
+    """
+    ev_client, ev_jahr, ev_code, ev_anteil = [], [], [], []
+    for client, events in enumerate(umschichtungen):
+        for event in in_jahresfolge(events):
+            ev_client.append(client)
+            ev_jahr.append(event['jahr'])
+            ev_code.append(CODES.get(event['umschichten_in'], 0))
+            ev_anteil.append(event['anteil'])
+    return (np.asarray(ev_client, dtype=np.int64), np.asarray(ev_jahr, dtype=np.int64),
+            np.asarray(ev_code + [0], dtype=np.int8), np.asarray(ev_anteil + [0.0], dtype=np.float64))
+
+
+def schedule_arrays(laufzeit, umschichtungen, jahre=None):
+    """Product code, rollover flag and share per year for N clients.
+
+    ``umschichtungen`` holds one event list per client. Returns
+    ``(code, jn, anteil)`` with shape ``(jahre, n)``; ``code`` indexes
+    ``PRODUKTE`` and follows the last listed event with ``jahr <= i``.
+    """
+    laufzeit = np.asarray(laufzeit)
+    n = len(umschichtungen)
+    if jahre is None:
+        jahre = int(laufzeit.max()) + 1 if n else 0
+    ev_client, ev_jahr, ev_code, ev_anteil = event_arrays(umschichtungen)
+    ev_index = np.arange(len(ev_client))
+
+    # Events are numbered in list order, so the highest index in a cell is the last one listed
+    start = np.maximum(ev_jahr, 0)
+    wirkt = start < jahre
+    letzte = np.full((jahre, n), -1, dtype=np.int64)
+    np.maximum.at(letzte, (start[wirkt], ev_client[wirkt]), ev_index[wirkt])
+    letzte = np.maximum.accumulate(letzte, axis=0)
+    code = ev_code[letzte]
+
+    im_plan = (ev_jahr >= 0) & (ev_jahr <= laufzeit[ev_client]) & (ev_jahr < jahre)
+    letzte = np.full((jahre, n), -1, dtype=np.int64)
+    np.maximum.at(letzte, (ev_jahr[im_plan], ev_client[im_plan]), ev_index[im_plan])
+    jn = (letzte >= 0).astype(np.int64)
+    anteil = ev_anteil[letzte]
+    return code, jn, anteil
@@ -0,0 +1,140 @@
+"""Sensitivity of the final values to every input, in one batched pass.
+
+Each input is moved up and down by a small step for the partial
+derivative and by ``SCHRITT_PROZENT``/``SCHRITT_BETRAG`` for the tornado
+chart. All variants are columns of a single ``sweep.project_grid`` call,
+so twenty inputs cost one year recursion over about eighty columns
+instead of eighty reruns. Derivatives are central differences; inputs
+that cannot be negative (all but the Renditen) use a one-sided
+difference at 0, and their tornado step stops at 0. Where the two sides
+differ by more than ``SPRUNG`` times, the input sits on a jump of the tax
+rules (the Vorabpauschale at a Rendite of exactly 0) and the smaller
+one-sided difference is reported.
+"""
+import numpy as np
+
+from vergleichsrechner.batch import BETRAG_FELDER
+from vergleichsrechner.sparrate import SPARRATE_BETRAG, SPARRATE_FELDER
+from vergleichsrechner.sweep import project_grid
+
+# Every input the engine reads, grouped by product
+SENSITIV_FELDER = (
+    'rendite_aktienfonds_police',
+    'rendite_mischfonds_police',
+    'rendite_rentenfonds_police',
+    'effektivkosten_police',
+    'teilfreistellung_police',
+    'steuersatz_police',
+    'einmalbeitrag_police',
+    'rendite_aktienfonds_sparplan',
+    'rendite_mischfonds_sparplan',
+    'rendite_rentenfonds_sparplan',
+    'effektivkosten_sparplan',
+    'teilfreistellung_aktienfonds_sparplan',
+    'teilfreistellung_mischfonds_sparplan',
+    'teilfreistellung_rentenfonds_sparplan',
+    'basiszins_sparplan',
+    'steuerlast_sparplan',
+    'freistellungsauftrag_sparplan',
+    'einmalbeitrag_sparplan',
+)
+
+TITEL = {
+    'rendite_aktienfonds_police': 'Rendite Aktienfonds Police',
+    'rendite_mischfonds_police': 'Rendite Mischfonds Police',
+    'rendite_rentenfonds_police': 'Rendite Rentenfonds Police',
+    'effektivkosten_police': 'Effektivkosten Police',
+    'teilfreistellung_police': 'Teilfreistellung Police',
+    'steuersatz_police': 'Steuersatz Police',
+    'einmalbeitrag_police': 'Einmalbeitrag Police',
+    'rendite_aktienfonds_sparplan': 'Rendite Aktienfonds Sparplan',
+    'rendite_mischfonds_sparplan': 'Rendite Mischfonds Sparplan',
+    'rendite_rentenfonds_sparplan': 'Rendite Rentenfonds Sparplan',
+    'effektivkosten_sparplan': 'Effektivkosten Sparplan',
+    'teilfreistellung_aktienfonds_sparplan': 'Teilfreistellung Aktienfonds Sparplan',
+    'teilfreistellung_mischfonds_sparplan': 'Teilfreistellung Mischfonds Sparplan',
+    'teilfreistellung_rentenfonds_sparplan': 'Teilfreistellung Rentenfonds Sparplan',
+    'basiszins_sparplan': 'Basiszins',
+    'steuerlast_sparplan': 'Steuerlast Sparplan',
+    'freistellungsauftrag_sparplan': 'Freistellungsauftrag',
+    'einmalbeitrag_sparplan': 'Einmalbeitrag Sparplan',
+    'sparrate_police': 'Sparrate Police',
+    'dynamik_police': 'Dynamik Police',
+    'beitragskosten_police': 'Beitragskosten Police',
+    'sparrate_sparplan': 'Sparrate Sparplan',
+    'dynamik_sparplan': 'Dynamik Sparplan',
+    'beitragskosten_sparplan': 'Ausgabeaufschlag Sparrate',
+}
+
+ERGEBNIS_FELDER = ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+# Steps in engine units: rates are fractions, amounts euro
+H_PROZENT = 1e-5
+H_BETRAG = 1e-2
+SCHRITT_PROZENT = 0.01
+SCHRITT_BETRAG = 1000.0
+
+SPRUNG = 10.0
+
+
+def ist_betrag(feld):
+    return feld in BETRAG_FELDER + SPARRATE_BETRAG
+
+
+def sensitiv_felder(p):
+    """The inputs that act on a scenario; the Sparrate ones only in the monthly mode."""
+    return SENSITIV_FELDER + (SPARRATE_FELDER if p.get('monatlich') else ())
+
+
+def sensitivitaet(p, umschichtungen, felder=None):
+    """Partial derivatives and tornado steps of the final values.
+
+    ``p`` is keyed like parameters.json in engine units. Returns ``felder``,
+    their ``basis`` values and ``schritt`` sizes and, per result of
+    ``ERGEBNIS_FELDER``, a dict with the base ``wert``, the ``ableitung``
+    per engine unit (per 1.0 of a rate, per euro of an amount) and the
+    changes ``hoch`` and ``tief`` when the input moves up or down by
+    ``schritt``.
+    """
+    felder = tuple(sensitiv_felder(p) if felder is None else felder)
+    k = len(felder)
+    basis = np.array([float(p.get(feld, 0.0)) for feld in felder])
+    betrag = np.array([ist_betrag(feld) for feld in felder])
+    negativ = np.array([feld.startswith('rendite_') for feld in felder])
+    h = np.where(betrag, H_BETRAG, H_PROZENT)
+    schritt = np.where(betrag, SCHRITT_BETRAG, SCHRITT_PROZENT)
+    unten = np.where(negativ | (basis >= h), basis - h, basis)
+    tief = np.where(negativ, basis - schritt, np.maximum(basis - schritt, 0.0))
+
+    # Column 0 is the scenario itself, then one block of k columns per variant
+    werte = np.tile(basis, (1 + 4 * k, 1))
+    spalte = np.arange(k)
+    for block, variante in enumerate((basis + h, unten, basis + schritt, tief)):
+        werte[1 + block * k + spalte, spalte] = variante
+    q = dict(p)
+    q.update({feld: werte[:, i] for i, feld in enumerate(felder)})
+    r = project_grid(q, umschichtungen)
+
+    ergebnisse = {'felder': felder, 'basis': basis, 'schritt': schritt}
+    for key in ERGEBNIS_FELDER:
+        y = np.broadcast_to(r[key], (1 + 4 * k,))
+        plus, minus, hoch, runter = (y[1 + block * k:1 + (block + 1) * k] for block in range(4))
+        ableitung = (plus - minus) / (basis + h - unten)
+        vorwaerts = (plus - y[0]) / h
+        rueckwaerts = np.divide(y[0] - minus, basis - unten, out=vorwaerts.copy(), where=basis > unten)
+        einseitig = np.where(np.abs(vorwaerts) < np.abs(rueckwaerts), vorwaerts, rueckwaerts)
+        sprung = np.abs(vorwaerts - rueckwaerts) > SPRUNG * np.abs(einseitig) + 1e-9
+        ergebnisse[key] = {
+            'wert': float(y[0]),
+            'ableitung': np.where(sprung, einseitig, ableitung),
+            'hoch': hoch - y[0],
+            'tief': runter - y[0],
+        }
+    return ergebnisse
+
+
+def rangfolge(ergebnisse, produkte=('fondspolice', 'fondssparplan')):
+    """Indices of ``felder``, largest tornado swing over ``produkte`` first."""
+    ausschlag = np.max([np.maximum(np.abs(ergebnisse[key]['hoch']), np.abs(ergebnisse[key]['tief']))
+                        for key in produkte], axis=0)
+    return np.argsort(-ausschlag, kind='stable')
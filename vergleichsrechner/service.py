@@ -0,0 +1,281 @@
+"""Local HTTP/JSON calculation service.
+
+    python -m vergleichsrechner.service --port 8765
+
+``POST /vergleich`` takes one parameters.json dict and returns the final
+values and the yearly tables (``?tabellen=0`` leaves the tables out);
+``POST /vergleich/batch`` takes a list of them and returns the final values
+(``?format=csv`` streams them as CSV);
+``GET /health`` reports the counters. Concurrent single requests are
+collected for at most ``max_wait`` seconds and evaluated together in one
+``simulate_arrays`` pass (monthly Sparrate and portfolio scenarios in
+their own engines), so under load the service does one vectorized
+projection per micro-batch instead of one per request.
+"""
+import argparse
+import json
+import math
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from numbers import Real
+from urllib.parse import parse_qs, urlsplit
+
+from vergleichsrechner.batch import (BETRAG_FELDER, PROZENT_FELDER, VERLAUF_DEPOT, VERLAUF_POLICE, parameter_arrays,
+                                     simulate_arrays, simulate_batch)
+from vergleichsrechner.export import iter_csv
+from vergleichsrechner.portfolio import ist_portfolio, pruefe_sparrate
+from vergleichsrechner.schedule import PRODUKTE
+from vergleichsrechner.sparrate import SPARRATE_FELDER
+
+ERGEBNIS_FELDER = ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+MAX_BATCH = 1024
+MAX_WAIT = 0.002
+MAX_LAUFZEIT = 100
+MAX_BODY = 16 * 1024 * 1024
+TIMEOUT = 30
+
+
+def pruefe_parameter(data):
+    """Check one parameters.json dict; raises ``ValueError`` with a readable message."""
+    if not isinstance(data, dict):
+        raise ValueError('Parameter müssen ein JSON-Objekt sein')
+    fehlend = [key for key in PROZENT_FELDER + BETRAG_FELDER + ('laufzeit',) if key not in data]
+    if fehlend:
+        raise ValueError(f'fehlende Felder: {", ".join(fehlend)}')
+    for key in PROZENT_FELDER + BETRAG_FELDER:
+        if not isinstance(data[key], Real) or isinstance(data[key], bool) or not math.isfinite(data[key]):
+            raise ValueError(f'{key} muss eine endliche Zahl sein')
+    laufzeit = data['laufzeit']
+    if not isinstance(laufzeit, int) or isinstance(laufzeit, bool) or not 1 <= laufzeit <= MAX_LAUFZEIT:
+        raise ValueError(f'laufzeit muss eine ganze Zahl zwischen 1 und {MAX_LAUFZEIT} sein')
+    if not isinstance(data.get('monatlich', False), bool):
+        raise ValueError('monatlich muss true oder false sein')
+    for key in SPARRATE_FELDER:
+        wert = data.get(key, 0.0)
+        if not isinstance(wert, Real) or isinstance(wert, bool) or not math.isfinite(wert) or wert < 0:
+            raise ValueError(f'{key} muss eine Zahl größer oder gleich 0 sein')
+    umschichtungen = data.get('umschichtungen', [])
+    if not isinstance(umschichtungen, list):
+        raise ValueError('umschichtungen muss eine Liste sein')
+    for u in umschichtungen:
+        if not isinstance(u, dict) or not isinstance(u.get('jahr'), int) or isinstance(u.get('jahr'), bool):
+            raise ValueError('jede Umschichtung braucht ein ganzzahliges jahr')
+        if u.get('umschichten_in') not in PRODUKTE:
+            raise ValueError(f'umschichten_in muss einer von {", ".join(PRODUKTE)} sein')
+        anteil = u.get('anteil', 1.0)
+        if not isinstance(anteil, Real) or isinstance(anteil, bool) or not 0 <= anteil <= 1:
+            raise ValueError('anteil muss eine Zahl zwischen 0 und 1 sein')
+        if u.get('umschichten_von') not in (None,) + tuple(PRODUKTE):
+            raise ValueError(f'umschichten_von muss einer von {", ".join(PRODUKTE)} sein')
+    pruefe_sparrate(data.get('monatlich') and ist_portfolio(umschichtungen))
+    return data
+
+
+class MicroBatcher:
+    """Evaluate submitted parameter sets in micro-batches on one worker thread."""
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.anfragen = self.batches = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='vergleich-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, parameter):
+        """Queue a checked parameter set; the future resolves to ``(ergebnisse, index)``."""
+        future = Future()
+        self._queue.put((parameter, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        offen = True
+        while offen:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            # Take everything already queued, then wait briefly for stragglers
+            while len(batch) < self.max_batch:
+                rest = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=rest) if rest > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    offen = False
+                    break
+                batch.append(item)
+            self._evaluate(batch)
+
+    def _evaluate(self, batch):
+        parameter_sets = [parameter for parameter, _ in batch]
+        try:
+            ergebnisse = simulate_arrays(parameter_arrays(parameter_sets),
+                                         [p.get('umschichtungen', []) for p in parameter_sets], verlauf=True)
+            ergebnisse['laufzeit'] = [p['laufzeit'] for p in parameter_sets]
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0][1].set_exception(exc)
+                return
+            # Fall back to single evaluation, so a broken input only fails its own request
+            for item in batch:
+                self._evaluate([item])
+            return
+        self.anfragen += len(batch)
+        self.batches += 1
+        for index, (_, future) in enumerate(batch):
+            future.set_result((ergebnisse, index))
+
+
+def antwort(ergebnisse, index, tabellen=True):
+    """The JSON response for client ``index`` of a micro-batch."""
+    daten = {key: float(ergebnisse[key][index]) for key in ERGEBNIS_FELDER}
+    if tabellen:
+        jahre = ergebnisse['laufzeit'][index]
+        verlauf = ergebnisse['verlauf']
+        for produkt, spalten in (('police', VERLAUF_POLICE), ('depot', VERLAUF_DEPOT)):
+            tabelle = {'Jahr': list(range(1, jahre + 1))}
+            for name in spalten:
+                tabelle[name] = verlauf[produkt][name][:jahre, index].tolist()
+            daten[produkt] = tabelle
+    return daten
+
+
+class VergleichHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Vergleichsrechner'
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            return self._senden(HTTPStatus.NOT_FOUND, {'fehler': 'unbekannter Pfad'})
+        batcher = self.server.batcher
+        self._senden(HTTPStatus.OK, {'status': 'ok', 'anfragen': batcher.anfragen, 'batches': batcher.batches})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/vergleich', '/vergleich/batch'):
+            return self._senden(HTTPStatus.NOT_FOUND, {'fehler': 'unbekannter Pfad'})
+        try:
+            data = self._lesen()
+            if url.path == '/vergleich':
+                future = self.server.batcher.submit(pruefe_parameter(data))
+            else:
+                if not isinstance(data, list):
+                    raise ValueError('erwartet eine Liste von Parametern')
+                for nummer, parameter in enumerate(data):
+                    try:
+                        pruefe_parameter(parameter)
+                    except ValueError as exc:
+                        raise ValueError(f'Eintrag {nummer}: {exc}')
+        except ValueError as exc:
+            return self._senden(HTTPStatus.BAD_REQUEST, {'fehler': str(exc)})
+
+        if url.path == '/vergleich/batch':
+            # Already a batch, so it skips the micro-batch queue
+            try:
+                ergebnisse = simulate_batch(data)
+            except ValueError as exc:
+                return self._senden(HTTPStatus.BAD_REQUEST, {'fehler': str(exc)})
+            if parse_qs(url.query).get('format', ['json'])[-1] == 'csv':
+                return self._streamen({key: ergebnisse[key] for key in ERGEBNIS_FELDER})
+            return self._senden(HTTPStatus.OK, {key: ergebnisse[key].tolist() for key in ERGEBNIS_FELDER})
+        try:
+            ergebnisse, index = future.result(timeout=TIMEOUT)
+        except TimeoutError:
+            return self._senden(HTTPStatus.SERVICE_UNAVAILABLE, {'fehler': 'Zeitüberschreitung'})
+        except Exception as exc:
+            return self._senden(HTTPStatus.INTERNAL_SERVER_ERROR, {'fehler': f'{type(exc).__name__}: {exc}'})
+        tabellen = parse_qs(url.query).get('tabellen', ['1'])[-1] not in ('0', 'false', 'nein')
+        self._senden(HTTPStatus.OK, antwort(ergebnisse, index, tabellen))
+
+    def _lesen(self):
+        laenge = int(self.headers.get('Content-Length') or 0)
+        if laenge > MAX_BODY:
+            raise ValueError('Anfrage zu groß')
+        try:
+            return json.loads(self.rfile.read(laenge))
+        except json.JSONDecodeError as exc:
+            raise ValueError(f'ungültiges JSON: {exc}')
+
+    def _senden(self, status, daten):
+        body = json.dumps(daten, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _streamen(self, spalten):
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for block in iter_csv(spalten):
+            daten = block.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(daten), daten))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        if self.server.log is not None:
+            print(f'{self.address_string()} - {format % args}', file=self.server.log)
+
+
+class VergleichServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, adresse, max_batch=MAX_BATCH, max_wait=MAX_WAIT, log=None):
+        super().__init__(adresse, VergleichHandler)
+        self.batcher = MicroBatcher(max_batch, max_wait)
+        self.log = log
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def start_server(host='127.0.0.1', port=0, max_batch=MAX_BATCH, max_wait=MAX_WAIT, log=None):
+    """Serve on a background thread; ``port=0`` picks a free port (see ``server.server_port``)."""
+    server = VergleichServer((host, port), max_batch, max_wait, log)
+    threading.Thread(target=server.serve_forever, name='vergleich-server', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.service',
+        description='Lokaler HTTP/JSON-Dienst für den Vergleich Fondspolice/Fondssparplan.',
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Adresse (Standard: nur lokal)')
+    parser.add_argument('--port', type=int, default=8765, help='Port (Standard: 8765)')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Anfragen pro Micro-Batch')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT * 1000,
+                        help='Wartezeit auf weitere Anfragen in Millisekunden')
+    parser.add_argument('--log', action='store_true', help='Jede Anfrage protokollieren')
+    args = parser.parse_args(argv)
+    server = VergleichServer((args.host, args.port), args.max_batch, args.max_wait_ms / 1000,
+                             sys.stderr if args.log else None)
+    print(f'Vergleichsrechner läuft auf http://{args.host}:{server.server_port}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
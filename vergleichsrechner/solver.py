@@ -0,0 +1,189 @@
+"""Break-even values: where Fondspolice and Fondssparplan pay out the same.
+
+    python -m vergleichsrechner.solver kunden.jsonl --feld effektivkosten_police --von 0 --bis 5 --out robust.csv
+
+``break_even`` evaluates the bracket of one client at ``PUNKTE`` points per
+``project_grid`` pass and keeps the first sign change of the advantage; a
+pass costs about as much as a single point, so a threshold takes two or
+three passes. ``break_even_batch`` scans a whole client book at
+``SCAN_PUNKTE`` points and then bisects all brackets together, one
+``simulate_arrays`` pass per step, so every client runs in the engine
+its own scenario needs. A laufzeit threshold needs a single pass, as
+``jaehrlich`` yields every laufzeit at once. Without a sign change in the bracket the
+result is NaN; a double crossing between two scan points goes unseen, so
+for a non-monotone advantage the batch can miss a crossing the single
+solve finds.
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from vergleichsrechner.batch import CHUNK_SIZE, PROZENT_FELDER, parameter_arrays, simulate_arrays
+from vergleichsrechner.runner import iter_inputs, lade
+from vergleichsrechner.schedule import schedule_arrays
+from vergleichsrechner.sweep import SWEEP_FELDER, project_grid
+
+PUNKTE = 1025
+SCAN_PUNKTE = 33
+TOLERANZ = 1e-8
+MAX_SCHRITTE = 64
+
+BATCH_FELDER = ('schwelle', 'aktuell', 'abstand', 'vorteil')
+
+
+def _pruefe(feld):
+    if feld not in SWEEP_FELDER:
+        raise ValueError(f'kein Break-even für {feld}')
+
+
+def _vorzeichenwechsel(vorteil):
+    # First index along axis 0 whose sign differs from the first entry, -1 if there is none
+    wechsel = np.sign(vorteil) != np.sign(vorteil[:1])
+    return np.where(wechsel.any(axis=0), wechsel.argmax(axis=0), -1)
+
+
+def _interpoliert(lo, hi, f_lo, f_hi):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = lo - f_lo * (hi - lo) / (f_hi - f_lo)
+    return np.where(f_hi == f_lo, lo, x)
+
+
+def break_even(p, umschichtungen, feld, von, bis, toleranz=TOLERANZ):
+    """Value of ``feld`` in ``[von, bis]`` at which both products are equal.
+
+    ``p``, ``von``, ``bis`` and the result are in engine units (fractions,
+    ``laufzeit`` as index of the last year). For laufzeit the result is the
+    first index at which the better product changes.
+    """
+    _pruefe(feld)
+    if feld == 'laufzeit':
+        # The first year has index 0
+        von, bis = max(int(von), 0), int(bis)
+        r = project_grid({**p, 'laufzeit': bis}, umschichtungen, jaehrlich=True)
+        i = int(_vorzeichenwechsel((r['fondspolice'] - r['fondssparplan'])[von:, 0]))
+        return np.nan if i < 0 else von + i
+    lo, hi = float(von), float(bis)
+    for _ in range(MAX_SCHRITTE):
+        x = np.linspace(lo, hi, PUNKTE)
+        r = project_grid({**p, feld: x}, umschichtungen)
+        vorteil = np.broadcast_to(r['fondspolice'] - r['fondssparplan'], x.shape)
+        i = int(_vorzeichenwechsel(vorteil))
+        if i < 0:
+            return np.nan
+        lo, hi = x[i - 1], x[i]
+        if hi - lo <= toleranz * max(1.0, abs(hi)):
+            break
+    return float(_interpoliert(lo, hi, vorteil[i - 1], vorteil[i]))
+
+
+def _break_even_chunk(p, umschichtungen, feld, von, bis, toleranz):
+    n = len(p['laufzeit'])
+    if feld == 'laufzeit':
+        # Laufzeiten are counted in years here, and a contract runs at least one
+        von, bis = max(int(von), 1), int(bis)
+        letzte = np.full(n, bis - 1)
+        r = simulate_arrays({**p, 'laufzeit': letzte}, umschichtungen, jaehrlich=True)
+        jahresvorteil = r['fondspolice'] - r['fondssparplan']
+        i = _vorzeichenwechsel(jahresvorteil[von - 1:])
+        aktuell = p['laufzeit']
+        # The pass ends at ``bis``; a longer contract has no current advantage in it
+        vorteil = np.where(aktuell < bis, jahresvorteil[np.minimum(aktuell, bis - 1), np.arange(n)], np.nan)
+        return np.where(i >= 0, i + von, np.nan), aktuell + 1.0, vorteil
+
+    faktor = 100 if feld in PROZENT_FELDER else 1
+    schedule = schedule_arrays(p['laufzeit'], umschichtungen)
+
+    def vorteil_bei(werte):
+        r = simulate_arrays({**p, feld: werte}, umschichtungen, schedule=schedule)
+        return np.broadcast_to(r['fondspolice'] - r['fondssparplan'], (n,))
+
+    # A coarse scan first, so a non-monotone advantage still yields its first crossing
+    x = np.linspace(von / faktor, bis / faktor, SCAN_PUNKTE)
+    vorteil = np.stack([vorteil_bei(np.full(n, wert)) for wert in x])
+    i = _vorzeichenwechsel(vorteil)
+    gefunden = i > 0
+    i = np.maximum(i, 1)
+    spalte = np.arange(n)
+    lo, hi = x[i - 1], x[i]
+    f_lo, f_hi = vorteil[i - 1, spalte], vorteil[i, spalte]
+    for _ in range(MAX_SCHRITTE):
+        if (hi - lo <= toleranz * np.maximum(1.0, np.abs(hi))).all():
+            break
+        mitte = (lo + hi) / 2
+        f_mitte = vorteil_bei(mitte)
+        links = np.sign(f_mitte) == np.sign(f_lo)
+        lo, f_lo = np.where(links, mitte, lo), np.where(links, f_mitte, f_lo)
+        hi, f_hi = np.where(links, hi, mitte), np.where(links, f_hi, f_mitte)
+    schwelle = np.where(gefunden, _interpoliert(lo, hi, f_lo, f_hi), np.nan)
+    return schwelle * faktor, p[feld] * faktor, vorteil_bei(p[feld])
+
+
+def break_even_batch(parameter_sets, feld, von, bis, umschichtungen=None, toleranz=TOLERANZ, chunk_size=CHUNK_SIZE):
+    """Break-even of ``feld`` for N parameters.json dicts, in parameters.json units.
+
+    Returns arrays of length N: ``schwelle``, the client's ``aktuell`` value,
+    ``abstand`` (schwelle minus aktuell) and the current ``vorteil`` of the
+    Fondspolice. The smaller ``abs(abstand)``, the less robust the
+    recommendation. For laufzeit, ``vorteil`` is NaN for clients whose
+    laufzeit lies beyond ``bis``.
+    """
+    _pruefe(feld)
+    if umschichtungen is None:
+        umschichtungen = [p.get('umschichtungen', []) for p in parameter_sets]
+    ergebnisse = {key: np.empty(len(parameter_sets)) for key in BATCH_FELDER}
+    for start in range(0, len(parameter_sets), chunk_size):
+        stop = start + chunk_size
+        schwelle, aktuell, vorteil = _break_even_chunk(
+            parameter_arrays(parameter_sets[start:stop]), umschichtungen[start:stop], feld, von, bis, toleranz)
+        ergebnisse['schwelle'][start:stop] = schwelle
+        ergebnisse['aktuell'][start:stop] = aktuell
+        ergebnisse['vorteil'][start:stop] = vorteil
+    ergebnisse['abstand'] = ergebnisse['schwelle'] - ergebnisse['aktuell']
+    return ergebnisse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m vergleichsrechner.solver',
+        description='Break-even einer Eingabe für alle Kunden berechnen, nach Robustheit sortiert.',
+    )
+    parser.add_argument('eingabe', help='Ordner mit parameters.json-Dateien oder JSONL-Datei')
+    parser.add_argument('--feld', required=True, help='Eingabe, z. B. effektivkosten_police')
+    parser.add_argument('--von', type=float, required=True, help='Untere Grenze der Suche (Einheit wie in parameters.json)')
+    parser.add_argument('--bis', type=float, required=True, help='Obere Grenze der Suche')
+    parser.add_argument('--out', required=True, help='Ergebnisdatei (.csv)')
+    args = parser.parse_args(argv)
+
+    quellen, parameter_sets, fehler = [], [], 0
+    for quelle, kind, payload in iter_inputs(args.eingabe):
+        try:
+            parameter_sets.append(lade(kind, payload))
+        except (OSError, ValueError) as exc:
+            print(f'Fehler in {quelle}: {exc}', file=sys.stderr)
+            fehler += 1
+            continue
+        quellen.append(quelle)
+    try:
+        ergebnisse = break_even_batch(parameter_sets, args.feld, args.von, args.bis)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise SystemExit(f'{type(exc).__name__}: {exc}')
+
+    # Least robust first; clients without a break-even in the bracket go last
+    reihenfolge = np.argsort(np.where(np.isnan(ergebnisse['abstand']), np.inf, np.abs(ergebnisse['abstand'])),
+                             kind='stable')
+    with open(args.out, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('quelle', 'feld') + BATCH_FELDER + ('empfehlung',))
+        for i in reihenfolge.tolist():
+            werte = [float(ergebnisse[key][i]) for key in BATCH_FELDER]
+            vorteil = ergebnisse['vorteil'][i]
+            empfehlung = '' if np.isnan(vorteil) else 'Fondspolice' if vorteil > 0 else 'Fondssparplan'
+            writer.writerow([quellen[i], args.feld, *werte, empfehlung])
+    print(f'{len(quellen)} Kunden, {fehler} Fehler', file=sys.stderr)
+    return 1 if fehler else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Monthly savings plan (Sparrate) at monthly resolution.
+
+Both products receive a Sparrate at the start of every month, raised by
+the Dynamik once a year; Beitragskosten are taken from every payment.
+The start value of a year is booked like in the annual engine: the
+Rendite on the whole value, the Effektivkosten on the value at the end of
+the year. The payments earn from their month on, at the monthly rates
+that compound to the annual ones; the twelve months are one array axis
+(the value after month j is a geometric sum of the monthly factor), so a
+year is a handful of array operations for all clients at once. With a
+Sparrate of 0 the mode therefore reproduces the annual engine.
+
+The Vorabpauschale stays annual. Its Basisertrag counts the payments of
+the year pro rata, one twelfth less for every full month before the
+payment (§ 18 InvStG). Taxes, Umschichtungen and the final payout follow
+``project_batch``; the Fondspolice taxes its gains over all payments.
+"""
+import numpy as np
+
+from vergleichsrechner.engine import DEPOT_SPALTEN, POLICE_SPALTEN, police_steuer
+from vergleichsrechner.schedule import build_schedule, per_year
+from vergleichsrechner.tabelle import Tabelle
+
+MONATE = 12
+
+# A payment at the start of month j (from 0) counts for 12 - j months
+MONATSGEWICHTE = np.arange(MONATE, 0, -1, dtype=np.float64)
+BASISERTRAG_MONATE = MONATSGEWICHTE.sum() / MONATE
+
+SPARRATE_BETRAG = ('sparrate_police', 'sparrate_sparplan')
+SPARRATE_PROZENT = ('dynamik_police', 'beitragskosten_police', 'dynamik_sparplan', 'beitragskosten_sparplan')
+SPARRATE_FELDER = SPARRATE_BETRAG + SPARRATE_PROZENT
+
+
+def sparrate_argumente(p):
+    """Sparrate inputs of ``p`` (engine units) as keywords of ``project_sparrate``; missing ones are 0."""
+    return {key: p.get(key, 0.0) for key in SPARRATE_FELDER}
+
+
+def sparrate_arrays(parameter_sets):
+    """Columns of the Sparrate inputs of N parameters.json dicts, converted like ``parameter_arrays``."""
+    n = len(parameter_sets)
+    arrays = {key: np.fromiter((p.get(key, 0) for p in parameter_sets), np.float64, n) for key in SPARRATE_FELDER}
+    for key in SPARRATE_PROZENT:
+        arrays[key] /= 100
+    return arrays
+
+
+def _monate(rendite, effektivkosten):
+    """Per-year weights of a payment made at the start of every month, for all years at once.
+
+    ``rendite`` has shape ``(jahre, n)``. Returns ``(wert, kosten)``: the
+    year's Wertsteigerung before costs (and its costs) of ``rate`` paid in
+    every month is ``rate * wert[t]`` (``rate * kosten[t]``).
+    """
+    rendite_monat = np.expm1(np.log1p(rendite) / MONATE)
+    kosten_monat = -np.expm1(np.log1p(-np.asarray(effektivkosten, dtype=np.float64)) / MONATE)
+    faktor = (1 + rendite_monat) * (1 - kosten_monat)
+    achse = (MONATE,) + (1,) * np.ndim(faktor)
+    # Summed over the months, the payment of month j brings the powers 0 to 11 - j, so power i counts 12 - i times
+    rate = (faktor ** np.arange(MONATE).reshape(achse) * MONATSGEWICHTE.reshape(achse)).sum(axis=0)
+    return rendite_monat * rate, (1 + rendite_monat) * kosten_monat * rate
+
+
+def project_sparrate(laufzeit, jn, anteil, rendite_police, rendite_depot, teilfreistellung_depot,
+                     einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                     einmalbeitrag_sparplan, teilfreistellung_aktienfonds_sparplan, freistellungsauftrag_sparplan,
+                     basiszins_sparplan, effektivkosten_sparplan, steuerlast_sparplan,
+                     sparrate_police=0.0, dynamik_police=0.0, beitragskosten_police=0.0,
+                     sparrate_sparplan=0.0, dynamik_sparplan=0.0, beitragskosten_sparplan=0.0,
+                     verlauf=False, jaehrlich=False, basiszins_jahre=None):
+    """``project_batch`` with a monthly Sparrate on top of the Einmalbeitrag.
+
+    Inputs and results are those of ``project_batch``; the Sparrate inputs
+    are scalars or arrays of length ``n``. With ``verlauf`` the result holds
+    every column of ``POLICE_SPALTEN``/``DEPOT_SPALTEN`` per year, shape
+    ``(jahre, n)``, with the police payout tax left at 0 (see
+    ``police_steuer``).
+    """
+    laufzeit = np.asarray(laufzeit)
+    jahre = len(jn)
+    shape = np.broadcast_shapes(
+        laufzeit.shape, np.shape(jn)[1:], np.shape(anteil)[1:], np.shape(rendite_police)[1:],
+        np.shape(rendite_depot)[1:], np.shape(teilfreistellung_depot)[1:], np.shape(basiszins_jahre)[1:],
+        *map(np.shape, (einmalbeitrag_police, effektivkosten_police, teilfreistellung_police, steuersatz_police,
+                        einmalbeitrag_sparplan, teilfreistellung_aktienfonds_sparplan, freistellungsauftrag_sparplan,
+                        basiszins_sparplan, effektivkosten_sparplan, steuerlast_sparplan, sparrate_police,
+                        dynamik_police, beitragskosten_police, sparrate_sparplan, dynamik_sparplan,
+                        beitragskosten_sparplan)),
+    )
+    rentenkapital = np.zeros((jahre,) + shape if jaehrlich else shape)
+    fondssparplan = np.zeros((jahre,) + shape if jaehrlich else shape)
+    einzahlungen_gesamt = np.zeros((jahre,) + shape if jaehrlich else shape)
+
+    wert_police, kosten_police = _monate(rendite_police, effektivkosten_police)
+    wert_depot, kosten_depot = _monate(rendite_depot, effektivkosten_sparplan)
+    police_nk = depot_nk = steuer_ums = vp_laufend = ertraege_laufend = einzahlungen = 0.0
+    if verlauf:
+        verlauf_police = {name: np.zeros((jahre,) + shape) for name in POLICE_SPALTEN}
+        verlauf_depot = {name: np.zeros((jahre,) + shape) for name in DEPOT_SPALTEN}
+    for t in range(jahre):
+        beitrag_police = sparrate_police * (1 + dynamik_police) ** t
+        beitrag_sparplan = sparrate_sparplan * (1 + dynamik_sparplan) ** t
+
+        # --- Fondspolice ---
+        beginn = einmalbeitrag_police if t == 0 else police_nk
+        rate = beitrag_police - beitrag_police * beitragskosten_police
+        wert_beginn = beginn * rendite_police[t]
+        wert = wert_beginn + rate * wert_police[t]
+        kosten = (beginn + wert_beginn) * effektivkosten_police + rate * kosten_police[t]
+        nach_beitragskosten = beginn + MONATE * rate
+        ende = nach_beitragskosten + wert
+        police_nk = ende - kosten
+        einzahlung = MONATE * beitrag_police + (einmalbeitrag_police if t == 0 else 0.0)
+        einzahlungen = einzahlungen + einzahlung
+        if verlauf:
+            werte = (t + 1, jn[t], anteil[t], beginn, nach_beitragskosten, rendite_police[t], wert, ende, kosten,
+                     police_nk, einzahlung, jn[t] * anteil[t], police_nk * jn[t] * anteil[t])
+            for name, value in zip(POLICE_SPALTEN, werte):
+                verlauf_police[name][t] = value
+
+        # --- Fondssparplan ---
+        beginn = einmalbeitrag_sparplan if t == 0 else depot_nk - steuer_ums
+        rate = beitrag_sparplan - beitrag_sparplan * beitragskosten_sparplan
+        wert_beginn = beginn * rendite_depot[t]
+        wert = wert_beginn + rate * wert_depot[t]
+        kosten = (beginn + wert_beginn) * effektivkosten_sparplan + rate * kosten_depot[t]
+        nach_beitragskosten = beginn + MONATE * rate
+        ende = nach_beitragskosten + wert
+        if basiszins_jahre is not None:
+            basiszins_sparplan = basiszins_jahre[t]
+        basisertrag = (beginn + BASISERTRAG_MONATE * rate) * 0.7 * basiszins_sparplan
+        vorabpauschale = np.where((wert <= basisertrag) & (wert >= 0), 0.0, basisertrag)
+        if t == 0:
+            vp_laufend = vorabpauschale
+            ertraege_laufend = wert
+        else:
+            neu = jn[t - 1] == 1
+            vp_laufend = np.where(neu, vorabpauschale, vp_laufend + vorabpauschale)
+            ertraege_laufend = np.where(neu, wert, ertraege_laufend + wert)
+        vp_teilfreistellung = vorabpauschale * teilfreistellung_depot[t]
+        vp_zu_besteuern = vorabpauschale - vp_teilfreistellung
+        fsa = freistellungsauftrag_sparplan
+        fsa_uebrig = np.where(vp_zu_besteuern >= fsa, 0.0, fsa - vp_zu_besteuern)
+        danach_zu_besteuern = np.where(fsa >= vp_zu_besteuern, 0.0, vp_zu_besteuern - fsa)
+        steuer_vp = danach_zu_besteuern * steuerlast_sparplan
+        depot_nk = ende - kosten - steuer_vp
+        letztes = laufzeit == t
+        umschichtung = np.where(letztes, 1.0, jn[t] * anteil[t])
+        umschichten = depot_nk * umschichtung
+        if t == 0:
+            ertraege = ertraege_laufend * jn[t]
+            minus_vp = (ertraege_laufend - vp_laufend) * jn[t]
+            ums_teilfreistellung = minus_vp * teilfreistellung_depot[t]
+        else:
+            ertraege = ertraege_laufend * umschichtung
+            minus_vp = (ertraege_laufend - vp_laufend) * umschichtung
+            ums_teilfreistellung = minus_vp * teilfreistellung_aktienfonds_sparplan
+        ums_zu_besteuern = minus_vp - ums_teilfreistellung
+        nach_fsa = np.where(fsa_uebrig > ums_zu_besteuern, 0.0, ums_zu_besteuern - fsa_uebrig)
+        steuer_ums = nach_fsa * steuerlast_sparplan
+        if verlauf:
+            werte = (t + 1, jn[t], anteil[t], beginn, nach_beitragskosten, rendite_depot[t], wert, 0.0, ende, kosten,
+                     depot_nk, basisertrag, vorabpauschale, vp_laufend, vp_teilfreistellung, vp_zu_besteuern, fsa,
+                     fsa_uebrig, danach_zu_besteuern, steuer_vp,
+                     MONATE * beitrag_sparplan + (einmalbeitrag_sparplan if t == 0 else 0.0), umschichtung,
+                     umschichten, ertraege_laufend, ertraege, minus_vp, ums_teilfreistellung, ums_zu_besteuern,
+                     nach_fsa, steuer_ums, umschichten - steuer_ums)
+            for name, value in zip(DEPOT_SPALTEN, werte):
+                verlauf_depot[name][t] = value
+
+        if jaehrlich:
+            # Same steps as for the last year, where the whole depot is paid out
+            minus_vp = (ertraege_laufend - vp_laufend) * (jn[t] if t == 0 else 1.0)
+            tf = teilfreistellung_depot[t] if t == 0 else teilfreistellung_aktienfonds_sparplan
+            zu_besteuern = minus_vp - minus_vp * tf
+            nach_fsa = np.where(fsa_uebrig > zu_besteuern, 0.0, zu_besteuern - fsa_uebrig)
+            rentenkapital[t] = police_nk
+            einzahlungen_gesamt[t] = einzahlungen
+            fondssparplan[t] = depot_nk * 1.0 - nach_fsa * steuerlast_sparplan
+        else:
+            rentenkapital = np.where(letztes, police_nk, rentenkapital)
+            einzahlungen_gesamt = np.where(letztes, einzahlungen, einzahlungen_gesamt)
+            fondssparplan = np.where(letztes, umschichten - steuer_ums, fondssparplan)
+
+    ertraege = rentenkapital - einzahlungen_gesamt
+    zu_besteuern = ertraege - ertraege * teilfreistellung_police
+    ergebnisse = {
+        'fondspolice_rentenkapital': rentenkapital,
+        'fondspolice': rentenkapital - zu_besteuern / 2 * steuersatz_police,
+        'fondssparplan': fondssparplan,
+    }
+    if verlauf:
+        ergebnisse['verlauf'] = {'police': verlauf_police, 'depot': verlauf_depot}
+    return ergebnisse
+
+
+def simulate_sparrate(parameter, umschichtungen):
+    """Both yearly tables like ``engine.simulate``, for the monthly Sparrate mode."""
+    p = parameter
+    schedule = build_schedule(p['laufzeit'], umschichtungen)
+    ergebnisse = project_sparrate(
+        p['laufzeit'], schedule['jn'][:, None], schedule['anteil'][:, None],
+        per_year(schedule, p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'],
+                 p['rendite_rentenfonds_police'])[:, None],
+        per_year(schedule, p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                 p['rendite_rentenfonds_sparplan'])[:, None],
+        per_year(schedule, p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                 p['teilfreistellung_rentenfonds_sparplan'])[:, None],
+        p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        p['einmalbeitrag_sparplan'], p['teilfreistellung_aktienfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+        p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'],
+        **sparrate_argumente(p), verlauf=True,
+    )['verlauf']
+    police = Tabelle(np.column_stack([ergebnisse['police'][name][:, 0] for name in POLICE_SPALTEN]), POLICE_SPALTEN)
+    police_steuer(police, police['Einzahlung'].sum(), p['teilfreistellung_police'], p['steuersatz_police'])
+    depot = Tabelle(np.column_stack([ergebnisse['depot'][name][:, 0] for name in DEPOT_SPALTEN]), DEPOT_SPALTEN)
+    return {'police': police, 'depot': depot}
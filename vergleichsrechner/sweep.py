@@ -0,0 +1,118 @@
+"""Comparison over a grid of up to three inputs in one vectorized pass.
+
+Every grid point is one client of ``project_batch``: the swept inputs
+become per-client arrays, the others stay scalars and broadcast, so a
+200×200 grid is a single year recursion over 40,000 columns.
+"""
+import math
+
+import numpy as np
+
+from vergleichsrechner.batch import BETRAG_FELDER, PROZENT_FELDER, project_batch
+from vergleichsrechner.portfolio import ist_portfolio, portfolio_arrays
+from vergleichsrechner.schedule import build_schedule, per_year_arrays, schedule_arrays
+from vergleichsrechner.sparrate import project_sparrate, sparrate_argumente
+from vergleichsrechner.sprung import project_sprung
+
+ERGEBNIS_FELDER = ('fondspolice_rentenkapital', 'fondspolice', 'fondssparplan')
+
+SWEEP_FELDER = PROZENT_FELDER + BETRAG_FELDER + ('laufzeit',)
+
+MAX_ACHSEN = 3
+CHUNK_SIZE = 65536
+
+
+def achse(name, werte):
+    """Axis values in sidebar units (percent, euro, years) converted to engine units."""
+    werte = np.asarray(werte, dtype=np.float64)
+    if name == 'laufzeit':
+        return np.unique(np.round(werte).astype(np.int64)) - 1
+    if name in PROZENT_FELDER:
+        return werte / 100
+    return werte
+
+
+def project_grid(p, umschichtungen, jaehrlich=False):
+    """Final values for inputs that are scalars or equal-length arrays.
+
+    ``p`` is keyed like parameters.json in engine units (fractions,
+    ``laufzeit`` as index of the last year); all clients share one list of
+    ``umschichtungen``. ``jaehrlich`` is passed on to ``project_batch``,
+    or to ``project_sparrate`` if ``p['monatlich']`` is set. Lists with
+    partial Umschichtungen between funds run in ``portfolio``.
+    """
+    if ist_portfolio(umschichtungen):
+        return portfolio_arrays(p, umschichtungen, jaehrlich=jaehrlich)
+    laufzeit = np.asarray(p['laufzeit'], dtype=np.int64)
+    if laufzeit.ndim == 0:
+        schedule = build_schedule(int(laufzeit), umschichtungen)
+        code, jn, anteil = (schedule[k][:, None] for k in ('produkt', 'jn', 'anteil'))
+    else:
+        laufzeiten, spalte = np.unique(laufzeit, return_inverse=True)
+        code, jn, anteil = (a[:, spalte] for a in schedule_arrays(laufzeiten, [umschichtungen] * len(laufzeiten)))
+    kern, sparraten = (project_sparrate, sparrate_argumente(p)) if p.get('monatlich') else (project_batch, {})
+    return kern(
+        laufzeit, jn, anteil,
+        per_year_arrays(code, p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'],
+                        p['rendite_rentenfonds_police']),
+        per_year_arrays(code, p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'],
+                        p['rendite_rentenfonds_sparplan']),
+        per_year_arrays(code, p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+                        p['teilfreistellung_rentenfonds_sparplan']),
+        p['einmalbeitrag_police'], p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        p['einmalbeitrag_sparplan'], p['teilfreistellung_aktienfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+        p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'], jaehrlich=jaehrlich,
+        **sparraten,
+    )
+
+
+def sweep(p, umschichtungen, achsen, chunk_size=CHUNK_SIZE, sprung=False):
+    """Compare both products on the grid spanned by ``achsen``.
+
+    ``achsen`` maps up to three input names to their values in engine units
+    (see ``achse``). Returns arrays of the grid's shape, axes in the order
+    given, for the final values and ``vorteil`` (Fondspolice minus
+    Fondssparplan). ``sprung`` skips the years without Umschichtung
+    analytically; a laufzeit axis, the monthly Sparrate mode and partial
+    Umschichtungen between funds always step every year.
+    """
+    if not 1 <= len(achsen) <= MAX_ACHSEN:
+        raise ValueError(f'Ein Sweep braucht eine bis {MAX_ACHSEN} Achsen')
+    unbekannt = [name for name in achsen if name not in SWEEP_FELDER]
+    if unbekannt:
+        raise ValueError(f'nicht variierbar: {", ".join(unbekannt)}')
+    p = dict(p)
+    # A shorter contract is a prefix of a longer one, so a laufzeit axis costs one pass
+    laufzeiten = achsen.get('laufzeit')
+    if laufzeiten is not None:
+        laufzeiten = np.asarray(laufzeiten, dtype=np.int64)
+        if laufzeiten.min() < 0:
+            raise ValueError('laufzeit muss mindestens ein Jahr sein')
+        p['laufzeit'] = int(laufzeiten.max())
+    namen = [name for name in achsen if name != 'laufzeit']
+    werte = [np.asarray(achsen[name]) for name in namen]
+    form = tuple(len(v) for v in werte)
+    n = math.prod(form)
+    zeilen = () if laufzeiten is None else (len(laufzeiten),)
+    ergebnisse = {key: np.empty(zeilen + (n,)) for key in ERGEBNIS_FELDER}
+    # Chunks bound the per-year working set for three-axis grids
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        q = dict(p)
+        if namen:
+            index = np.unravel_index(np.arange(start, stop), form)
+            q.update({name: v[i] for name, v, i in zip(namen, werte, index)})
+        if laufzeiten is None and sprung and not p.get('monatlich') and not ist_portfolio(umschichtungen):
+            chunk = project_sprung(q, [umschichtungen])
+        else:
+            chunk = project_grid(q, umschichtungen, jaehrlich=laufzeiten is not None)
+        for key in ERGEBNIS_FELDER:
+            wert = chunk[key] if laufzeiten is None else chunk[key][laufzeiten]
+            ergebnisse[key][..., start:stop] = wert
+    for key, values in ergebnisse.items():
+        values = values.reshape(zeilen + form)
+        if laufzeiten is not None:
+            values = np.moveaxis(values, 0, list(achsen).index('laufzeit'))
+        ergebnisse[key] = values
+    ergebnisse['vorteil'] = ergebnisse['fondspolice'] - ergebnisse['fondssparplan']
+    return ergebnisse
@@ -0,0 +1,166 @@
+"""Typed scenario parameters and the high-level simulation API.
+
+Values use the units of the sidebar and of parameters.json: amounts in
+euro, rates in percent and ``laufzeit`` in years. ``Szenario.to_parameter``
+converts them to the engine's units exactly like the app does.
+"""
+from dataclasses import asdict, dataclass, field, fields
+
+import numpy as np
+
+from vergleichsrechner.batch import BETRAG_FELDER
+from vergleichsrechner.engine import fondspolice_nach_steuer, project_depot, project_police
+from vergleichsrechner.portfolio import ist_portfolio, simulate_portfolio
+from vergleichsrechner.sparrate import SPARRATE_BETRAG, simulate_sparrate
+from vergleichsrechner.tabelle import Tabelle
+
+
+@dataclass(frozen=True)
+class Umschichtung:
+    jahr: int
+    umschichten_in: str
+    anteil: float = 1.0
+    # Fund sleeve the share is taken from (see ``portfolio``); None switches the whole contract
+    umschichten_von: str | None = None
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(jahr=data['jahr'], umschichten_in=data['umschichten_in'], anteil=data.get('anteil', 1.0),
+                   umschichten_von=data.get('umschichten_von'))
+
+    def to_json(self):
+        data = {'jahr': self.jahr, 'anteil': self.anteil, 'umschichten_in': self.umschichten_in}
+        if self.umschichten_von is not None:
+            data['umschichten_von'] = self.umschichten_von
+        return data
+
+
+@dataclass(frozen=True)
+class PoliceParameter:
+    einmalbeitrag: float = 10000
+    rendite_mischfonds: float = 8.0
+    rendite_rentenfonds: float = 8.0
+    rendite_aktienfonds: float = 8.0
+    teilfreistellung: float = 15.0
+    effektivkosten: float = 1.0
+    steuersatz: float = 42.0
+    sparrate: float = 0
+    dynamik: float = 0.0
+    beitragskosten: float = 0.0
+
+
+@dataclass(frozen=True)
+class SparplanParameter:
+    einmalbeitrag: float = 10000
+    rendite_aktienfonds: float = 0.0
+    rendite_mischfonds: float = 0.0
+    rendite_rentenfonds: float = 0.0
+    freistellungsauftrag: float = 0
+    teilfreistellung_aktienfonds: float = 0.0
+    teilfreistellung_mischfonds: float = 0.0
+    teilfreistellung_rentenfonds: float = 0.0
+    basiszins: float = 0.0
+    effektivkosten: float = 0.0
+    ausgabeaufschlag: float = 0.0
+    steuerlast: float = 0.0
+    steuerlast_auszahlung: float = 0.0
+    sparrate: float = 0
+    dynamik: float = 0.0
+    beitragskosten: float = 0.0
+
+
+@dataclass(frozen=True)
+class Szenario:
+    police: PoliceParameter = field(default_factory=PoliceParameter)
+    sparplan: SparplanParameter = field(default_factory=SparplanParameter)
+    laufzeit: int = 1
+    umschichtungen: tuple = ()
+    # Monthly Sparrate mode (see ``sparrate``); the Sparrate fields are ignored otherwise
+    monatlich: bool = False
+
+    @classmethod
+    def from_json(cls, data):
+        """Read a parameters.json dict; missing fields keep their defaults."""
+        police = {f.name: data[f'{f.name}_police'] for f in fields(PoliceParameter) if f'{f.name}_police' in data}
+        sparplan = {f.name: data[f'{f.name}_sparplan'] for f in fields(SparplanParameter) if f'{f.name}_sparplan' in data}
+        return cls(
+            police=PoliceParameter(**police),
+            sparplan=SparplanParameter(**sparplan),
+            laufzeit=data.get('laufzeit', 1),
+            umschichtungen=tuple(Umschichtung.from_json(u) for u in data.get('umschichtungen', [])),
+            monatlich=data.get('monatlich', False),
+        )
+
+    def to_json(self):
+        """The dict written by 'Parameter Speichern'."""
+        data = {f'{key}_police': value for key, value in asdict(self.police).items()}
+        data.update({f'{key}_sparplan': value for key, value in asdict(self.sparplan).items()})
+        data['laufzeit'] = self.laufzeit
+        data['umschichtungen'] = self.umschichtungen_json()
+        data['monatlich'] = self.monatlich
+        return data
+
+    def to_parameter(self):
+        """Engine inputs: rates as fractions and ``laufzeit`` as index of the last year."""
+        parameter = {
+            key: value if key in BETRAG_FELDER + SPARRATE_BETRAG else value / 100
+            for key, value in self.to_json().items()
+            if key not in ('laufzeit', 'umschichtungen', 'monatlich')
+        }
+        parameter['laufzeit'] = self.laufzeit - 1
+        parameter['monatlich'] = self.monatlich
+        return parameter
+
+    def umschichtungen_json(self):
+        return [u.to_json() for u in self.umschichtungen]
+
+
+@dataclass(frozen=True)
+class PoliceErgebnis:
+    tabelle: Tabelle
+    rentenkapital: float
+    nach_steuer: float
+
+
+@dataclass(frozen=True)
+class DepotErgebnis:
+    tabelle: Tabelle
+    nach_steuer: float
+
+
+def simulate_police(szenario):
+    """Project the Fondspolice of a ``Szenario``."""
+    p = szenario.to_parameter()
+    if ist_portfolio(szenario.umschichtungen_json()):
+        tabelle = simulate_portfolio(p, szenario.umschichtungen_json())['police']
+    elif szenario.monatlich:
+        tabelle = simulate_sparrate(p, szenario.umschichtungen_json())['police']
+    else:
+        tabelle = project_police(
+            p['laufzeit'], szenario.umschichtungen_json(), p['einmalbeitrag_police'],
+            p['rendite_aktienfonds_police'], p['rendite_mischfonds_police'], p['rendite_rentenfonds_police'],
+            p['effektivkosten_police'], p['teilfreistellung_police'], p['steuersatz_police'],
+        )
+    rentenkapital = float(tabelle['Jahresende nach Kosten'][-1]) if tabelle.jahre else np.nan
+    nach_steuer = fondspolice_nach_steuer(rentenkapital, float(tabelle['Einzahlung'].sum()),
+                                          p['teilfreistellung_police'], p['steuersatz_police'])
+    return PoliceErgebnis(tabelle, rentenkapital, nach_steuer)
+
+
+def simulate_depot(szenario):
+    """Project the Fondssparplan of a ``Szenario``."""
+    p = szenario.to_parameter()
+    if ist_portfolio(szenario.umschichtungen_json()):
+        tabelle = simulate_portfolio(p, szenario.umschichtungen_json())['depot']
+    elif szenario.monatlich:
+        tabelle = simulate_sparrate(p, szenario.umschichtungen_json())['depot']
+    else:
+        tabelle = project_depot(
+            p['laufzeit'], szenario.umschichtungen_json(), p['einmalbeitrag_sparplan'],
+            p['rendite_aktienfonds_sparplan'], p['rendite_mischfonds_sparplan'], p['rendite_rentenfonds_sparplan'],
+            p['teilfreistellung_aktienfonds_sparplan'], p['teilfreistellung_mischfonds_sparplan'],
+            p['teilfreistellung_rentenfonds_sparplan'], p['freistellungsauftrag_sparplan'],
+            p['basiszins_sparplan'], p['effektivkosten_sparplan'], p['steuerlast_sparplan'],
+        )
+    nach_steuer = float(tabelle['Kapital abzüglich Steuer'][-1]) if tabelle.jahre else np.nan
+    return DepotErgebnis(tabelle, nach_steuer)
@@ -0,0 +1,81 @@
+"""Yearly result tables as one float block with a column schema.
+
+A ``Tabelle`` reads like the dict of columns it replaces
+(``tabelle['Jahresende nach Kosten']``) but keeps every value in one
+contiguous (jahre, spalten) array, float64 by default or float32 where
+memory counts more than the last digits. Float columns are views into
+the block. pandas is only imported by ``to_frame``, which builds a
+DataFrame of just the columns asked for.
+"""
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+
+GANZZAHLIG = frozenset(('Jahr', 'UmschichtungJN'))
+
+
+@lru_cache(maxsize=None)
+def _index(spalten):
+    if len(set(spalten)) != len(spalten):
+        raise ValueError('Spaltennamen müssen eindeutig sein')
+    return {name: j for j, name in enumerate(spalten)}
+
+
+class Tabelle(Mapping):
+    """Read-mostly mapping of column name to a column of ``daten``."""
+
+    __slots__ = ('daten', 'spalten')
+
+    def __init__(self, daten, spalten):
+        spalten = tuple(spalten)
+        _index(spalten)
+        if daten.ndim != 2 or daten.shape[1] != len(spalten):
+            raise ValueError(f'{daten.shape} passt nicht zu {len(spalten)} Spalten')
+        self.daten = daten
+        self.spalten = spalten
+
+    @classmethod
+    def aus_zeilen(cls, spalten, rows, dtype=np.float64):
+        """Pack row tuples into a block without building per-column arrays first."""
+        daten = np.fromiter(chain.from_iterable(rows), dtype, len(rows) * len(spalten))
+        return cls(daten.reshape(len(rows), len(spalten)), spalten)
+
+    def __getitem__(self, name):
+        spalte = self.daten[:, _index(self.spalten)[name]]
+        return spalte.astype(np.int64) if name in GANZZAHLIG else spalte
+
+    def __iter__(self):
+        return iter(self.spalten)
+
+    def __len__(self):
+        return len(self.spalten)
+
+    def __repr__(self):
+        return f'Tabelle({self.jahre} Jahre × {len(self.spalten)} Spalten, {self.daten.dtype})'
+
+    @property
+    def jahre(self):
+        return self.daten.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.daten.nbytes
+
+    def astype(self, dtype):
+        return Tabelle(self.daten.astype(dtype), self.spalten)
+
+    def to_frame(self, spalten=None, runden=None):
+        """DataFrame of ``spalten`` (default: all), optionally rounded."""
+        import pandas as pd
+
+        spalten = self.spalten if spalten is None else tuple(spalten)
+        index = _index(self.spalten)
+        daten = self.daten if spalten == self.spalten else self.daten[:, [index[name] for name in spalten]]
+        if runden is not None:
+            daten = daten.round(runden)
+        df = pd.DataFrame(daten, columns=list(spalten), copy=False)
+        for name in GANZZAHLIG.intersection(spalten):
+            df[name] = df[name].astype(np.int64)
+        return df